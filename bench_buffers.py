@@ -0,0 +1,338 @@
+#bench_buffers.py
+"""Per-frame cost of the e-Paper buffer conversions, before and after.
+
+The "before" column runs the original per-byte/per-pixel driver code,
+copied here as reference implementations; "after" runs waveshare_epd.epdbuffer
+the way the drivers call it. Every pair is also checked for byte-identical
+output, in both orientations for every panel geometry in PIXEL_DRIVERS. The
+drivers' own getbuffer output is checked against stored digests by
+tests/test_driver_buffers.py.
+
+    python bench_buffers.py
+"""
+import random
+import time
+
+from PIL import Image, ImageDraw
+
+from waveshare_epd import epdbuffer
+
+def sample_image(width, height, mode="1"):
+    """A reproducible frame with text-like noise, lines and solid areas."""
+    rng = random.Random(width * 10007 + height)
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for _ in range(400):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.rectangle((x, y, x + rng.randrange(1, 40), y + rng.randrange(1, 12)),
+                       fill=rng.choice((0x00, 0x80, 0xC0)))
+    draw.line((0, 0, width - 1, height - 1), fill=0, width=3)
+    return image.convert(mode)
+
+def legacy_getbuffer_inverted(image, width, height):
+    """epd7in5_V2.EPD.getbuffer before epdbuffer."""
+    img = image
+    imwidth, imheight = img.size
+    if(imwidth == width and imheight == height):
+        img = img.convert('1')
+    elif(imwidth == height and imheight == width):
+        img = img.rotate(90, expand=True).convert('1')
+    buf = bytearray(img.tobytes('raw'))
+    for i in range(len(buf)):
+        buf[i] ^= 0xFF
+    return buf
+
+def legacy_getbuffer_pixels(image, width, height):
+    """The per-pixel 1bpp getbuffer shared by most drivers (epd2in13 row padding)."""
+    linewidth = (width + 7) // 8
+    buf = [0xFF] * (linewidth * height)
+    image_monocolor = image.convert('1')
+    imwidth, imheight = image_monocolor.size
+    pixels = image_monocolor.load()
+    if(imwidth == width and imheight == height):
+        for y in range(imheight):
+            for x in range(imwidth):
+                if pixels[x, y] == 0:
+                    buf[int(x / 8) + y * linewidth] &= ~(0x80 >> (x % 8))
+    elif(imwidth == height and imheight == width):
+        for y in range(imheight):
+            for x in range(imwidth):
+                newx = y
+                newy = height - x - 1
+                if pixels[x, y] == 0:
+                    buf[int(newx / 8) + newy*linewidth] &= ~(0x80 >> (y % 8))
+    return buf
+
+def legacy_getbuffer_2bpp(image, width, height):
+    """epd5in83.EPD.getbuffer: 2 bits per black/white pixel."""
+    buf = [0x00] * int(width * height / 4)
+    image_monocolor = image.convert('1')
+    imwidth, imheight = image_monocolor.size
+    pixels = image_monocolor.load()
+    if(imwidth == width and imheight == height):
+        for y in range(imheight):
+            for x in range(imwidth):
+                if pixels[x, y] < 64:
+                    buf[int((x + y * width) / 4)] &= ~(0xC0 >> (x % 4 * 2))
+                else:
+                    buf[int((x + y * width) / 4)] |= 0xC0 >> (x % 4 * 2)
+    elif(imwidth == height and imheight == width):
+        for y in range(imheight):
+            for x in range(imwidth):
+                newx = y
+                newy = height - x - 1
+                if pixels[x, y] < 64:
+                    buf[int((newx + newy*width) / 4)] &= ~(0xC0 >> (y % 4 * 2))
+                else:
+                    buf[int((newx + newy*width) / 4)] |= 0xC0 >> (y % 4 * 2)
+    return buf
+
+def legacy_getbuffer_4bpp(image, width, height):
+    """epd7in5.EPD.getbuffer: 4 bits per pixel, 0x3 white."""
+    img = image
+    imwidth, imheight = img.size
+    halfwidth = int(width / 2)
+    buf = [0x33] * halfwidth * height
+    if(imwidth == width and imheight == height):
+        img = img.convert('1')
+    elif(imwidth == height and imheight == width):
+        img = img.rotate(90, expand=True).convert('1')
+        imwidth, imheight = img.size
+    pixels = img.load()
+    for y in range(imheight):
+        offset = y * halfwidth
+        for x in range(1, imwidth, 2):
+            i = offset + x // 2
+            if(pixels[x-1, y] > 191):
+                buf[i] = 0x33 if pixels[x, y] > 191 else 0x30
+            else:
+                buf[i] = 0x03 if pixels[x, y] > 191 else 0x00
+    return buf
+
+def legacy_getbuffer_4gray(image, width, height, transpose=False):
+    """epd7in5_V2.EPD.getbuffer_4Gray (epd4in2 maps portrait with newy = x)."""
+    buf = [0xFF] * (int(width / 4) * height)
+    image_monocolor = image.convert('L')
+    imwidth, imheight = image_monocolor.size
+    pixels = image_monocolor.load()
+    i = 0
+    if(imwidth == width and imheight == height):
+        for y in range(imheight):
+            for x in range(imwidth):
+                if(pixels[x, y] == 0xC0):
+                    pixels[x, y] = 0x80
+                elif (pixels[x, y] == 0x80):
+                    pixels[x, y] = 0x40
+                i = i + 1
+                if(i % 4 == 0):
+                    buf[int((x + (y * width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
+    elif(imwidth == height and imheight == width):
+        for x in range(imwidth):
+            for y in range(imheight):
+                newx = y
+                newy = x if transpose else height - x - 1
+                if(pixels[x, y] == 0xC0):
+                    pixels[x, y] = 0x80
+                elif (pixels[x, y] == 0x80):
+                    pixels[x, y] = 0x40
+                i = i + 1
+                if(i % 4 == 0):
+                    buf[int((newx + (newy * width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
+    return buf
+
+def legacy_gray_plane(image):
+    """The first (0x10) plane of epd7in5_V2.EPD.display_4Gray, collected instead of sent."""
+    buf = []
+    for i in range(0, len(image) // 2):
+        temp3=0
+        for j in range(0, 2):
+            temp1 = image[i*2+j]
+            for k in range(0, 2):
+                temp2 = temp1&0xC0
+                if(temp2 == 0xC0):
+                    temp3 |= 0x00
+                elif(temp2 == 0x00):
+                    temp3 |= 0x01
+                elif(temp2 == 0x80):
+                    temp3 |= 0x01
+                else: #0x40
+                    temp3 |= 0x00
+                temp3 <<= 1
+
+                temp1 <<= 2
+                temp2 = temp1&0xC0
+                if(temp2 == 0xC0):
+                    temp3 |= 0x00
+                elif(temp2 == 0x00):
+                    temp3 |= 0x01
+                elif(temp2 == 0x80):
+                    temp3 |= 0x01
+                else :   #0x40
+                    temp3 |= 0x00
+                if(j!=1 or k!=1):
+                    temp3 <<= 1
+                temp1 <<= 2
+        buf.append(temp3)
+    return buf
+
+def legacy_display_plane(image, width=800, height=480):
+    """The 0x10 plane epd7in5_V2.EPD.display built before sending."""
+    Width = width // 8
+    image1 = [0xFF] * int(width * height / 8)
+    for j in range(height):
+            for i in range(Width):
+                image1[i + j * Width] = ~image[i + j * Width]
+    return image1
+
+def legacy_getbuffer_7color(image, width, height):
+    """epd7in3f.EPD.getbuffer: quantize to the 7 panel colors, 2 pixels per byte."""
+    pal_image = Image.new("P", (1,1))
+    pal_image.putpalette( (0,0,0,  255,255,255,  0,255,0,   0,0,255,  255,0,0,  255,255,0, 255,128,0) + (0,0,0)*249)
+    imwidth, imheight = image.size
+    image_temp = image if imwidth == width else image.rotate(90, expand=True)
+    buf_7color = bytearray(image_temp.convert("RGB").quantize(palette=pal_image).tobytes('raw'))
+    buf = [0x00] * int(width * height / 2)
+    idx = 0
+    for i in range(0, len(buf_7color), 2):
+        buf[idx] = (buf_7color[i] << 4) + buf_7color[i+1]
+        idx += 1
+    return buf
+
+def legacy_getbuffer_4color(image, width, height):
+    """epd7in3g.EPD.getbuffer: quantize to the 4 panel colors, 4 pixels per byte."""
+    pal_image = Image.new("P", (1,1))
+    pal_image.putpalette( (0,0,0,  255,255,255,  255,255,0,   255,0,0) + (0,0,0)*252)
+    imwidth, imheight = image.size
+    image_temp = image if imwidth == width else image.rotate(90, expand=True)
+    buf_4color = bytearray(image_temp.convert("RGB").quantize(palette=pal_image).tobytes('raw'))
+    buf = [0x00] * int(width * height / 4)
+    idx = 0
+    for i in range(0, len(buf_4color), 4):
+        buf[idx] = (buf_4color[i] << 6) + (buf_4color[i+1] << 4) + (buf_4color[i+2] << 2) + buf_4color[i+3]
+        idx += 1
+    return buf
+
+def legacy_invert(data):
+    """epd7in5b_V2.EPD.display's in-place re-inversion, on a copy."""
+    buf = bytearray(data)
+    for i in range(len(buf)):
+        buf[i] ^= 0xFF
+    return buf
+
+# Panel geometry (width, height) -> drivers whose 1bpp getbuffer packs it
+PIXEL_DRIVERS = {
+    (80, 128): ["epd1in02"],
+    (104, 212): ["epd2in13b_V3", "epd2in13bc", "epd2in13d"],
+    (122, 250): ["epd2in13"],
+    (128, 296): ["epd2in9", "epd2in9_V2", "epd2in9b_V3", "epd2in9b_V4", "epd2in9bc", "epd2in9d"],
+    (152, 152): ["epd1in54c"],
+    (152, 296): ["epd2in66", "epd2in66b"],
+    (176, 264): ["epd2in7", "epd2in7_V2", "epd2in7b", "epd2in7b_V2"],
+    (200, 200): ["epd1in54", "epd1in54_V2", "epd1in54b", "epd1in54b_V2"],
+    (240, 360): ["epd3in52"],
+    (280, 480): ["epd3in7"],
+    (400, 300): ["epd4in2", "epd4in2_V2", "epd4in2b_V2", "epd4in2b_V2_old", "epd4in2bc"],
+    (600, 448): ["epd5in83bc"],
+    (640, 384): ["epd7in5bc"],
+    (648, 480): ["epd5in83_V2", "epd5in83b_V2"],
+    (792, 272): ["epd5in79", "epd5in79b"],
+    (800, 480): ["epd4in26"],
+    (880, 528): ["epd7in5b_HD"],
+    (960, 680): ["epd13in3b", "epd13in3k"],
+}
+
+def pack_pixels(image, width, height):
+    """What the per-pixel drivers' getbuffer does now."""
+    return epdbuffer.pack_1bpp(image.convert('1'), width, height, inverted=False)
+
+def pack_2bpp(image, width, height):
+    return epdbuffer.expand_bits(pack_pixels(image, width, height), 2)
+
+def pack_4bpp(image, width, height):
+    return epdbuffer.expand_bits(epdbuffer.pack_1bpp(image, width, height, inverted=False), 4, 0x33)
+
+def pack_4gray_transposed(image, width, height):
+    return epdbuffer.pack_4gray(image, width, height, transpose=True)
+
+def legacy_getbuffer_4gray_transposed(image, width, height):
+    return legacy_getbuffer_4gray(image, width, height, transpose=True)
+
+def split_gray_plane(image):
+    return epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_LOW)
+
+def color_image(width, height):
+    """A reproducible RGB frame with arbitrary colors, so quantize has to dither."""
+    rng = random.Random(width * 7919 + height)
+    image = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for _ in range(300):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.rectangle((x, y, x + rng.randrange(1, 60), y + rng.randrange(1, 30)),
+                       fill=tuple(rng.randrange(256) for _ in range(3)))
+    return image
+
+SEVEN_COLORS = (0, 0, 0,  255, 255, 255,  0, 255, 0,  0, 0, 255,  255, 0, 0,  255, 255, 0,  255, 128, 0)
+FOUR_COLORS = (0, 0, 0,  255, 255, 255,  255, 255, 0,  255, 0, 0)
+
+def pack_7color(image, width, height):
+    return epdbuffer.pack_color(image, width, height, SEVEN_COLORS, 4)
+
+def pack_4color(image, width, height):
+    return epdbuffer.pack_color(image, width, height, FOUR_COLORS, 2)
+
+def timed(fn, *args, repeat=3):
+    """Best wall time of fn(*args) in milliseconds, and its result."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def compare(label, before, after, *args):
+    before_ms, expected = timed(before, *args)
+    after_ms, actual = timed(after, *args)
+    same = bytes(b & 0xFF for b in expected) == bytes(actual)
+    print(f"{label:<44} {before_ms:10.2f} {after_ms:10.3f} {before_ms / max(after_ms, 1e-6):9.0f}x  {'ok' if same else 'MISMATCH'}")
+    return same
+
+def main():
+    print(f"{'conversion':<44} {'before ms':>10} {'after ms':>10} {'speedup':>10}")
+    ok = True
+
+    image = sample_image(800, 480)
+    ok &= compare("1bpp inverted 800x480", legacy_getbuffer_inverted, epdbuffer.pack_1bpp, image, 800, 480)
+    ok &= compare("1bpp inverted 800x480 (rotated)", legacy_getbuffer_inverted, epdbuffer.pack_1bpp,
+                  image.rotate(90, expand=True), 800, 480)
+    buf = epdbuffer.pack_1bpp(image, 800, 480)
+    ok &= compare("invert 48000 bytes", legacy_invert, epdbuffer.invert, buf)
+    ok &= compare("display plane 800x480 (epd7in5_V2)", legacy_display_plane, epdbuffer.invert, buf)
+
+    for (width, height), drivers in PIXEL_DRIVERS.items():
+        for image in (sample_image(width, height, "L"), sample_image(height, width, "L")):
+            label = f"1bpp {image.size[0]}x{image.size[1]} ({drivers[0]}{'...' if len(drivers) > 1 else ''})"
+            ok &= compare(label, legacy_getbuffer_pixels, pack_pixels, image, width, height)
+    for image in (sample_image(600, 448, "L"), sample_image(448, 600, "L")):
+        ok &= compare(f"2bpp {image.size[0]}x{image.size[1]} (epd5in83)", legacy_getbuffer_2bpp, pack_2bpp, image, 600, 448)
+    for image in (sample_image(640, 384, "L"), sample_image(384, 640, "L")):
+        ok &= compare(f"4bpp {image.size[0]}x{image.size[1]} (epd7in5)", legacy_getbuffer_4bpp, pack_4bpp, image, 640, 384)
+    for image in (sample_image(800, 480, "L"), sample_image(480, 800, "L")):
+        ok &= compare(f"4-gray {image.size[0]}x{image.size[1]} (epd7in5_V2...)", legacy_getbuffer_4gray,
+                      epdbuffer.pack_4gray, image, 800, 480)
+    for image in (sample_image(400, 300, "L"), sample_image(300, 400, "L")):
+        ok &= compare(f"4-gray {image.size[0]}x{image.size[1]} (epd4in2...)", legacy_getbuffer_4gray_transposed,
+                      pack_4gray_transposed, image, 400, 300)
+    gray = epdbuffer.pack_4gray(sample_image(800, 480, "L"), 800, 480)
+    ok &= compare("4-gray plane 800x480 (display_4Gray)", legacy_gray_plane, split_gray_plane, gray)
+    for image in (color_image(800, 480), color_image(480, 800)):
+        ok &= compare(f"7-color {image.size[0]}x{image.size[1]} (epd7in3f...)", legacy_getbuffer_7color,
+                      pack_7color, image, 800, 480)
+        ok &= compare(f"4-color {image.size[0]}x{image.size[1]} (epd7in3g...)", legacy_getbuffer_4color,
+                      pack_4color, image, 800, 480)
+
+    if not ok:
+        raise SystemExit("conversion output differs from the reference implementation")
+
+if __name__ == "__main__":
+    main()
@@ -3,43 +3,26 @@ from typing import Any
 
 import logging
 
-from waveshare_epd import epd7in5_V2
+from waveshare_epd import epdconfig, epdregistry
+from waveshare_epd.epdbase import FAST
 import time
-from PIL import Image,ImageDraw,ImageFont
+from PIL import Image,ImageDraw
 
+from fonts import get_font, text_size
 from train_status import get_arriving_trains
 from literature_clock import get_current_time_quote
+from quote_layout import draw_plan, get_plan
 
 logging.basicConfig(level=logging.DEBUG)
 
-helvetica24 = ImageFont.truetype("resources/Helvetica Roman.ttf", 24)
-helvetica31 = ImageFont.truetype("resources/Helvetica Roman.ttf", 31)
+helvetica24 = get_font("resources/Helvetica Roman.ttf", 24)
+helvetica31 = get_font("resources/Helvetica Roman.ttf", 31)
 
-courier18 = ImageFont.truetype("resources/Courier New.ttf", 18)
-helvetica22 = ImageFont.truetype("resources/Helvetica Roman.ttf", 22)
+courier18 = get_font("resources/Courier New.ttf", 18)
+helvetica22 = get_font("resources/Helvetica Roman.ttf", 22)
 
-centurybold35 = ImageFont.truetype("resources/Century Bold.ttf",35)
-centurybold50 = ImageFont.truetype("resources/Century Bold.ttf",50)
-
-# Font paths for dynamic sizing
-COURIER_PATH = "resources/Century.ttf"
-COURIER_BOLD_PATH = "resources/Century Bold.ttf"
-COURIER_ITALIC_PATH = "resources/Century Bold Italic.otf"
-
-def _quote_fonts(size):
-    """Create quote, title, author fonts at given sizes. Title/author use 0.8x."""
-    return {
-        "quote": ImageFont.truetype(COURIER_PATH, size),
-        "quote_bold": ImageFont.truetype(COURIER_BOLD_PATH, int(size*1.1)),
-        "title": ImageFont.truetype(COURIER_ITALIC_PATH, max(12, int(size * 0.8))),
-        "author": ImageFont.truetype(COURIER_PATH, max(12, int(size * 0.8))),
-    }
-
-def text_size(text, font_type):
-    left,top,right,bottom = font_type.getbbox(text)
-    width = right - left
-    height = bottom - top
-    return [width, height]
+centurybold35 = get_font("resources/Century Bold.ttf",35)
+centurybold50 = get_font("resources/Century Bold.ttf",50)
 
 def add_train(draw,x,y,train,min_away,rad):
     radius = rad
@@ -146,173 +129,8 @@ def draw_trains(draw):
 
 
 
-def _measure_quote_layout(quote, fonts, max_width):
-    """Measure total height of quote layout (no drawing). Returns (height, layout_info)."""
-    quote_first = quote.get("quote_first") or ""
-    quote_time_case = quote.get("quote_time_case") or ""
-    quote_last = quote.get("quote_last") or ""
-    title = quote.get("title") or ""
-    author = quote.get("author") or ""
-
-    qf, qb, tf, af = fonts["quote"], fonts["quote_bold"], fonts["title"], fonts["author"]
-
-    segments = [(quote_first, qf), (quote_time_case, qb), (quote_last, qf)]
-    tokens = []
-    for i, (text, font) in enumerate(segments):
-        words = text.split()
-        for j, word in enumerate(words):
-            is_last = i == len(segments) - 1 and j == len(words) - 1
-            tokens.append((word if is_last else word + " ", font))
-
-    [_, hq] = text_size("j", qf)
-    [_, hqb] = text_size("j", qb)
-    quote_line_height = max(hq, hqb) + 5
-
-    x, y = 0, 0
-    last_quote_line_bottom = 0
-    for word, font in tokens:
-        w, _ = text_size(word, font)
-        if x + w > max_width and x > 0:
-            x = 0
-            y += quote_line_height
-        x += w
-        last_quote_line_bottom = y + quote_line_height
-
-    total_height = last_quote_line_bottom + 10
-    [_, title_h] = text_size("X", tf)
-    title_line_height = title_h + 5
-
-    title_lines = []
-    if title:
-        current_line, current_width = [], 0
-        for word in title.split():
-            word_w, _ = text_size(word + " ", tf)
-            if current_line and current_width + word_w > max_width:
-                title_lines.append(" ".join(current_line))
-                current_line, current_width = [word], text_size(word + " ", tf)[0]
-            else:
-                current_line.append(word)
-                current_width += word_w
-        if current_line:
-            title_lines.append(" ".join(current_line))
-        total_height += len(title_lines) * title_line_height
-
-    if author:
-        [_, author_h] = text_size("X", af)
-        total_height += author_h
-
-    return total_height
-
 def draw_quote(draw, quote):
-    SCREEN_WIDTH = 800
-    SCREEN_HEIGHT = 480
-    QUOTE_HEIGHT = int(SCREEN_HEIGHT * 2 / 3) - 25
-    PADDING_X = 30
-    PADDING_TOP = 50
-    max_width = SCREEN_WIDTH - 2 * PADDING_X
-    box_right = SCREEN_WIDTH - PADDING_X
-    box_bottom = PADDING_TOP + QUOTE_HEIGHT
-    available_height = QUOTE_HEIGHT
-
-    # Find largest font size that fits
-    FONT_SIZES = [40, 36, 32, 28, 24, 20, 18, 16, 14, 12, 10, 8]
-    fonts = None
-    for size in FONT_SIZES:
-        f = _quote_fonts(size)
-        h = _measure_quote_layout(quote, f, max_width)
-        if h <= available_height:
-            fonts = f
-            break
-    if fonts is None:
-        fonts = _quote_fonts(FONT_SIZES[-1])
-
-    qf, qb, tf, af = fonts["quote"], fonts["quote_bold"], fonts["title"], fonts["author"]
-
-    quote_first = quote.get("quote_first") or ""
-    quote_time_case = quote.get("quote_time_case") or ""
-    quote_last = quote.get("quote_last") or ""
-    title = quote.get("title") or ""
-    author = quote.get("author") or ""
-
-    [_, hq] = text_size("j", qf)
-    [_, hqb] = text_size("j", qb)
-    quote_line_height = max(hq, hqb) + 5
-
-    segments = [(quote_first, qf), (quote_time_case, qb), (quote_last, qf)]
-    tokens = []
-    for i, (text, font) in enumerate(segments):
-        words = text.split()
-        for j, word in enumerate[str](words):
-            is_last = i == len(segments) - 1 and j == len(words) - 1
-            if i == 1 and j == len(words) - 1:
-                last_words = segments[2][0].split()
-                if last_words:
-                    last_word = last_words[0][:1]
-                    if last_word == ".":
-                        is_last = True
-                    elif last_word == ",":
-                        is_last = True
-                    elif last_word == ":":
-                        is_last = True
-                    elif last_word == ";":
-                        is_last = True
-                    elif last_word == "\"":
-                        is_last = True
-                    elif last_word == "!":
-                        is_last = True
-                    elif last_word == "?":
-                        is_last = True
-                    elif last_word == ")":
-                        is_last = True
-                    elif last_word == "—":
-                        is_last = True
-                    elif last_word == "-":
-                        is_last = True
-            tokens.append((word if is_last else word + " ", font))
-
-
-    x, y = PADDING_X, PADDING_TOP
-    last_quote_line_bottom = PADDING_TOP
-
-    for word, font in tokens:
-        w, h = text_size(word, font)
-        if x + w > PADDING_X + max_width and x > PADDING_X:
-            x = PADDING_X
-            y += quote_line_height
-        if y + quote_line_height > box_bottom:
-            break
-        draw.text((x, y), word, font=font, fill=0)
-        x += w
-        last_quote_line_bottom = y + quote_line_height
-
-    [_, title_h] = text_size("X", tf)
-    title_line_height = title_h + 5
-    title_y = last_quote_line_bottom + 10
-
-    if title:
-        title_words = title.split()
-        title_lines = []
-        current_line, current_width = [], 0
-        for word in title_words:
-            word_w, _ = text_size(word + " ", tf)
-            if current_line and current_width + word_w > max_width:
-                title_lines.append(" ".join(current_line))
-                current_line = [word]
-                current_width = text_size(word + " ", tf)[0]
-            else:
-                current_line.append(word)
-                current_width += word_w
-        if current_line:
-            title_lines.append(" ".join(current_line))
-
-        for line in title_lines:
-            line_w, _ = text_size(line, tf)
-            draw.text((box_right - line_w, title_y), line, font=tf, fill=0)
-            title_y += title_line_height
-
-    if author:
-        [author_w, _] = text_size(author, af)
-        draw.text((box_right - author_w, title_y), author, font=af, fill=0)
+    draw_plan(draw, get_plan(quote))
 
 def draw_time(draw, timestr):
     [timeWidth,timeHeight] = text_size(timestr, centurybold35)
@@ -330,7 +148,7 @@ def draw_splashscreen(draw):
 
 def test_render():
     try:
-        epd = epd7in5_V2.EPD()
+        epd = epdregistry.create(require=(FAST,))
         epd.init_fast()
         screen_image = Image.new('1',(epd.width, epd.height),255)
         draw = ImageDraw.Draw(screen_image)
@@ -350,7 +168,7 @@ def test_render():
         
     except KeyboardInterrupt:    
         logging.info("ctrl + c:")
-        epd7in5_V2.epdconfig.module_exit(cleanup=True)
+        epdconfig.module_exit(cleanup=True)
         exit()
 
 if __name__ == "__main__":
@@ -0,0 +1,146 @@
+#fonts.py
+"""Shared TrueType font cache and text measurement.
+
+ImageFont.truetype opens the file and builds a FreeType face on every call,
+so all drawing code asks for fonts through get_font instead. text_size
+memoizes bounding boxes per (font, text) and composes unseen single-line
+strings from cached per-glyph boxes once a font has proven that this
+matches FreeType exactly.
+"""
+import threading
+from collections import OrderedDict
+
+from PIL import ImageFont
+
+_fonts = {}
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+def get_font(path, size):
+    """Font for (path, size), loaded on first use and shared afterwards."""
+    global _hits, _misses
+    key = (path, size)
+    with _lock:
+        font = _fonts.get(key)
+        if font is not None:
+            _hits += 1
+            return font
+        _misses += 1
+        font = _fonts[key] = ImageFont.truetype(path, size)
+        return font
+
+def warm_fonts(specs):
+    """Load every (path, size) in specs up front."""
+    for path, size in specs:
+        get_font(path, size)
+
+def font_cache_stats():
+    with _lock:
+        return {"fonts": len(_fonts), "hits": _hits, "misses": _misses}
+
+def clear_font_cache():
+    global _hits, _misses
+    with _lock:
+        _fonts.clear()
+        _hits = 0
+        _misses = 0
+    clear_measure_cache()
+
+# Bound on memoized (font, text) sizes.
+MEASURE_CACHE_SIZE = 20000
+# Composed glyph boxes are checked against FreeType this many times per font
+# before they are trusted on their own.
+GLYPH_CALIBRATION = 32
+
+class _GlyphMetrics:
+    """Per-font glyph advances and boxes, used to measure unseen strings."""
+
+    def __init__(self, font):
+        self.font = font
+        self.glyphs = {}
+        self.checked = 0
+        self.exact = font.layout_engine == ImageFont.Layout.BASIC
+
+    def bbox(self, text):
+        glyphs = self.glyphs
+        x = 0
+        left = top = right = bottom = None
+        for ch in text:
+            glyph = glyphs.get(ch)
+            if glyph is None:
+                advance = self.font.getlength(ch)
+                if advance.is_integer():
+                    advance = int(advance)
+                glyph = glyphs[ch] = (advance, self.font.getbbox(ch))
+            advance, (l, t, r, b) = glyph
+            if left is None:
+                left, top, right, bottom = x + l, t, x + r, b
+            else:
+                left, top = min(left, x + l), min(top, t)
+                right, bottom = max(right, x + r), max(bottom, b)
+            x += advance
+        return left, top, right, bottom
+
+_measures = OrderedDict()
+_glyph_metrics = {}
+_measure_lock = threading.Lock()
+_measure_hits = 0
+_glyph_hits = 0
+_measure_misses = 0
+
+def _bbox(text, font):
+    global _glyph_hits, _measure_misses
+    metrics = _glyph_metrics.get(font)
+    if metrics is None:
+        metrics = _glyph_metrics[font] = _GlyphMetrics(font)
+    if not metrics.exact or not text or "\n" in text:
+        _measure_misses += 1
+        return font.getbbox(text)
+
+    composed = metrics.bbox(text)
+    if metrics.checked >= GLYPH_CALIBRATION:
+        _glyph_hits += 1
+        return composed
+
+    _measure_misses += 1
+    bbox = font.getbbox(text)
+    if tuple(bbox) == composed:
+        metrics.checked += 1
+    else:
+        metrics.exact = False
+    return bbox
+
+def text_size(text, font_type):
+    global _measure_hits
+    key = (font_type, text)
+    with _measure_lock:
+        size = _measures.get(key)
+        if size is not None:
+            _measures.move_to_end(key)
+            _measure_hits += 1
+            return size
+
+        left,top,right,bottom = _bbox(text, font_type)
+        size = _measures[key] = (right - left, bottom - top)
+        if len(_measures) > MEASURE_CACHE_SIZE:
+            _measures.popitem(last=False)
+        return size
+
+def measure_cache_stats():
+    with _measure_lock:
+        return {
+            "entries": len(_measures),
+            "hits": _measure_hits,
+            "glyph_hits": _glyph_hits,
+            "misses": _measure_misses,
+        }
+
+def clear_measure_cache():
+    global _measure_hits, _glyph_hits, _measure_misses
+    with _measure_lock:
+        _measures.clear()
+        _glyph_metrics.clear()
+        _measure_hits = 0
+        _glyph_hits = 0
+        _measure_misses = 0
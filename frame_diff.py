@@ -0,0 +1,130 @@
+#frame_diff.py
+"""Dirty-rectangle tracking between rendering and the panel driver.
+
+FrameDiff remembers the last packed 1bpp frame the panel showed and compares
+each new frame against it: the two are XORed in one bulk operation, the
+changed byte span of every row is read off the result, and neighbouring rows
+are merged into a few byte-aligned rectangles. plan() turns that into one of
+
+    SKIP      the panel already shows this frame
+    PARTIAL   windowed partial refreshes of plan.rects
+    FULL      the whole frame, when the panel state is unknown or most of it changed
+
+and send_frame() carries the plan out on an epdsession.Session.
+"""
+from collections import namedtuple
+
+SKIP = "skip"
+PARTIAL = "partial"
+FULL = "full"
+
+# Changed bands closer than this many rows are refreshed as one rectangle.
+MERGE_ROWS = 16
+# Each rectangle is a separate panel refresh; merge down to at most this many.
+MAX_RECTS = 2
+# Refresh the whole frame once the rectangles cover this much of it.
+FULL_RATIO = 0.6
+
+# rects are (x0, y0, x1, y1) in pixels, end-exclusive, x on byte boundaries.
+RefreshPlan = namedtuple("RefreshPlan", "kind rects")
+
+class FrameDiff:
+    """Tracks what the panel shows. Call shown() after every successful send."""
+
+    def __init__(self, width, height, merge_rows=MERGE_ROWS, max_rects=MAX_RECTS, full_ratio=FULL_RATIO):
+        self.width = width
+        self.height = height
+        self.stride = (width + 7) // 8
+        self.merge_rows = merge_rows
+        self.max_rects = max_rects
+        self.full_ratio = full_ratio
+        self._shown = None
+
+    def reset(self):
+        """Forget the panel contents (after an error, Clear or sleep without retention)."""
+        self._shown = None
+
+    def shown(self, frame):
+        """Record frame as what the panel now displays."""
+        self._shown = bytes(frame)
+
+    def _bands(self, frame):
+        """[y0, y1, first byte, end byte] for each run of consecutive changed rows."""
+        size = self.stride * self.height
+        diff = (int.from_bytes(self._shown, "big") ^ int.from_bytes(frame, "big")).to_bytes(size, "big")
+        first_row = (size - len(diff.lstrip(b"\0"))) // self.stride
+        end_row = (len(diff.rstrip(b"\0")) + self.stride - 1) // self.stride
+
+        bands = []
+        for y in range(first_row, end_row):
+            row = diff[y * self.stride:(y + 1) * self.stride]
+            trimmed = row.lstrip(b"\0")
+            if not trimmed:
+                continue
+            left, right = self.stride - len(trimmed), len(row.rstrip(b"\0"))
+            if bands and bands[-1][1] == y:
+                band = bands[-1]
+                band[1] = y + 1
+                band[2] = min(band[2], left)
+                band[3] = max(band[3], right)
+            else:
+                bands.append([y, y + 1, left, right])
+        return bands
+
+    def _merge(self, bands):
+        merged = []
+        for band in bands:
+            if merged and band[0] - merged[-1][1] <= self.merge_rows:
+                _join(merged[-1], band)
+            else:
+                merged.append(band)
+        while len(merged) > self.max_rects:
+            gaps = [merged[i + 1][0] - merged[i][1] for i in range(len(merged) - 1)]
+            i = gaps.index(min(gaps))
+            _join(merged[i], merged.pop(i + 1))
+        return merged
+
+    def dirty_rects(self, frame):
+        """Byte-aligned rectangles covering every change since the last shown frame."""
+        if self._shown is None:
+            return [(0, 0, self.width, self.height)]
+        if self._shown == frame:
+            return []
+        return [(left * 8, y0, min(self.width, right * 8), y1)
+                for y0, y1, left, right in self._merge(self._bands(frame))]
+
+    def plan(self, frame):
+        if self._shown is None:
+            return RefreshPlan(FULL, [(0, 0, self.width, self.height)])
+        rects = self.dirty_rects(frame)
+        if not rects:
+            return RefreshPlan(SKIP, [])
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects)
+        if area >= self.full_ratio * self.width * self.height:
+            return RefreshPlan(FULL, [(0, 0, self.width, self.height)])
+        return RefreshPlan(PARTIAL, rects)
+
+def send_frame(frames, panel, frame):
+    """Bring the panel of an epdsession.Session to frame as frames.plan() decides. Returns the plan.
+
+    FULL is a real full refresh in fast mode, which also clears the ghosting
+    partial refreshes build up; PARTIAL sends each rectangle with the
+    driver's display_Partial_Window.
+    """
+    plan = frames.plan(frame)
+    if plan.kind == FULL:
+        with panel.use("fast") as epd:
+            epd.display(frame)
+    elif plan.kind == PARTIAL:
+        with panel.use("part") as epd:
+            for rect in plan.rects:
+                epd.display_Partial_Window(frame, *rect)
+    if plan.kind != SKIP:
+        frames.shown(frame)
+    return plan
+
+def _join(band, other):
+    band[0] = min(band[0], other[0])
+    band[1] = max(band[1], other[1])
+    band[2] = min(band[2], other[2])
+    band[3] = max(band[3], other[3])
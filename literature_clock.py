@@ -1,31 +1,175 @@
 #literature_clock.py
 import json
+import logging
 import os
 import random
+import sys
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
-def get_current_time_quote():
-    now = datetime.now()
-    filepath = f"times/{now.hour:02d}_{now.minute:02d}.json"
+from quote_index import INDEX_PATH, MINUTES, POLICIES, TIMES_DIR, open_index
 
-    if not os.path.exists(filepath):
-        return {
-            "quote_first": None,
-            "quote_time_case": None,
-            "quote_last": None,
-            "title": None,
-            "author": None,
-            }
+EMPTY_QUOTE = {
+    "quote_first": None,
+    "quote_time_case": None,
+    "quote_last": None,
+    "title": None,
+    "author": None,
+    }
 
-    with open(filepath, "r", encoding="utf-8") as f:
-        quotes = json.load(f)
+def _quote_bytes(quote):
+    """Rough resident size of one decoded quote dict."""
+    return sys.getsizeof(quote) + sum(sys.getsizeof(v) for v in quote.values())
 
-    quote = random.choice(quotes)
-    return quote
+class QuoteStore:
+    """Resident quote cache, loaded lazily one hour block at a time.
+
+    Hour blocks live in an LRU bounded by max_bytes. The hour last looked up
+    and the block just loaded are never evicted, so a prefetch cannot push out
+    the hour being served (the store may exceed max_bytes by those). Each lookup schedules a background load of the following hour, so
+    the per-minute refreshes only hit memory once the store is warm.
+
+    policy names an entry of quote_index.POLICIES. Blocks only hold the quotes
+    it admits; minutes without one are filled from the nearest eligible minute,
+    precomputed in the compiled index or searched in times_dir without it.
+    """
+
+    def __init__(self, max_bytes=1024 * 1024, times_dir=TIMES_DIR, index_path=INDEX_PATH, prefetch=True, policy="all"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown quote policy {policy!r}, expected one of {sorted(POLICIES)}")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.times_dir = times_dir
+        self.prefetch = prefetch
+        self._index = open_index(index_path, times_dir)
+        self._blocks = OrderedDict()  # hour -> (60 quote lists, size in bytes)
+        self._bytes = 0
+        self._pending = set()
+        self._current = None          # hour last looked up, pinned in the LRU
+        self._lock = threading.Lock()
+
+    @property
+    def index_crc(self):
+        """crc of the compiled index quote ids refer to, or None without one."""
+        return self._index.crc if self._index is not None else None
+
+    @property
+    def resident_bytes(self):
+        return self._bytes
+
+    @property
+    def resident_hours(self):
+        """Hours held in memory, least recently used first."""
+        with self._lock:
+            return list(self._blocks)
+
+    def _read_minute(self, minute):
+        """Quotes the policy admits from times_dir for one minute of the day."""
+        filepath = os.path.join(self.times_dir, f"{minute // 60:02d}_{minute % 60:02d}.json")
+        if not os.path.exists(filepath):
+            return []
+        with open(filepath, "r", encoding="utf-8") as f:
+            admits = POLICIES[self.policy]
+            return [q for q in json.load(f) if admits(q)]
+
+    def _read_hour(self, hour):
+        if self._index is not None:
+            return [[self._index.quote(i) for i in self._index.quote_ids(hour, minute, self.policy)]
+                    for minute in range(60)]
+
+        # Without the index, search for the nearest eligible minute the way
+        # quote_index does at build time (wrapping midnight, earlier on ties).
+        read = {}
+        def eligible(minute):
+            minute %= MINUTES
+            if minute not in read:
+                read[minute] = self._read_minute(minute)
+            return read[minute]
+
+        minutes = []
+        for minute in range(hour * 60, hour * 60 + 60):
+            quotes = eligible(minute)
+            distance = 1
+            while not quotes and distance <= MINUTES // 2:
+                quotes = eligible(minute - distance) or eligible(minute + distance)
+                distance += 1
+            minutes.append(quotes)
+        return minutes
+
+    def _insert(self, hour, minutes):
+        size = sum(_quote_bytes(q) for quotes in minutes for q in quotes)
+        with self._lock:
+            if hour in self._blocks:
+                self._blocks.move_to_end(hour)
+                return self._blocks[hour][0]
+            self._blocks[hour] = (minutes, size)
+            self._bytes += size
+            pinned = (hour, self._current)
+            while self._bytes > self.max_bytes:
+                evicted = next((h for h in self._blocks if h not in pinned), None)
+                if evicted is None:
+                    break
+                _, evicted_size = self._blocks.pop(evicted)
+                self._bytes -= evicted_size
+                logging.debug("QuoteStore evicted hour %02d", evicted)
+        return minutes
+
+    def _hour(self, hour):
+        with self._lock:
+            self._current = hour
+            block = self._blocks.get(hour)
+            if block is not None:
+                self._blocks.move_to_end(hour)
+                return block[0]
+        return self._insert(hour, self._read_hour(hour))
+
+    def _prefetch_worker(self, hour):
+        try:
+            self._insert(hour, self._read_hour(hour))
+        except Exception as e:
+            logging.info("QuoteStore prefetch of hour %02d failed: %s", hour, e)
+        finally:
+            with self._lock:
+                self._pending.discard(hour)
+
+    def _schedule_prefetch(self, hour):
+        with self._lock:
+            if hour in self._blocks or hour in self._pending:
+                return
+            self._pending.add(hour)
+        threading.Thread(target=self._prefetch_worker, args=(hour,), daemon=True).start()
+
+    def quotes(self, hour, minute):
+        """All quotes for HH:MM (a shared list; do not mutate)."""
+        quotes = self._hour(hour)[minute]
+        if self.prefetch:
+            self._schedule_prefetch((hour + 1) % 24)
+        return quotes
+
+    def get_quote(self, hour, minute):
+        quotes = self.quotes(hour, minute)
+        if not quotes:
+            return dict(EMPTY_QUOTE)
+        return random.choice(quotes)
+
+    def get_current_time_quote(self):
+        now = datetime.now()
+        return self.get_quote(now.hour, now.minute)
+
+_default_store = None
+
+def get_current_time_quote(store=None):
+    global _default_store
+    if store is None:
+        if _default_store is None:
+            _default_store = QuoteStore()
+        store = _default_store
+    return store.get_current_time_quote()
 
 # Example usage
 if __name__ == "__main__":
     result = get_current_time_quote()
-    
+
     print(result["quote_first"] + result["quote_time_case"] + result["quote_last"])
     print("     -" + result["title"] + ", " + result["author"])
@@ -0,0 +1,131 @@
+#quote_bitmaps.py
+"""Pre-rendered quote blocks in the panel's packed 1bpp format.
+
+Every quote (text, title and author) is rendered once at build time and
+stored as zlib-compressed rows exactly as epd7in5_V2.EPD.getbuffer packs
+them (MSB first, 1 = black). At runtime the rows are copied straight into
+the frame buffer:
+
+    python quote_bitmaps.py     # writes times.bitmaps next to times.idx
+
+Layout (little-endian):
+
+    header      magic, version, row stride in bytes, quote count, layout key
+    table       per quote id: blob offset, blob length, first row, row count
+    blobs       zlib-compressed rows
+"""
+import mmap
+import os
+import struct
+import zlib
+
+from PIL import Image, ImageChops, ImageDraw
+
+from quote_index import INDEX_PATH, QuoteIndex
+from quote_layout import SCREEN_HEIGHT, SCREEN_WIDTH, TRAIN_REGION_TOP, draw_plan, get_plan, layout_key
+
+BITMAPS_PATH = "times.bitmaps"
+
+MAGIC = b"CLKB"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHII")
+_ENTRY = struct.Struct("<IIHH")
+
+# PIL packs 1 = white, the panel wants 1 = black.
+_INVERT = bytes(b ^ 0xFF for b in range(256))
+
+def render_block(quote):
+    """Render one quote block. Returns (first row, packed panel rows)."""
+    image = Image.new("1", (SCREEN_WIDTH, SCREEN_HEIGHT), 255)
+    draw_plan(ImageDraw.Draw(image), get_plan(quote))
+
+    bbox = ImageChops.invert(image.convert("L")).getbbox()
+    if bbox is None:
+        return 0, b""
+    top, bottom = bbox[1], min(bbox[3], TRAIN_REGION_TOP)
+    if top >= bottom:
+        return 0, b""
+    rows = image.crop((0, top, SCREEN_WIDTH, bottom)).tobytes("raw")
+    return top, rows.translate(_INVERT)
+
+def build_bitmaps(index_path=INDEX_PATH, out_path=BITMAPS_PATH):
+    """Render every quote in the compiled index into out_path."""
+    stride = SCREEN_WIDTH // 8
+    entries = []
+    blobs = bytearray()
+    with QuoteIndex(index_path) as index:
+        key = layout_key(index.crc)
+        for quote_id in range(len(index)):
+            top, rows = render_block(index.quote(quote_id))
+            blob = zlib.compress(rows, 9)
+            entries.append(_ENTRY.pack(len(blobs), len(blob), top, len(rows) // stride))
+            blobs += blob
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, stride, len(entries), key))
+        f.write(b"".join(entries))
+        f.write(blobs)
+    os.replace(tmp_path, out_path)
+    return len(entries)
+
+class QuoteBitmaps:
+    """Random access to a pre-rendered archive. The file is mapped once."""
+
+    def __init__(self, path=BITMAPS_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, stride, count, key = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} quote bitmap archive")
+        self.stride = stride
+        self.count = count
+        self.layout_key = key
+        self._blobs_start = _HEADER.size + count * _ENTRY.size
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def block(self, quote_id):
+        """(first row, packed rows) for a quote id."""
+        offset, length, top, _ = _ENTRY.unpack_from(self._mmap, _HEADER.size + quote_id * _ENTRY.size)
+        start = self._blobs_start + offset
+        return top, zlib.decompress(self._mmap[start:start + length])
+
+    def has(self, quote):
+        """True if the quote comes from the index this archive was built from."""
+        if not quote or quote.get("id") is None or quote.get("index_crc") is None:
+            return False
+        return quote["id"] < self.count and layout_key(quote["index_crc"]) == self.layout_key
+
+    def blit(self, buf, quote):
+        """Copy the quote's rows into a packed frame buffer. False if the quote is not archived."""
+        if not self.has(quote):
+            return False
+        top, rows = self.block(quote["id"])
+        start = top * self.stride
+        buf[start:start + len(rows)] = rows
+        return True
+
+def open_bitmaps(index_crc, path=BITMAPS_PATH):
+    """Open the archive if it exists and matches the index and layout code."""
+    if index_crc is None or not os.path.exists(path):
+        return None
+    bitmaps = QuoteBitmaps(path)
+    if bitmaps.layout_key != layout_key(index_crc):
+        bitmaps.close()
+        return None
+    return bitmaps
+
+if __name__ == "__main__":
+    count = build_bitmaps()
+    print(f"Wrote {count} quote bitmaps to {BITMAPS_PATH} ({os.path.getsize(BITMAPS_PATH)} bytes)")
@@ -0,0 +1,262 @@
+#quote_index.py
+"""Compile the times/ directory into a single memory-mapped quote index.
+
+Layout (all integers little-endian u32):
+
+    header          magic, version, policy count, quote count, crc32 of the records,
+                    fingerprint of the times/ files it was built from
+    minute table    1441 entries, first quote id of each minute (last = count)
+    offset table    count + 1 entries, byte offset of each record
+    per policy      (in POLICIES order)
+      fallback      1440 entries, minute whose quotes serve each minute
+      minute table  1441 entries, first position of each minute in ids
+      ids           eligible quote ids, grouped by minute
+    records         utf-8 fields joined by RECORD_SEP, in FIELDS order
+
+Quote ids are contiguous per minute, so a lookup is two table reads and
+one slice of the mapped file. Content policies are resolved at build time:
+a minute with no eligible quote falls back to the nearest minute that has
+one, so selection under any policy is a few table reads as well.
+
+open_index() rejects an index whose fingerprint (names, sizes and mtimes of
+the times/ files) no longer matches the directory, so an edited quote is
+never served from a stale index.
+"""
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import sys
+import zlib
+
+INDEX_PATH = "times.idx"
+TIMES_DIR = "times"
+
+MAGIC = b"CLKQ"
+VERSION = 3
+MINUTES = 24 * 60
+FIELDS = ("time", "quote_first", "quote_time_case", "quote_last", "title", "author", "sfw")
+RECORD_SEP = "\x1f"
+
+# Content policies and the quotes each one admits.
+POLICIES = {
+    "all": lambda quote: True,
+    "sfw": lambda quote: quote.get("sfw") == "yes",
+}
+
+_HEADER = struct.Struct("<4sHHIII")
+
+
+def _read_times(times_dir):
+    """Yield (minute, quotes) for every minute of the day, in order."""
+    for minute in range(MINUTES):
+        filepath = os.path.join(times_dir, f"{minute // 60:02d}_{minute % 60:02d}.json")
+        if not os.path.exists(filepath):
+            yield minute, []
+            continue
+        with open(filepath, "r", encoding="utf-8") as f:
+            yield minute, json.load(f)
+
+
+def sources_fingerprint(times_dir=TIMES_DIR):
+    """crc32 of the name, size and mtime of every times_dir/*.json file."""
+    crc = 0
+    for name in sorted(os.listdir(times_dir)):
+        if name.endswith(".json"):
+            st = os.stat(os.path.join(times_dir, name))
+            crc = zlib.crc32(f"{name}:{st.st_size}:{st.st_mtime_ns}\n".encode(), crc)
+    return crc
+
+
+def _pack_record(quote):
+    values = []
+    for field in FIELDS:
+        value = quote.get(field) or ""
+        if RECORD_SEP in value:
+            raise ValueError(f"Quote field {field!r} contains the record separator: {value!r}")
+        values.append(value)
+    return RECORD_SEP.join(values).encode("utf-8")
+
+
+def _nearest_minutes(has_quotes):
+    """For every minute, the closest minute (wrapping midnight, earlier on ties) with quotes."""
+    if not any(has_quotes):
+        return list(range(MINUTES))
+    nearest = []
+    for minute in range(MINUTES):
+        for distance in range(MINUTES):
+            if has_quotes[(minute - distance) % MINUTES]:
+                nearest.append((minute - distance) % MINUTES)
+                break
+            if has_quotes[(minute + distance) % MINUTES]:
+                nearest.append((minute + distance) % MINUTES)
+                break
+    return nearest
+
+
+def _policy_tables(eligible):
+    """Pack fallback, minute and id tables for one policy's per-minute id lists."""
+    minute_table, ids = [], []
+    for minute_ids in eligible:
+        minute_table.append(len(ids))
+        ids += minute_ids
+    minute_table.append(len(ids))
+    fallback = _nearest_minutes([bool(minute_ids) for minute_ids in eligible])
+    return fallback + minute_table + ids
+
+
+def build_index(times_dir=TIMES_DIR, out_path=INDEX_PATH):
+    """Compile times_dir/HH_MM.json into out_path. Returns the number of quotes."""
+    sources = sources_fingerprint(times_dir)
+    minute_table = []
+    offsets = [0]
+    records = bytearray()
+    eligible = {name: [] for name in POLICIES}
+
+    for minute, quotes in _read_times(times_dir):
+        minute_table.append(len(offsets) - 1)
+        for ids in eligible.values():
+            ids.append([])
+        for quote in quotes:
+            for name, admits in POLICIES.items():
+                if admits(quote):
+                    eligible[name][-1].append(len(offsets) - 1)
+            records += _pack_record(quote)
+            offsets.append(len(records))
+
+    count = len(offsets) - 1
+    minute_table.append(count)
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(POLICIES), count, zlib.crc32(records), sources))
+        f.write(struct.pack(f"<{len(minute_table)}I", *minute_table))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        for name in POLICIES:
+            tables = _policy_tables(eligible[name])
+            f.write(struct.pack(f"<{len(tables)}I", *tables))
+        f.write(records)
+    os.replace(tmp_path, out_path)
+    return count
+
+
+def _u32_table(buf, start, length):
+    view = buf[start:start + 4 * length]
+    if sys.byteorder == "little":
+        return view.cast("I")
+    return struct.unpack(f"<{length}I", view)
+
+
+class QuoteIndex:
+    """Read-only view over a compiled index. The file is mapped once."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mmap)
+
+        magic, version, policies, count, crc, sources = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION or policies != len(POLICIES):
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} quote index")
+
+        self.count = count
+        self.crc = crc
+        self.sources = sources
+        pos = _HEADER.size
+        self._minutes = _u32_table(self._buf, pos, MINUTES + 1)
+        pos += 4 * (MINUTES + 1)
+        self._offsets = _u32_table(self._buf, pos, count + 1)
+        pos += 4 * (count + 1)
+
+        self._policies = {}
+        for name in POLICIES:
+            fallback = _u32_table(self._buf, pos, MINUTES)
+            pos += 4 * MINUTES
+            minutes = _u32_table(self._buf, pos, MINUTES + 1)
+            pos += 4 * (MINUTES + 1)
+            ids = _u32_table(self._buf, pos, minutes[MINUTES])
+            pos += 4 * minutes[MINUTES]
+            self._policies[name] = (fallback, minutes, ids)
+
+        self._records = self._buf[pos:]
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        views = [self.__dict__.pop(name, None) for name in ("_minutes", "_offsets", "_records")]
+        for tables in self.__dict__.pop("_policies", {}).values():
+            views += tables
+        views.append(self.__dict__.pop("_buf", None))
+        for view in views:
+            if isinstance(view, memoryview):
+                view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def quote_ids(self, hour, minute, policy="all"):
+        """Ids of the quotes policy admits for HH:MM.
+
+        Ids come from the nearest minute with an eligible quote when HH:MM has
+        none. With the default policy this is a range over the minute's quotes,
+        other policies return a slice of their precomputed id table.
+        """
+        fallback, minutes, ids = self._policies[policy]
+        m = fallback[hour * 60 + minute]
+        if policy == "all":
+            return range(self._minutes[m], self._minutes[m + 1])
+        return ids[minutes[m]:minutes[m + 1]]
+
+    def quote(self, quote_id):
+        """Decode a single quote record into the dict shape of times/*.json.
+
+        id and index_crc identify the record, so prebuilt layouts and bitmaps
+        are only used for quotes of the index they were built from.
+        """
+        raw = bytes(self._records[self._offsets[quote_id]:self._offsets[quote_id + 1]])
+        quote = dict(zip(FIELDS, raw.decode("utf-8").split(RECORD_SEP)))
+        quote["id"] = quote_id
+        quote["index_crc"] = self.crc
+        return quote
+
+    def random_quote(self, hour, minute, policy="all"):
+        ids = self.quote_ids(hour, minute, policy)
+        if not ids:
+            return None
+        return self.quote(random.choice(ids))
+
+
+def open_index(path=INDEX_PATH, times_dir=TIMES_DIR):
+    """Open the compiled index, or return None if it is missing or out of date.
+
+    The index is out of date when times_dir exists and its files changed since
+    the build. Pass times_dir=None to skip the check.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        index = QuoteIndex(path)
+    except ValueError as e:
+        logging.warning("%s; rebuild it with quote_index.py", e)
+        return None
+    if times_dir is not None and os.path.isdir(times_dir) and index.sources != sources_fingerprint(times_dir):
+        index.close()
+        logging.warning("%s is older than %s; rebuild it with quote_index.py", path, times_dir)
+        return None
+    return index
+
+
+if __name__ == "__main__":
+    count = build_index()
+    print(f"Wrote {count} quotes to {INDEX_PATH} ({os.path.getsize(INDEX_PATH)} bytes)")
@@ -0,0 +1,249 @@
+#quote_layout.py
+"""Quote layout: font size selection and word placement for the quote box.
+
+layout_quote is the single layout engine: it produces an immutable
+LayoutPlan that is used both to pick the font size and to draw. Plans only
+depend on the quote text, so the whole corpus can be laid out offline:
+
+    python quote_layout.py      # writes times.layout.json next to times.idx
+"""
+import json
+import logging
+import os
+import zlib
+from collections import namedtuple
+
+from fonts import get_font, text_size, warm_fonts
+from quote_index import INDEX_PATH, QuoteIndex
+
+LAYOUT_PATH = "times.layout.json"
+
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 480
+QUOTE_HEIGHT = int(SCREEN_HEIGHT * 2 / 3) - 25
+PADDING_X = 30
+PADDING_TOP = 50
+MAX_WIDTH = SCREEN_WIDTH - 2 * PADDING_X
+BOX_RIGHT = SCREEN_WIDTH - PADDING_X
+BOX_BOTTOM = PADDING_TOP + QUOTE_HEIGHT
+# The train rows start here; everything above belongs to the time and quote.
+TRAIN_REGION_TOP = 375
+
+# Quote point sizes are searched in this range, inclusive.
+MIN_FONT_SIZE = 8
+MAX_FONT_SIZE = 40
+
+# Bump whenever plan_quote output changes, so prebuilt layouts and bitmaps go stale.
+LAYOUT_VERSION = 3
+
+# One positioned piece of text; font_key indexes quote_fonts(plan.size).
+Run = namedtuple("Run", "x y text font_key")
+LayoutPlan = namedtuple(
+    "LayoutPlan",
+    "size runs quote_line_height title_line_height height overflow",
+)
+
+# Font paths for dynamic sizing
+COURIER_PATH = "resources/Century.ttf"
+COURIER_BOLD_PATH = "resources/Century Bold.ttf"
+COURIER_ITALIC_PATH = "resources/Century Bold Italic.otf"
+
+# A time phrase followed by one of these keeps no trailing space.
+GLUE_PUNCTUATION = (".", ",", ":", ";", "\"", "!", "?", ")", "—", "-")
+
+def quote_fonts(size):
+    """Create quote, title, author fonts at given sizes. Title/author use 0.8x."""
+    return {
+        "quote": get_font(COURIER_PATH, size),
+        "quote_bold": get_font(COURIER_BOLD_PATH, int(size*1.1)),
+        "title": get_font(COURIER_ITALIC_PATH, max(12, int(size * 0.8))),
+        "author": get_font(COURIER_PATH, max(12, int(size * 0.8))),
+    }
+
+def warm_quote_fonts(sizes=range(MIN_FONT_SIZE, MAX_FONT_SIZE + 1)):
+    """Load the quote fonts for every candidate size."""
+    specs = []
+    for size in sizes:
+        specs += [
+            (COURIER_PATH, size),
+            (COURIER_BOLD_PATH, int(size*1.1)),
+            (COURIER_ITALIC_PATH, max(12, int(size * 0.8))),
+            (COURIER_PATH, max(12, int(size * 0.8))),
+        ]
+    warm_fonts(specs)
+
+def _quote_parts(quote):
+    return (
+        quote.get("quote_first") or "",
+        quote.get("quote_time_case") or "",
+        quote.get("quote_last") or "",
+        quote.get("title") or "",
+        quote.get("author") or "",
+    )
+
+def _wrap_title(title, tf, max_width):
+    title_lines = []
+    current_line, current_width = [], 0
+    for word in title.split():
+        word_w, _ = text_size(word + " ", tf)
+        if current_line and current_width + word_w > max_width:
+            title_lines.append(" ".join(current_line))
+            current_line = [word]
+            current_width = text_size(word + " ", tf)[0]
+        else:
+            current_line.append(word)
+            current_width += word_w
+    if current_line:
+        title_lines.append(" ".join(current_line))
+    return title_lines
+
+def _tokens(quote):
+    """Split the three quote segments into (word, font_key) tokens with their spacing."""
+    quote_first, quote_time_case, quote_last, _, _ = _quote_parts(quote)
+    segments = [(quote_first, "quote"), (quote_time_case, "quote_bold"), (quote_last, "quote")]
+    tokens = []
+    for i, (text, font_key) in enumerate(segments):
+        words = text.split()
+        for j, word in enumerate(words):
+            is_last = i == len(segments) - 1 and j == len(words) - 1
+            if i == 1 and j == len(words) - 1:
+                last_words = segments[2][0].split()
+                if last_words and last_words[0][:1] in GLUE_PUNCTUATION:
+                    is_last = True
+            tokens.append((word if is_last else word + " ", font_key))
+    return tokens
+
+def layout_quote(quote, size):
+    """Lay out the quote block at one font size.
+
+    height is the full block height, overflow is set when it exceeds
+    QUOTE_HEIGHT. Quote lines that would cross BOX_BOTTOM are left out of runs.
+    """
+    fonts = quote_fonts(size)
+    qf, qb, tf, af = fonts["quote"], fonts["quote_bold"], fonts["title"], fonts["author"]
+    _, _, _, title, author = _quote_parts(quote)
+
+    [_, hq] = text_size("j", qf)
+    [_, hqb] = text_size("j", qb)
+    quote_line_height = max(hq, hqb) + 5
+
+    placed = []
+    x, line = 0, 0
+    for word, font_key in _tokens(quote):
+        w, _ = text_size(word, fonts[font_key])
+        if x + w > MAX_WIDTH and x > 0:
+            x = 0
+            line += 1
+        placed.append((line, x, word, font_key))
+        x += w
+    quote_lines = line + 1 if placed else 0
+
+    [_, title_h] = text_size("X", tf)
+    title_line_height = title_h + 5
+    title_lines = _wrap_title(title, tf, MAX_WIDTH) if title else []
+    author_h = text_size("X", af)[1] if author else 0
+
+    height = quote_lines * quote_line_height + 10 + len(title_lines) * title_line_height + author_h
+
+    visible_lines = min(quote_lines, QUOTE_HEIGHT // quote_line_height)
+    runs = [
+        Run(PADDING_X + x, PADDING_TOP + line * quote_line_height, word, font_key)
+        for line, x, word, font_key in placed
+        if line < visible_lines
+    ]
+
+    title_y = PADDING_TOP + visible_lines * quote_line_height + 10
+    for title_line in title_lines:
+        line_w, _ = text_size(title_line, tf)
+        runs.append(Run(BOX_RIGHT - line_w, title_y, title_line, "title"))
+        title_y += title_line_height
+
+    if author:
+        [author_w, _] = text_size(author, af)
+        runs.append(Run(BOX_RIGHT - author_w, title_y, author, "author"))
+
+    return LayoutPlan(size, tuple(runs), quote_line_height, title_line_height, height, height > QUOTE_HEIGHT)
+
+def plan_quote(quote, min_size=MIN_FONT_SIZE, max_size=MAX_FONT_SIZE):
+    """Layout at the largest size in [min_size, max_size] that fits, by bisection.
+
+    Layout height grows with the point size, so O(log n) layouts find the
+    boundary. Falls back to min_size when nothing fits.
+    """
+    plan = layout_quote(quote, max_size)
+    if not plan.overflow:
+        return plan
+    # Invariant: hi overflows; lo fits (best) or is the fallback.
+    lo, hi, best = min_size, max_size, None
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        plan = layout_quote(quote, mid)
+        if plan.overflow:
+            hi = mid
+        else:
+            lo, best = mid, plan
+    return best or layout_quote(quote, min_size)
+
+def draw_plan(draw, plan):
+    fonts = quote_fonts(plan.size)
+    for run in plan.runs:
+        draw.text((run.x, run.y), run.text, font=fonts[run.font_key], fill=0)
+
+def build_layouts(index_path=INDEX_PATH, out_path=LAYOUT_PATH):
+    """Lay out every quote in the compiled index and write the plans to out_path."""
+    with QuoteIndex(index_path) as index:
+        layouts = [_plan_to_json(plan_quote(index.quote(i))) for i in range(len(index))]
+        data = {"layout_key": layout_key(index.crc), "layouts": layouts}
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, out_path)
+    return len(layouts)
+
+def layout_key(index_crc):
+    """Identifies plans built from a given index by this version of the layout code."""
+    return zlib.crc32(f"{index_crc}:{LAYOUT_VERSION}".encode())
+
+def _plan_to_json(plan):
+    return [plan.size, [list(run) for run in plan.runs], plan.quote_line_height,
+            plan.title_line_height, plan.height, plan.overflow]
+
+def _plan_from_json(data):
+    size, runs, quote_line_height, title_line_height, height, overflow = data
+    return LayoutPlan(size, tuple(Run(*run) for run in runs), quote_line_height,
+                      title_line_height, height, overflow)
+
+def load_layouts(index_crc, path=LAYOUT_PATH):
+    """Precomputed plans by quote id, or None if missing or stale."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("layout_key") != layout_key(index_crc):
+        logging.info("%s is stale, rebuild it with quote_layout.py", path)
+        return None
+    return data["layouts"]
+
+_layouts = {}    # (index crc, path) -> precomputed plans, or None
+
+def get_plan(quote, path=LAYOUT_PATH):
+    """Precomputed plan for quotes from the index, otherwise lay out on the fly.
+
+    The plans are only used when path was built from the index the quote
+    came from (its index_crc).
+    """
+    quote_id = quote.get("id")
+    index_crc = quote.get("index_crc")
+    if quote_id is None or index_crc is None:
+        return plan_quote(quote)
+    if (index_crc, path) not in _layouts:
+        _layouts[(index_crc, path)] = load_layouts(index_crc, path)
+    layouts = _layouts[(index_crc, path)]
+    if layouts is not None and quote_id < len(layouts):
+        return _plan_from_json(layouts[quote_id])
+    return plan_quote(quote)
+
+if __name__ == "__main__":
+    count = build_layouts()
+    print(f"Wrote {count} layouts to {LAYOUT_PATH} ({os.path.getsize(LAYOUT_PATH)} bytes)")
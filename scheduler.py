@@ -7,7 +7,11 @@ import signal
 import threading
 import requests
 
-from waveshare_epd import epd7in5_V2
+from waveshare_epd import epdconfig, epdregistry
+from waveshare_epd.epdbase import FAST, PARTIAL, WINDOW
+from waveshare_epd.epdbusy import busy_stats
+from waveshare_epd.epdsequence import sequence_stats
+from waveshare_epd.epdspi import spi_stats
 from PIL import Image,ImageDraw,ImageFont
 
 from draw_screen import draw_time
@@ -15,18 +19,55 @@ from draw_screen import draw_quote
 from draw_screen import draw_trains
 from draw_screen import draw_splashscreen
 
-from literature_clock import get_current_time_quote
+from fonts import font_cache_stats, measure_cache_stats
+from frame_diff import SKIP, FrameDiff, send_frame
+from literature_clock import QuoteStore
+from quote_layout import TRAIN_REGION_TOP, warm_quote_fonts
+from quote_bitmaps import open_bitmaps
 
-epd = epd7in5_V2.EPD()
+# Content policy for quotes, see quote_index.POLICIES ("all" or "sfw")
+QUOTE_POLICY = "all"
+
+# The panel stays initialized between refreshes and deep-sleeps after this long idle
+PANEL_IDLE_S = 60
+
+# frame_diff.send_frame refreshes rectangles with display_Partial_Window
+epd = epdregistry.create(require=(PARTIAL, FAST, WINDOW))
+quote_store = QuoteStore(policy=QUOTE_POLICY)
+quote_bitmaps = open_bitmaps(quote_store.index_crc)
+panel_frames = FrameDiff(epd.width, epd.height)
 existing_image = None
 existing_draw = None
+existing_quote = None
 
 shutdown_event = asyncio.Event()
-epd_lock = threading.Lock()
+epd_lock = threading.RLock()
+panel = epd.session(idle_s=PANEL_IDLE_S, lock=epd_lock)
 
 import logging
 logging.basicConfig(level=logging.DEBUG)
 
+def render_quote(draw, quote):
+    """Draw the quote with PIL unless it can be blitted from the pre-rendered archive."""
+    global existing_quote
+    existing_quote = quote
+    if quote_bitmaps is None or not quote_bitmaps.has(quote):
+        draw_quote(draw, quote)
+
+def frame_buffer(image):
+    buf = epd.getbuffer(image)
+    if quote_bitmaps is not None and isinstance(buf, bytearray):
+        quote_bitmaps.blit(buf, existing_quote)
+    return buf
+
+def send_partial(buf):
+    """Refresh only what differs from the panel, or all of it when most changed. False if the frame is unchanged."""
+    plan = send_frame(panel_frames, panel, buf)
+    if plan.kind == SKIP:
+        return False
+    logging.debug("Refresh (%s) of %s", plan.kind, plan.rects)
+    return True
+
 def full_display_update():
     global existing_draw, existing_image
 
@@ -34,29 +75,34 @@ def full_display_update():
 
     with epd_lock:
         try:
-            epd.init_fast()
             screen_image = Image.new('1',(epd.width, epd.height),255)
             draw = ImageDraw.Draw(screen_image)
 
             timestr = time.strftime("%I:%M %p")
-            quote = get_current_time_quote()
+            quote = quote_store.get_current_time_quote()
 
             draw_time(draw, timestr)
-            draw_quote(draw, quote)
+            render_quote(draw, quote)
             draw_trains(draw)
 
             existing_draw = draw
             existing_image = screen_image
 
-            epd.display(epd.getbuffer(screen_image))
-            logging.info("Closing connection after full refresh")
-            epd.sleep()
+            buf = frame_buffer(screen_image)
+            with panel.use("fast"):
+                epd.display(buf)
+            panel_frames.shown(buf)
+            logging.debug("Font cache: %s, measure cache: %s", font_cache_stats(), measure_cache_stats())
+            logging.debug("Panel sequences: %s, busy waits: %s", sequence_stats(), busy_stats())
+            logging.debug("Panel SPI: %s", spi_stats())
+            logging.info("Full refresh done")
         except IOError as e:
+            panel_frames.reset()
             logging.info(e)
             
         except KeyboardInterrupt:    
             logging.info("ctrl + c:")
-            epd7in5_V2.epdconfig.module_exit(cleanup=True)
+            epdconfig.module_exit(cleanup=True)
             exit()
 
 def partial_screen_refresh():
@@ -71,27 +117,27 @@ def partial_screen_refresh():
             return
 
         try:
-            epd.init_part()
-
             existing_draw.rectangle((0,0,epd.width,epd.height), fill = 255)
             
             timestr = time.strftime("%I:%M %p")
-            quote = get_current_time_quote()
+            quote = quote_store.get_current_time_quote()
 
             draw_time(existing_draw, timestr)
-            draw_quote(existing_draw, quote)
+            render_quote(existing_draw, quote)
             draw_trains(existing_draw)
 
-            epd.display_Partial(epd.getbuffer(existing_image),0,0,epd.width,epd.height)
-            logging.info("Closing connection after partial refresh")
-            epd.sleep()
+            if not send_partial(frame_buffer(existing_image)):
+                logging.info("Screen unchanged, skipping partial refresh")
+                return
+            logging.info("Partial refresh done")
 
         except IOError as e:
+            panel_frames.reset()
             logging.info(e)
             
         except KeyboardInterrupt:    
             logging.info("ctrl + c:")
-            epd7in5_V2.epdconfig.module_exit(cleanup=True)
+            epdconfig.module_exit(cleanup=True)
             exit()
 
 def partial_train_refresh():
@@ -106,21 +152,22 @@ def partial_train_refresh():
             return
 
         try:
-            epd.init_part()
-
-            existing_draw.rectangle((0,375,epd.width,epd.height), fill = 255)
+            existing_draw.rectangle((0,TRAIN_REGION_TOP,epd.width,epd.height), fill = 255)
             draw_trains(existing_draw)
 
-            epd.display_Partial(epd.getbuffer(existing_image),0,0,epd.width,epd.height)
-            logging.info("Closing connection after partial refresh")
-            epd.sleep()
+            # Only the train band was repainted, so at most that band is sent
+            if not send_partial(frame_buffer(existing_image)):
+                logging.info("Trains unchanged, skipping partial refresh")
+                return
+            logging.info("Partial refresh done")
 
         except IOError as e:
+            panel_frames.reset()
             logging.info(e)
             
         except KeyboardInterrupt:    
             logging.info("ctrl + c:")
-            epd7in5_V2.epdconfig.module_exit(cleanup=True)
+            epdconfig.module_exit(cleanup=True)
             exit()
 
 def install_signal_handlers():
@@ -173,15 +220,17 @@ async def scheduler():
         print("Shutdown requested — waiting for running tasks to finish...")
         if tasks:
             await asyncio.gather(*tasks, return_exceptions=True)
-        epd.init_fast()
-        epd.Clear()
-        epd7in5_V2.epdconfig.module_exit(cleanup=True)
+        with panel.use("fast"):
+            epd.Clear()
+        panel_frames.reset()
+        panel.sleep()
+        epdconfig.module_exit(cleanup=True)
         print("Scheduler stopped cleanly.")
 
 
 def prepare():
+    warm_quote_fonts()
     try:
-        epd.init()
         screen_image = Image.new('1',(epd.width, epd.height),255)
         draw = ImageDraw.Draw(screen_image)
 
@@ -189,14 +238,16 @@ def prepare():
         screen_image.paste(bmp, (0,0))
         draw_splashscreen(draw)
 
-        epd.display(epd.getbuffer(screen_image))
-        epd.sleep()
+        buf = epd.getbuffer(screen_image)
+        with panel.use("full"):
+            epd.display(buf)
+        panel_frames.shown(buf)
     except IOError as e:
         logging.info(e)
         
     except KeyboardInterrupt:    
         logging.info("ctrl + c:")
-        epd7in5_V2.epdconfig.module_exit(cleanup=True)
+        epdconfig.module_exit(cleanup=True)
         exit()
 
 async def main():
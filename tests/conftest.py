@@ -0,0 +1,38 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Drivers talk to the simulated panel, never to hardware
+os.environ["EPD_BACKEND"] = "sim"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# fonts and resources are opened relative to the repository root
+os.chdir(ROOT)
+
+def write_times(times_dir, quotes_by_minute):
+    """Write {(hour, minute): [quote, ...]} as times/HH_MM.json files."""
+    os.makedirs(times_dir, exist_ok=True)
+    for (hour, minute), quotes in quotes_by_minute.items():
+        with open(os.path.join(times_dir, f"{hour:02d}_{minute:02d}.json"), "w", encoding="utf-8") as f:
+            json.dump(quotes, f)
+    return str(times_dir)
+
+def make_quote(text, time_case="ten past one", sfw="yes"):
+    return {
+        "time": "01:10",
+        "quote_first": text + " ",
+        "quote_time_case": time_case,
+        "quote_last": ".",
+        "title": "A Title",
+        "author": "An Author",
+        "sfw": sfw,
+    }
+
+@pytest.fixture
+def times_factory(tmp_path):
+    def factory(name, quotes_by_minute):
+        return write_times(tmp_path / name, quotes_by_minute)
+    return factory
@@ -0,0 +1,81 @@
+"""getbuffer / getbuffer_4Gray of every driver against stored digests.
+
+Each driver is created on the simulated backend and fed the same drawings
+in landscape and portrait orientation, so a driver wired to the wrong
+packer, rotation or inversion changes its digest. After an intended output
+change, rewrite the digests with
+
+    python tests/test_driver_buffers.py
+"""
+import hashlib
+import json
+import os
+import random
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import conftest  # noqa: F401  (sim backend, repository root)
+
+from waveshare_epd import epdbuffer, epdregistry
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "driver_buffers.json")
+
+COLORS = ((0, 0, 0), (255, 255, 255), (128, 128, 128), (192, 192, 192), (64, 64, 64),
+          (255, 0, 0), (255, 255, 0), (0, 255, 0), (0, 0, 255), (255, 128, 0), (90, 160, 220))
+
+def drawing(width, height):
+    """A reproducible RGB frame: solid and gray areas, saturated colors and a diagonal."""
+    rng = random.Random(width * 10007 + height)
+    image = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for _ in range(120):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.rectangle((x, y, x + rng.randrange(1, 40), y + rng.randrange(1, 20)), fill=rng.choice(COLORS))
+    draw.line((0, 0, width - 1, height - 1), fill=(0, 0, 0), width=3)
+    return image
+
+def digest(buf):
+    return hashlib.sha1(bytes(b & 0xFF for b in buf)).hexdigest()
+
+def driver_digests(name):
+    epd = epdregistry.load(name).EPD()
+    width, height = epd.width, epd.height
+    methods = ["getbuffer"] + (["getbuffer_4Gray"] if hasattr(epd, "getbuffer_4Gray") else [])
+    digests = {}
+    for w, h in ((width, height), (height, width)):
+        image = drawing(w, h)
+        for method in methods:
+            digests[f"{method} {w}x{h}"] = digest(getattr(epd, method)(image))
+    return digests
+
+def load_golden():
+    with open(GOLDEN_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_every_driver_has_digests():
+    assert sorted(load_golden()) == epdregistry.models()
+
+@pytest.mark.parametrize("name", epdregistry.models())
+def test_getbuffer_matches_golden(name):
+    assert driver_digests(name) == load_golden()[name]
+
+@pytest.mark.parametrize("name", ["epd4in01f", "epd5in65f", "epd7in3e", "epd7in3f"])
+@pytest.mark.parametrize("dither", [epdbuffer.NO_DITHER, epdbuffer.ORDERED])
+def test_gray_maps_to_black_and_white(name, dither):
+    # Nearest-color alone would put mid gray on orange (or another color)
+    module = epdregistry.load(name)
+    epd = module.EPD()
+    image = Image.new("RGB", (epd.width, epd.height), (128, 128, 128))
+    colors = [module.PALETTE[i:i + 3] for i in range(0, len(module.PALETTE), 3)]
+    indices = set(epdbuffer.quantize(image, epd.width, epd.height, module.PALETTE, dither))
+    assert indices <= {colors.index((0, 0, 0)), colors.index((255, 255, 255))}
+
+if __name__ == "__main__":
+    golden = {name: driver_digests(name) for name in epdregistry.models()}
+    with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+        json.dump(golden, f, indent=1, sort_keys=True)
+        f.write("\n")
+    print(f"Wrote digests of {len(golden)} drivers to {GOLDEN_PATH}")
@@ -0,0 +1,40 @@
+from PIL import Image, ImageDraw
+
+from waveshare_epd import epd7in5_V2, epdbuffer, epdconfig
+from waveshare_epd.epdsim import Simulator
+
+def frame(epd, line=True):
+    image = Image.new("1", (epd.width, epd.height), 255)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((10, 20, 300, 200), fill=0)
+    if line:
+        draw.line((0, 479, 799, 0), fill=0, width=5)
+    return image
+
+def test_display_loads_both_planes():
+    sim = epdconfig.use_backend(Simulator())
+    epd = epd7in5_V2.EPD()
+    image = frame(epd)
+    buf = epd.getbuffer(image)
+    epd.init()
+    epd.display(buf)
+    assert sim.old_ram == epdbuffer.invert(buf)
+    assert sim.new_ram == buf
+    assert sim.image().tobytes() == image.tobytes()
+
+def test_display_partial_window_sends_only_the_window():
+    sim = epdconfig.use_backend(Simulator())
+    epd = epd7in5_V2.EPD()
+    blank = epd.getbuffer(Image.new("1", (epd.width, epd.height), 255))
+    epd.init_fast()
+    epd.display(blank)
+    # Only the rectangle, which lies inside the window
+    image = frame(epd, line=False)
+    buf = epd.getbuffer(image)
+    epd.init_part()
+    sim.clear_trace()
+    epd.display_Partial_Window(buf, 10, 20, 301, 201)
+
+    data = [c.data for c in sim.trace if c.command == 0x13]
+    assert len(data) == 1 and len(data[0]) == (304 - 8) // 8 * 181
+    assert sim.image().tobytes() == image.tobytes()
@@ -0,0 +1,26 @@
+from waveshare_epd import epd2in13d, epd7in5_V2, epdconfig
+from waveshare_epd.epdsim import Simulator
+
+def busy_commands(epd):
+    """Commands sent by ReadBusy on an idle panel, then during a full refresh."""
+    sim = epdconfig.use_backend(Simulator())
+    epd.init()
+    sim.clear_trace()
+    epd.ReadBusy()
+    idle = sim.commands()
+    epd.send_command(0x12)
+    sim.clear_trace()
+    epd.ReadBusy()
+    return idle, sim.commands()
+
+def test_status_command_before_first_read():
+    # epd7in5_V2: 0x71, read, [0x71, read]... so an idle panel still gets one
+    idle, busy = busy_commands(epd7in5_V2.EPD())
+    assert idle == [0x71]
+    assert busy == [0x71] * (3500 // 10 + 1)
+
+def test_status_command_only_while_busy():
+    # epd2in13d: read, [0x71, wait, read]... so an idle panel gets none
+    idle, busy = busy_commands(epd2in13d.EPD())
+    assert idle == []
+    assert busy == [0x71] * (3500 // 100)
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from waveshare_epd import epd7in5_V2, epdconfig
+from waveshare_epd.epdgpio import Gpiochip, MockChip
+
+class RecordingSpi:
+    """The spidev.SpiDev calls the backend makes."""
+
+    def __init__(self):
+        self.max_speed_hz = 0
+        self.mode = 0
+        self.no_cs = False
+        self.written = []
+
+    def open(self, bus, device):
+        pass
+
+    def close(self):
+        pass
+
+    def writebytes2(self, data):
+        self.written.append(bytes(data))
+
+def backend(manage_cs=True):
+    gpio = Gpiochip(chip=MockChip(), spi=RecordingSpi(), manage_cs=manage_cs)
+    gpio.module_init()
+    gpio.chip.writes.clear()
+    return gpio
+
+def test_write_pins_is_one_group_write():
+    gpio = backend()
+    gpio.write_pins(((gpio.DC_PIN, 1), (gpio.CS_PIN, 0)))
+    assert gpio.chip.writes == [(gpio.levels, gpio.masks[gpio.DC_PIN] | gpio.masks[gpio.CS_PIN])]
+    assert gpio.chip.levels[gpio.DC_PIN] == 1 and gpio.chip.levels[gpio.CS_PIN] == 0
+    # RST and PWR are left as they were
+    assert gpio.chip.levels[gpio.RST_PIN] == 1 and gpio.chip.levels[gpio.PWR_PIN] == 1
+
+def test_cs_writes_are_ignored_when_spi_owns_cs():
+    gpio = backend(manage_cs=False)
+    gpio.write_pins(((gpio.CS_PIN, 0),))
+    gpio.digital_write(gpio.CS_PIN, 1)
+    assert gpio.chip.writes == []
+    gpio.write_pins(((gpio.DC_PIN, 1), (gpio.CS_PIN, 0)))
+    assert gpio.chip.writes == [(gpio.levels, gpio.masks[gpio.DC_PIN])]
+
+def test_outputs_read_back_through_digital_read():
+    gpio = backend()
+    gpio.digital_write(gpio.RST_PIN, 0)
+    gpio.digital_write(gpio.DC_PIN, 1)
+    assert gpio.digital_read(gpio.RST_PIN) == 0 and gpio.chip.levels[gpio.RST_PIN] == 0
+    assert gpio.digital_read(gpio.DC_PIN) == 1 and gpio.chip.levels[gpio.DC_PIN] == 1
+    assert len(gpio.chip.writes) == 2
+
+def test_wait_pin_wakes_on_edge():
+    gpio = backend()
+    gpio.chip.set_input(gpio.BUSY_PIN, 0)
+    timer = threading.Timer(0.05, gpio.chip.set_input, args=(gpio.BUSY_PIN, 1))
+    start = time.monotonic()
+    timer.start()
+    try:
+        assert gpio.wait_pin(gpio.BUSY_PIN, 1, timeout_ms=5000)
+    finally:
+        timer.cancel()
+    assert time.monotonic() - start < 2.0
+    assert gpio.digital_read(gpio.BUSY_PIN) == 1
+
+def test_wait_pin_times_out_without_edge():
+    gpio = backend()
+    gpio.chip.set_input(gpio.BUSY_PIN, 0)
+    start = time.monotonic()
+    assert not gpio.wait_pin(gpio.BUSY_PIN, 1, timeout_ms=50)
+    assert time.monotonic() - start >= 0.05
+
+def test_driver_command_is_one_write_for_dc_and_cs():
+    gpio = epdconfig.use_backend(backend())
+    epd = epd7in5_V2.EPD()
+    epd.send_command(0x12)
+    dc, cs = gpio.masks[gpio.DC_PIN], gpio.masks[gpio.CS_PIN]
+    # DC low and CS low together, then CS released
+    assert [mask for _, mask in gpio.chip.writes] == [dc | cs, cs]
+    assert gpio.SPI.written == [b"\x12"]
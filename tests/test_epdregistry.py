@@ -0,0 +1,48 @@
+import pytest
+
+from waveshare_epd import epdbase, epdconfig, epdregistry
+from waveshare_epd.epdbase import FAST, GRAY4, PARTIAL, WINDOW
+from waveshare_epd.epdsim import Simulator
+
+# What scheduler.py asks for
+SCHEDULER_CAPS = (PARTIAL, FAST, WINDOW)
+
+# Methods each capability promises, and its epdsession mode
+PROMISES = {
+    PARTIAL: ("init_part",),
+    FAST: ("init_fast",),
+    GRAY4: ("init_4Gray", "getbuffer_4Gray", "display_4Gray"),
+    WINDOW: ("display_Partial_Window",),
+}
+MODES = {PARTIAL: "part", FAST: "fast", GRAY4: "4gray"}
+
+CAPABLE_MODELS = [name for name in epdregistry.models() if epdregistry.load(name).EPD.CAPS]
+
+def test_create_checks_required_capabilities():
+    epd = epdregistry.create("epd7in5_V2", require=SCHEDULER_CAPS)
+    assert epd.width == 800 and epd.height == 480
+    # Partial and fast refresh, but no display_Partial_Window
+    with pytest.raises(ValueError, match="window"):
+        epdregistry.create("epd2in13_V4", require=SCHEDULER_CAPS)
+
+@pytest.mark.parametrize("name", epdregistry.models())
+def test_declared_capabilities_are_implemented(name):
+    cls = epdregistry.load(name).EPD
+    assert issubclass(cls, epdbase.EPDBase)
+    for cap in cls.CAPS:
+        for method in PROMISES[cap]:
+            assert callable(getattr(cls, method, None)), (cap, method)
+    if WINDOW not in cls.CAPS:
+        assert not hasattr(cls, "display_Partial_Window")
+    assert set(cls.SEQUENCES) <= {"full", "fast", "part", "4gray"}
+    assert callable(cls.session)
+
+@pytest.mark.parametrize("name", CAPABLE_MODELS)
+def test_session_initializes_every_declared_mode(name):
+    epd = epdregistry.create(name)
+    for mode in ["full"] + sorted(MODES[cap] for cap in epd.CAPS if cap in MODES):
+        sim = epdconfig.use_backend(Simulator(busy_level=1 - epd.BUSY_IDLE))
+        with epd.session(idle_s=60) as panel:
+            with panel.use(mode):
+                assert panel.mode == mode
+        assert sim.trace, mode
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from waveshare_epd import epd7in5_V2, epdconfig
+from waveshare_epd.epdsim import Simulator
+
+def panel_commands(sim):
+    """Commands sent since the last clear_trace, without the 0x71 status polls."""
+    commands = [c for c in sim.commands() if c != 0x71]
+    sim.clear_trace()
+    return commands
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.fixture
+def sim():
+    return epdconfig.use_backend(Simulator())
+
+@pytest.fixture
+def epd(sim):
+    return epd7in5_V2.EPD()
+
+# Only power on and off between refreshes of the same mode
+REUSE = [0x04, 0x02]
+
+def test_same_mode_only_powers_on(sim, epd):
+    with epd.session(idle_s=60) as panel:
+        with panel.use("fast"):
+            pass
+        assert 0x00 in panel_commands(sim)      # PANNEL SETTING of the init
+        with panel.use("fast"):
+            pass
+        assert panel_commands(sim) == REUSE
+
+def test_mode_change_initializes_again(sim, epd):
+    with epd.session(idle_s=60) as panel:
+        with panel.use("fast"):
+            pass
+        sim.clear_trace()
+        with panel.use("part"):
+            assert panel.mode == "part"
+        assert panel_commands(sim) == [0x00, 0x04, 0xE0, 0xE5, 0x02]
+
+def test_error_initializes_again(sim, epd):
+    with epd.session(idle_s=60) as panel:
+        with pytest.raises(RuntimeError):
+            with panel.use("fast"):
+                raise RuntimeError("display failed")
+        assert panel.mode is None
+        sim.clear_trace()
+        with panel.use("fast"):
+            pass
+        assert panel_commands(sim)[:2] == [0x00, 0x50]
+
+def test_deep_sleep_after_idle(sim, epd):
+    panel = epd.session(idle_s=0.05)
+    with panel.use("fast"):
+        pass
+    assert panel.awake and not sim.sleeping
+    _wait_for(lambda: not panel.awake)
+    assert sim.sleeping and panel.mode is None
+
+def test_new_use_cancels_the_stale_idle_timer(sim, epd):
+    panel = epd.session(idle_s=0.5)
+    with panel.use("fast"):
+        pass
+    time.sleep(0.35)
+    with panel.use("fast"):
+        pass
+    # The first use's timer would have fired by now
+    time.sleep(0.35)
+    assert panel.awake and not sim.sleeping
+    _wait_for(lambda: not panel.awake)
+    assert sim.sleeping
+
+def test_leaving_the_session_sleeps_at_once(sim, epd):
+    with epd.session(idle_s=60) as panel:
+        with panel.use("full"):
+            pass
+    assert not panel.awake and sim.sleeping
@@ -0,0 +1,65 @@
+import pytest
+
+from waveshare_epd import epd7in5_V2, epdconfig
+from waveshare_epd.epdsim import MAX_HZ, Simulator
+from waveshare_epd.epdspi import CALIBRATION_HZ, Transport, calibrate, spi_stats
+
+class RecordingSpi:
+    """Just the spidev calls Transport makes, recording each transfer."""
+
+    def __init__(self):
+        self.sent = []
+
+    def writebytes(self, data):
+        self.sent.append(("writebytes", list(data)))
+
+    def writebytes2(self, data):
+        self.sent.append(("writebytes2", list(data)))
+
+    def xfer3(self, data):
+        self.sent.append(("xfer3", list(data)))
+        return [0] * len(data)
+
+@pytest.fixture
+def sim():
+    return epdconfig.use_backend(Simulator())
+
+@pytest.mark.parametrize("size", [1, 63, 64, 65, 1000])
+def test_write_never_exceeds_chunk(size):
+    spi = RecordingSpi()
+    transport = Transport(spi, speed_hz=1000000, chunk=64, xfer3=False)
+    data = bytes(range(256)) * 4
+    transport.write(data[:size])
+
+    assert all(len(part) <= 64 for _, part in spi.sent)
+    assert [b for _, part in spi.sent for b in part] == list(data[:size])
+    stats = transport.stats()
+    assert stats["chunk"] == 64
+    assert stats["transfers"] == len(spi.sent) == -(-size // 64)
+    assert stats["bytes"] == size
+
+def test_write_uses_the_configured_call():
+    spi = RecordingSpi()
+    transport = Transport(spi, speed_hz=1000000, chunk=64, xfer3=True)
+    transport.write([0x12])
+    transport.write([0x07], spi.writebytes)
+    assert [call for call, _ in spi.sent] == ["xfer3", "writebytes"]
+    assert transport.stats()["transfers"] == 2
+
+def test_spi_stats_reads_the_backend_transport(sim):
+    epd = epd7in5_V2.EPD()
+    epd.init()
+    stats = spi_stats()
+    assert stats == sim.transport.stats()
+    assert stats["bytes"] == sim.spi_bytes
+    assert stats["transfers"] == sim.spi_transfers > 0
+
+def test_calibrate_stops_at_the_first_corrupting_clock(sim):
+    best, results = calibrate(epd7in5_V2.EPD())
+
+    assert best == max(hz for hz in CALIBRATION_HZ if hz <= MAX_HZ)
+    assert all(r["ok"] for r in results[:-1])
+    failed = results[-1]
+    assert not failed["ok"]
+    assert failed["hz"] == min(hz for hz in CALIBRATION_HZ if hz > MAX_HZ)
+    assert sim.transport.speed_hz == best
@@ -0,0 +1,54 @@
+import pytest
+from PIL import Image, ImageDraw
+
+from frame_diff import FULL, PARTIAL, SKIP, FrameDiff, send_frame
+from waveshare_epd import epd7in5_V2, epdconfig
+from waveshare_epd.epdsession import Session
+from waveshare_epd.epdsim import Simulator
+
+@pytest.fixture
+def panel():
+    sim = epdconfig.use_backend(Simulator())
+    epd = epd7in5_V2.EPD()
+    session = Session(epd, idle_s=3600)
+    yield sim, epd, session
+    session.sleep()
+
+def packed(epd, boxes):
+    image = Image.new("1", (epd.width, epd.height), 255)
+    draw = ImageDraw.Draw(image)
+    for box in boxes:
+        draw.rectangle(box, fill=0)
+    return image, epd.getbuffer(image)
+
+def test_plan_kinds_pick_the_refresh(panel):
+    sim, epd, session = panel
+    frames = FrameDiff(epd.width, epd.height)
+
+    # Panel state unknown: full refresh
+    image, buf = packed(epd, [(100, 100, 200, 200)])
+    assert send_frame(frames, session, buf).kind == FULL
+    assert 0x91 not in sim.commands() and 0x10 in sim.commands()
+    assert sim.image().tobytes() == image.tobytes()
+
+    # Small change: windowed partial refresh
+    sim.clear_trace()
+    image, buf = packed(epd, [(100, 100, 200, 200), (600, 400, 640, 420)])
+    assert send_frame(frames, session, buf).kind == PARTIAL
+    assert 0x91 in sim.commands() and 0x10 not in sim.commands()
+    assert sim.image().tobytes() == image.tobytes()
+
+    # Unchanged: nothing sent
+    sim.clear_trace()
+    assert send_frame(frames, session, buf).kind == SKIP
+    assert sim.commands() == []
+
+    # Most of the frame changed: a real full refresh, not partial windows
+    sim.clear_trace()
+    refreshes = sim.refreshes
+    image, buf = packed(epd, [(0, 0, 799, 400)])
+    assert send_frame(frames, session, buf).kind == FULL
+    assert 0x91 not in sim.commands() and 0x10 in sim.commands()
+    assert sim.refreshes == refreshes + 1 and not sim.partial
+    assert sim.image().tobytes() == image.tobytes()
+    assert frames.plan(buf).kind == SKIP
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+# Importing each module must not need any of these (they are only used once
+# a hardware backend is created).
+HARDWARE_MODULES = ("RPi", "Jetson", "Hobot", "spidev", "gpiozero", "lgpio")
+
+SCRIPT = """
+import glob, importlib, importlib.abc, os, sys
+
+class Block(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        if name.split('.')[0] in %r:
+            raise ImportError('blocked ' + name)
+
+sys.meta_path.insert(0, Block())
+import waveshare_epd
+# .py modules only: the package also ships ctypes libraries (DEV_Config_*.so)
+names = sorted(os.path.basename(p)[:-3] for p in glob.glob(os.path.join(waveshare_epd.__path__[0], '*.py')))
+for name in names:
+    importlib.import_module('waveshare_epd.' + name)
+loaded = sorted(m for m in sys.modules if m.split('.')[0] in %r)
+assert not loaded, loaded
+print(len(names))
+""" % (HARDWARE_MODULES, HARDWARE_MODULES)
+
+def test_every_module_imports_without_gpio_libraries():
+    env = dict(os.environ, EPD_BACKEND="sim")
+    result = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert int(result.stdout) > 64
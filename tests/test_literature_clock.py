@@ -0,0 +1,106 @@
+import os
+import time
+
+import pytest
+
+from literature_clock import QuoteStore
+from quote_index import build_index, open_index
+
+from conftest import make_quote
+
+QUOTES = {
+    (0, 1): [make_quote("Just after midnight.", sfw="no")],
+    (1, 10): [make_quote("Ten past one.")],
+    (1, 12): [make_quote("Twelve past, not safe.", sfw="no")],
+    (1, 20): [make_quote("Twenty past one."), make_quote("Another twenty past.", sfw="no")],
+    (23, 58): [make_quote("Nearly midnight.")],
+}
+
+def _texts(store, hour, minute):
+    return sorted(q["quote_first"] for q in store.quotes(hour, minute))
+
+@pytest.mark.parametrize("policy", ["all", "sfw"])
+def test_fallback_matches_index_without_it(tmp_path, times_factory, policy):
+    times = times_factory("times", QUOTES)
+    index_path = str(tmp_path / "times.idx")
+    build_index(times, index_path)
+    indexed = QuoteStore(times_dir=times, index_path=index_path, prefetch=False, policy=policy)
+    expected = {(h, m): _texts(indexed, h, m) for h in (0, 1, 23) for m in range(60)}
+    assert indexed.index_crc is not None
+
+    os.remove(index_path)
+    plain = QuoteStore(times_dir=times, index_path=index_path, prefetch=False, policy=policy)
+    assert plain.index_crc is None
+    assert {(h, m): _texts(plain, h, m) for h in (0, 1, 23) for m in range(60)} == expected
+
+def test_index_is_rejected_after_times_change(tmp_path, times_factory):
+    times = times_factory("times", QUOTES)
+    index_path = str(tmp_path / "times.idx")
+    build_index(times, index_path)
+    with open_index(index_path, times) as index:
+        assert len(index) == 6
+
+    times_factory("times", {(1, 10): [make_quote("Ten past one, edited.")]})
+    assert open_index(index_path, times) is None
+    store = QuoteStore(times_dir=times, index_path=index_path, prefetch=False)
+    assert store.index_crc is None
+    assert _texts(store, 1, 10) == ["Ten past one, edited. "]
+
+    build_index(times, index_path)
+    assert QuoteStore(times_dir=times, index_path=index_path, prefetch=False).index_crc is not None
+
+def test_sfw_skips_to_nearest_eligible_minute_without_index(tmp_path, times_factory):
+    times = times_factory("times", QUOTES)
+    store = QuoteStore(times_dir=times, index_path=str(tmp_path / "missing.idx"), prefetch=False, policy="sfw")
+    # 01:12 only has an unsafe quote; 01:10 is nearer than 01:20
+    assert _texts(store, 1, 12) == ["Ten past one. "]
+    assert _texts(store, 1, 16) == ["Twenty past one. "]
+    # 00:01 is unsafe; 23:58 is nearest across midnight
+    assert _texts(store, 0, 1) == ["Nearly midnight. "]
+
+# One quote per hour, texts of equal length, so every hour block has the same size
+HOURLY = {(hour, 0): [make_quote(f"Hour {hour}.")] for hour in range(10)}
+
+def _store(tmp_path, times_factory, **kwargs):
+    times = times_factory("hourly", HOURLY)
+    return QuoteStore(times_dir=times, index_path=str(tmp_path / "missing.idx"), **kwargs)
+
+def _block_size(tmp_path, times_factory):
+    store = _store(tmp_path, times_factory, prefetch=False)
+    store.quotes(1, 0)
+    return store.resident_bytes
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_max_bytes_evicts_least_recently_used_hour(tmp_path, times_factory):
+    size = _block_size(tmp_path, times_factory)
+    store = _store(tmp_path, times_factory, prefetch=False, max_bytes=2 * size + size // 2)
+    for hour in (1, 2, 1, 3):
+        store.quotes(hour, 0)
+    assert store.resident_hours == [1, 3]
+    assert store.resident_bytes == 2 * size
+
+def test_lookup_prefetches_the_next_hour(tmp_path, times_factory):
+    store = _store(tmp_path, times_factory)
+    # 23:00 has no quote of its own; 00:00 is nearest
+    assert store.quotes(23, 0) == [make_quote("Hour 0.")]
+    # wraps around midnight
+    _wait_for(lambda: 0 in store.resident_hours)
+    assert store.resident_hours == [23, 0]
+
+def test_prefetch_never_evicts_the_hour_being_served(tmp_path, times_factory):
+    size = _block_size(tmp_path, times_factory)
+    # Room for a single block: the prefetched hour must not push out the current one
+    store = _store(tmp_path, times_factory, max_bytes=size)
+    store.quotes(1, 0)
+    _wait_for(lambda: 2 in store.resident_hours)
+    assert store.resident_hours == [1, 2]
+
+    # Once hour 2 is served, hour 1 is no longer pinned
+    store.quotes(2, 0)
+    _wait_for(lambda: 3 in store.resident_hours)
+    assert store.resident_hours == [2, 3]
@@ -0,0 +1,29 @@
+import quote_bitmaps
+from quote_index import QuoteIndex, build_index
+from quote_layout import TRAIN_REGION_TOP
+
+from conftest import make_quote
+
+def test_blocks_stop_at_the_train_region(tmp_path, times_factory):
+    times = times_factory("times", {(1, 10): [make_quote("Word " * 200)]})
+    build_index(times, str(tmp_path / "times.idx"))
+    with QuoteIndex(str(tmp_path / "times.idx")) as index:
+        top, rows = quote_bitmaps.render_block(index.quote(0))
+    assert rows
+    assert top + len(rows) // (quote_bitmaps.SCREEN_WIDTH // 8) <= TRAIN_REGION_TOP
+
+def test_archive_only_serves_quotes_of_its_index(tmp_path, times_factory):
+    ours = times_factory("ours", {(1, 10): [make_quote("Ours.")]})
+    other = times_factory("other", {(1, 10): [make_quote("Theirs.")]})
+    build_index(ours, str(tmp_path / "ours.idx"))
+    build_index(other, str(tmp_path / "other.idx"))
+    path = str(tmp_path / "ours.bitmaps")
+    quote_bitmaps.build_bitmaps(str(tmp_path / "ours.idx"), path)
+
+    with QuoteIndex(str(tmp_path / "ours.idx")) as index:
+        bitmaps = quote_bitmaps.open_bitmaps(index.crc, path)
+        assert bitmaps.has(index.quote(0))
+    with QuoteIndex(str(tmp_path / "other.idx")) as index:
+        assert not bitmaps.has(index.quote(0))
+        assert not bitmaps.blit(bytearray(48000), index.quote(0))
+    bitmaps.close()
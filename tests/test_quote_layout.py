@@ -0,0 +1,26 @@
+import quote_layout
+from quote_index import QuoteIndex, build_index
+
+from conftest import make_quote
+
+def test_get_plan_uses_layouts_of_the_quotes_index(tmp_path, times_factory):
+    short = times_factory("short", {(1, 10): [make_quote("Short.")]})
+    long = times_factory("long", {(1, 10): [make_quote("A much longer quote " * 12)]})
+    build_index(short, str(tmp_path / "short.idx"))
+    build_index(long, str(tmp_path / "long.idx"))
+    layouts = str(tmp_path / "short.layout.json")
+    quote_layout.build_layouts(str(tmp_path / "short.idx"), layouts)
+
+    with QuoteIndex(str(tmp_path / "short.idx")) as index:
+        quote = index.quote(0)
+        assert quote_layout.get_plan(quote, layouts) == quote_layout.plan_quote(quote)
+    with QuoteIndex(str(tmp_path / "long.idx")) as index:
+        quote = index.quote(0)
+        plan = quote_layout.get_plan(quote, layouts)
+        # Same quote id, different index: the short quote's plan must not be used
+        assert plan == quote_layout.plan_quote(quote)
+        assert plan.size < quote_layout.MAX_FONT_SIZE
+
+def test_get_plan_without_index_lays_out_on_the_fly():
+    quote = make_quote("Loaded from times/*.json.")
+    assert quote_layout.get_plan(quote) == quote_layout.plan_quote(quote)
@@ -0,0 +1,19 @@
+import pytest
+
+from waveshare_epd import epdbase, epdconfig, epdregistry
+from waveshare_epd.epdsim import Simulator
+
+REFRESH_MODELS = [name for name in epdregistry.models()
+                  if epdregistry.load(name).EPD.CAPS & {epdbase.PARTIAL, epdbase.FAST}]
+
+def test_refresh_models_found():
+    assert "epd7in5_V2" in REFRESH_MODELS and "epd2in13_V4" in REFRESH_MODELS
+
+@pytest.mark.parametrize("name", REFRESH_MODELS)
+def test_partial_and_fast_drivers_init_from_sequences(name):
+    epd = epdregistry.create(name)
+    assert "full" in epd.SEQUENCES
+    for mode in epd.SEQUENCES:
+        sim = epdconfig.use_backend(Simulator(busy_level=1 - epd.BUSY_IDLE))
+        assert epd.init_sequence(mode) == 0, mode
+        assert sim.trace, mode
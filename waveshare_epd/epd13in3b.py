@@ -30,6 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 960
@@ -42,53 +46,40 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
-class EPD:
+INIT = epdsequence.Sequence("epd13in3b.init", [
+    BUSY,
+    cmd(0x12), BUSY,                    # SWRESET
+    cmd(0x0C, 0xAE, 0xC7, 0xC3, 0xC0, 0x80),
+    cmd(0x01, 0xA7, 0x02, 0x00),
+    cmd(0x11, 0x03),
+    cmd(0x44, 0x00, 0x00, 0xBF, 0x03),
+    cmd(0x45, 0x00, 0x00, 0xA7, 0x02),
+    cmd(0x3C, 0x01),
+    cmd(0x18, 0x80),
+    cmd(0x4E, 0x00, 0x00),
+    cmd(0x4F, 0x00, 0x00), BUSY,
+])
+
+SLEEP = epdsequence.Sequence("epd13in3b.sleep", [
+    cmd(0x10, 0x03),                    # DEEP_SLEEP
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    FORMAT = epdbase.FORMAT_DUAL_PLANE
+    CAPS = frozenset((epdbase.PARTIAL,))
+    RESET_MS = (20, 2, 20)
+    BUSY_POLL_MS = 20
+    BUSY_SETTLE_MS = 20
+    SEQUENCES = {"full": INIT}
+
     def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
+        super().__init__()
         if (epdconfig.module_init() != 0):
             return -1
     
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 1):
-            busy = epdconfig.digital_read(self.busy_pin)
-            epdconfig.delay_ms(20)
-        epdconfig.delay_ms(20)
-        logger.debug("e-Paper busy release")
-
     def TurnOnDisplay(self):
         self.send_command(0x22) #Display Update Control
         self.send_data(0xF7)
@@ -101,83 +92,14 @@ class EPD:
         self.send_command(0x20) #Activate Display Update Sequence
         self.ReadBusy()
         
-    def init(self):
-        # EPD hardware init start
+    # The interface is opened in __init__
+    def init_sequence(self, mode):
         self.reset()
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x0C) 
-        self.send_data(0xAE)
-        self.send_data(0xC7)  
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01) 
-        self.send_data(0xA7)
-        self.send_data(0x02)  
-        self.send_data(0x00)
-
-        self.send_command(0x11) 
-        self.send_data(0x03)
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xBF)
-        self.send_data(0x03) 
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xA7)
-        self.send_data(0x02)
-
-        self.send_command(0x3C)
-        self.send_data(0x01)
-
-        self.send_command(0x18) 
-        self.send_data(0x80)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00) 
-        self.ReadBusy()
-
-        # EPD hardware init end
+        (self.SEQUENCES[mode] if isinstance(mode, str) else mode).run(self)
         return 0
 
-
-    def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
+    def init(self):
+        return self.init_sequence("full")
 
     def Clear(self):
         self.send_command(0x24)
@@ -207,9 +129,7 @@ class EPD:
             self.send_command(0x24)
             self.send_data2(blackimage)        
         if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
+            ryimage = epdbuffer.invert(ryimage)
             self.send_command(0x26)
             self.send_data2(ryimage)
 
@@ -225,9 +145,7 @@ class EPD:
             self.send_command(0x24)
             self.send_data2(blackimage)        
         if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
+            ryimage = epdbuffer.invert(ryimage)
             self.send_command(0x26)
             self.send_data2(ryimage)
 
@@ -291,9 +209,6 @@ class EPD:
                     self.send_data(Image[i + j * Width])
 
     def sleep(self):
-        self.send_command(0x10) # DEEP_SLEEP
-        self.send_data(0x03)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 ### END OF FILE ###
@@ -30,6 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 960
@@ -42,98 +46,111 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
-class EPD:
+LUT_PARTIAL = [									
+    0x15,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x2A,	0x88,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x15,	0x44,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x00,	0x08,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x00,	0x01,	0x01,	0x01,	0x00,						
+    0x0A,	0x00,	0x05,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x01,	0x01,						
+    0x22,	0x22,	0x22,	0x22,	0x22,						
+    0x17,	0x41,	0xA8,	0x32,	0x18,						
+    0x00,	0x00,]
+
+LUT_DATA_4GRAY = [											
+    0x80,	0x48,	0x4A,	0x22,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x0A,	0x48,	0x68,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x88,	0x48,	0x60,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0xA8,	0x48,	0x45,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x07,	0x23,	0x17,	0x02,	0x00,						
+    0x05,	0x01,	0x05,	0x01,	0x02,						
+    0x08,	0x02,	0x01,	0x04,	0x04,						
+    0x00,	0x02,	0x00,	0x02,	0x01,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x01,						
+    0x22,	0x22,	0x22,	0x22,	0x22,						
+    0x17,	0x41,	0xA8,	0x32,	0x30,						
+    0x00,	0x00,]
+
+def _lut_steps(lut):
+    return [
+        cmd(0x32, *lut[:105]),
+        cmd(0x03, lut[105]),
+        cmd(0x04, *lut[106:109]),
+        cmd(0x2C, lut[109]),
+    ]
+
+def _init_steps(border):
+    return [
+        BUSY,
+        cmd(0x12), BUSY,                # SWRESET
+        cmd(0x0C, 0xAE, 0xC7, 0xC3, 0xC0, 0x80),
+        cmd(0x01, 0xA7, 0x02, 0x00),
+        cmd(0x11, 0x03),
+        cmd(0x44, 0x00, 0x00, 0xBF, 0x03),
+        cmd(0x45, 0x00, 0x00, 0xA7, 0x02),
+        cmd(0x3C, border),
+        cmd(0x18, 0x80),
+        cmd(0x4E, 0x00, 0x00),
+        cmd(0x4F, 0x00, 0x00),
+    ]
+
+INIT = epdsequence.Sequence("epd13in3k.init", _init_steps(0x05))
+
+INIT_PART = epdsequence.Sequence("epd13in3k.init_Part", [
+    cmd(0x3C, 0x80),
+    *_lut_steps(LUT_PARTIAL),
+    cmd(0x37, 0x00, 0x00, 0x00, 0x00, 0x00, 0x40, 0x00, 0x00, 0x00, 0x00),
+    cmd(0x3C, 0x80),
+    cmd(0x22, 0xC0),
+    cmd(0x20), BUSY,
+])
+
+INIT_4GRAY = epdsequence.Sequence("epd13in3k.init_4GRAY",
+    _init_steps(0x00) + _lut_steps(LUT_DATA_4GRAY) + [BUSY])
+
+SLEEP = epdsequence.Sequence("epd13in3k.sleep", [
+    cmd(0x10, 0x03),                    # DEEP_SLEEP
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.GRAY4))
+    RESET_MS = (20, 2, 20)
+    BUSY_POLL_MS = 20
+    BUSY_SETTLE_MS = 20
+    SEQUENCES = {"full": INIT, "part": INIT_PART, "4gray": INIT_4GRAY}
+
     def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
+        super().__init__()
         self.GRAY1  = GRAY1 #white
         self.GRAY2  = GRAY2
         self.GRAY3  = GRAY3 #gray
         self.GRAY4  = GRAY4 #Blackest
 
-        self.Lut_Partial=[									
-            0x15,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-            0x2A,	0x88,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-            0x15,	0x44,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-            0x00,	0x08,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-            0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-            0x00,	0x01,	0x01,	0x01,	0x00,						
-            0x0A,	0x00,	0x05,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x01,	0x01,						
-            0x22,	0x22,	0x22,	0x22,	0x22,						
-            0x17,	0x41,	0xA8,	0x32,	0x18,						
-            0x00,	0x00,]
-
-        self.LUT_DATA_4Gray =[											
-            0x80,	0x48,	0x4A,	0x22,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-            0x0A,	0x48,	0x68,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-            0x88,	0x48,	0x60,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-            0xA8,	0x48,	0x45,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-            0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-            0x07,	0x23,	0x17,	0x02,	0x00,						
-            0x05,	0x01,	0x05,	0x01,	0x02,						
-            0x08,	0x02,	0x01,	0x04,	0x04,						
-            0x00,	0x02,	0x00,	0x02,	0x01,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x00,						
-            0x00,	0x00,	0x00,	0x00,	0x01,						
-            0x22,	0x22,	0x22,	0x22,	0x22,						
-            0x17,	0x41,	0xA8,	0x32,	0x30,						
-            0x00,	0x00,]
+        self.Lut_Partial = LUT_PARTIAL
+
+        self.LUT_DATA_4Gray = LUT_DATA_4GRAY
 
         if (epdconfig.module_init() != 0):
             return -1
     
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 1):
-            busy = epdconfig.digital_read(self.busy_pin)
-            epdconfig.delay_ms(20)
-        epdconfig.delay_ms(20)
-        logger.debug("e-Paper busy release")
-
     def TurnOnDisplay(self):
         self.send_command(0x22) #Display Update Control
         self.send_data(0xF7)
@@ -168,199 +185,25 @@ class EPD:
         self.send_command(0x2C)
         self.send_data(LUT[109])
         
-    def init(self):
-        
-        # EPD hardware init start
+    # The interface is opened in __init__
+    # The interface is opened in __init__
+    def init_sequence(self, mode):
         self.reset()
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x0C) 
-        self.send_data(0xAE)
-        self.send_data(0xC7)  
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01) 
-        self.send_data(0xA7)
-        self.send_data(0x02)  
-        self.send_data(0x00)
-
-        self.send_command(0x11)
-        self.send_data(0x03)
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xBF)
-        self.send_data(0x03) 
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xA7)
-        self.send_data(0x02)
-
-        self.send_command(0x3C) 
-        self.send_data(0x05)
-
-        self.send_command(0x18) 
-        self.send_data(0x80)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00) 
-
-        # EPD hardware init end
+        (self.SEQUENCES[mode] if isinstance(mode, str) else mode).run(self)
         return 0
 
-    def init_Part(self):
-        self.reset()
-
-        self.send_command(0x3C)    
-        self.send_data(0x80)
-
-        self.Lut(self.Lut_Partial)
-
-        self.send_command(0x37) 
-        self.send_data(0x00)  
-        self.send_data(0x00)  
-        self.send_data(0x00)  
-        self.send_data(0x00)  
-        self.send_data(0x00) 
-        self.send_data(0x40)  
-        self.send_data(0x00)  
-        self.send_data(0x00)   
-        self.send_data(0x00)  
-        self.send_data(0x00)  
-
-        self.send_command(0x3C) 
-        self.send_data(0x80)   
+    def init(self):
+        return self.init_sequence("full")
 
-        self.send_command(0x22) 
-        self.send_data(0xC0)   
-        self.send_command(0x20) 
+    def init_Part(self):
+        return self.init_sequence("part")
 
-        self.ReadBusy()
     def init_4GRAY(self):
-        self.reset()
-
-        self.ReadBusy()   
-        self.send_command(0x12)
-        self.ReadBusy()   
-
-        self.send_command(0x0C)   
-        self.send_data(0xAE)
-        self.send_data(0xC7)
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01) 
-        self.send_data(0xA7)
-        self.send_data(0x02)  
-        self.send_data(0x00)
-
-        self.send_command(0x11)
-        self.send_data(0x03) 
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xBF)
-        self.send_data(0x03) 
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xA7)
-        self.send_data(0x02)
-
-        self.send_command(0x3C)
-        self.send_data(0x00)
-
-        self.send_command(0x18) 
-        self.send_data(0x80)
-        
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00) 
-
-        self.Lut(self.LUT_DATA_4Gray)
-        
-        self.ReadBusy()
-
+        return self.init_sequence("4gray")
 
-    def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
 
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
-        return buf
+        return epdbuffer.pack_4gray(image, self.width, self.height)
 
     def Clear(self):
         buf = [0xFF] * (int(self.width/8) * self.height)
@@ -448,76 +291,15 @@ class EPD:
     
     def display_4Gray(self, image):
         self.send_command(0x24)
-        for i in range(0, 81600): 
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01  
-                    elif(temp2 == 0x80): 
-                        temp3 |= 0x01 
-                    else: #0x40
-                        temp3 |= 0x00 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x01
-                    else :   #0x40
-                        temp3 |= 0x00	
-                    if(j!=1 or k!=1):				
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-            
-        self.send_command(0x26)	       
-        for i in range(0, 81600): 
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00
-                    else: #0x40
-                        temp3 |= 0x01 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00 
-                    else:    #0x40
-                            temp3 |= 0x01	
-                    if(j!=1 or k!=1):					
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-        
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_LOW))
+
+        self.send_command(0x26)
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_HIGH))
+
         self.TurnOnDisplay_4GRAY()
 
 
     def sleep(self):
-        self.send_command(0x10) # DEEP_SLEEP
-        self.send_data(0x03)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 ### END OF FILE ###
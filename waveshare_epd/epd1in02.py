@@ -30,6 +30,9 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 80
@@ -37,18 +40,9 @@ EPD_HEIGHT      = 128
 
 logger = logging.getLogger(__name__)
 
-class EPD:
-    def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
-    
-    #full screen update LUT
+#full screen update LUT
 
-    lut_w1 =[
+lut_w1 =[
     0x60,  0x5A,  0x5A,  0x00,  0x00,  0x01,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
@@ -56,9 +50,9 @@ class EPD:
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
-    ]
-    
-    lut_b1 =[
+]
+
+lut_b1 =[
     0x90,  0x5A,  0x5A,  0x00,  0x00,  0x01,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
@@ -66,10 +60,10 @@ class EPD:
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
-    ]
+]
 
-    # partial screen update LUT
-    lut_w = [
+# partial screen update LUT
+lut_w = [
     0x60,  0x01,  0x01,  0x00,  0x00,  0x01,  
     0x80,  0x1f,  0x00,  0x00,  0x00,  0x01,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
@@ -77,9 +71,9 @@ class EPD:
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
-    ]
-    
-    lut_b = [
+]
+
+lut_b = [
     0x90,  0x01,  0x01,  0x00,  0x00,  0x01,  
     0x40,  0x1f,  0x00,  0x00,  0x00,  0x01,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
@@ -87,41 +81,63 @@ class EPD:
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
     0x00,  0x00,  0x00,  0x00,  0x00,  0x00,  
-    ]
+]
+
+INIT = epdsequence.Sequence("epd1in02.init", [
+    cmd(0xD2, 0x3F),
+    cmd(0x00, 0x6F),                # from outside
+    cmd(0x01, 0x03, 0x00, 0x2b, 0x2b),  # power setting
+    cmd(0x06, 0x3f),                # Configuring the charge pump
+    cmd(0x2A, 0x00, 0x00),          # Setting XON and the options of LUT
+    cmd(0x30, 0x17),                # Set the clock frequency: 50Hz
+    cmd(0x50, 0x57),                # Set VCOM and data output interval
+    cmd(0x60, 0x22),                # Set The non-overlapping period of Gate and Source.
+    cmd(0x61, 0x50, 0x80),          # resolution setting: source 128
+    cmd(0x82, 0x12),                # sets VCOM_DC value: -1v
+    cmd(0xe3, 0x33),                # Set POWER SAVING
+    cmd(0x23, *lut_w1),             # full screen update LUT
+    cmd(0x24, *lut_b1),
+    cmd(0x04), BUSY,                # power on
+])
+
+INIT_PART = epdsequence.Sequence("epd1in02.init_part", [
+    cmd(0xD2, 0x3F),
+    cmd(0x00, 0x6F),                # from outside
+    cmd(0x01, 0x03, 0x00, 0x2b, 0x2b),  # power setting
+    cmd(0x06, 0x3f),                # Configuring the charge pump
+    cmd(0x2A, 0x00, 0x00),          # Setting XON and the options of LUT
+    cmd(0x30, 0x17),                # Set the clock frequency
+    cmd(0x50, 0xf2),                # Set VCOM and data output interval
+    cmd(0x60, 0x22),                # Set The non-overlapping period of Gate and Source.
+    cmd(0x82, 0x12),                # Set VCOM_DC value: -1v
+    cmd(0xe3, 0x33),                # Set POWER SAVING
+    cmd(0x23, *lut_w),              # partial screen update LUT
+    cmd(0x24, *lut_b),
+    cmd(0x04), BUSY,                # power on
+])
+
+SLEEP = epdsequence.Sequence("epd1in02.sleep", [
+    cmd(0x50, 0xf7),
+    cmd(0x02), BUSY,
+    cmd(0x07, 0xA5),
+    delay(200),
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL,))
+    BUSY_IDLE = 1
+    BUSY_COMMAND = 0x71
+    BUSY_SETTLE_MS = 800
+    SEQUENCES = {"full": INIT, "part": INIT_PART}
+
+    lut_w1 = lut_w1
+    lut_b1 = lut_b1
+    lut_w = lut_w
+    lut_b = lut_b
         
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200) 
-        epdconfig.digital_write(self.reset_pin, 0)         # module reset
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-        
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        self.send_command(0x71)
-        busy = epdconfig.digital_read(self.busy_pin)
-        busy =not(busy & 0x01)
-        while(busy):
-            self.send_command(0x71)
-            busy = epdconfig.digital_read(self.busy_pin)
-            busy =not(busy & 0x01)
-        epdconfig.delay_ms(800)
-        logger.debug("e-Paper busy release")        
-
     def TurnOnDisplay(self):
         self.send_command(0x12)
         epdconfig.delay_ms(10)
@@ -146,120 +162,18 @@ class EPD:
             self.send_data(self.lut_b[count])     
 
     def Init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        
-        self.send_command(0xD2)			
-        self.send_data(0x3F)
+        return self.init_sequence("full")
 
-        self.send_command(0x00)  			
-        self.send_data (0x6F)  #from outside
-
-        self.send_command(0x01)  #power setting
-        self.send_data (0x03)	    
-        self.send_data (0x00)
-        self.send_data (0x2b)		
-        self.send_data (0x2b) 
-
-        self.send_command(0x06)  #Configuring the charge pump
-        self.send_data(0x3f)
-
-        self.send_command(0x2A)  #Setting XON and the options of LUT
-        self.send_data(0x00) 
-        self.send_data(0x00) 
-
-        self.send_command(0x30)  #Set the clock frequency
-        self.send_data(0x17) #50Hz
-
-        self.send_command(0x50)  #Set VCOM and data output interval
-        self.send_data(0x57)			
-
-        self.send_command(0x60)  #Set The non-overlapping period of Gate and Source.
-        self.send_data(0x22)
-
-        self.send_command(0x61)  #resolution setting
-        self.send_data (0x50)    #source 128 	 
-        self.send_data (0x80)       
-
-        self.send_command(0x82)  #sets VCOM_DC value
-        self.send_data(0x12)  #-1v
-
-        self.send_command(0xe3)#Set POWER SAVING
-        self.send_data(0x33)
-        self.SetFulltReg()	
-        self.send_command(0x04)     		#power on
-        self.ReadBusy()
-        # EPD hardware init end
-        return 0
+    init = Init
     
     def Partial_Init(self):
+        # The interface is already open from Init
         self.reset()
-        
-        self.send_command(0xD2)
-        self.send_data(0x3F)
-
-        self.send_command(0x00)
-        self.send_data (0x6F)  #from outside
-
-        self.send_command(0x01)  #power setting
-        self.send_data (0x03)
-        self.send_data (0x00)
-        self.send_data (0x2b)
-        self.send_data (0x2b)
-
-        self.send_command(0x06)  #Configuring the charge pump
-        self.send_data(0x3f)
-
-        self.send_command(0x2A)  #Setting XON and the options of LUT
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x30)  #Set the clock frequency
-        self.send_data(0x17)
-
-        self.send_command(0x50)  #Set VCOM and data output interval
-        self.send_data(0xf2)
-
-        self.send_command(0x60)  #Set The non-overlapping period of Gate and Source.
-        self.send_data(0x22)
-
-        self.send_command(0x82)  #Set VCOM_DC value
-        self.send_data(0x12)#-1v
-
-        self.send_command(0xe3)#Set POWER SAVING
-        self.send_data(0x33)
-
-        self.SetPartReg()	
-
-        self.send_command(0x04)#Set POWER SAVING	
-        self.ReadBusy()
-        # EPD hardware init end
+        INIT_PART.run(self)
         return 0
-    
-    def getbuffer(self, image):
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
 
+    init_part = Partial_Init
+    
     def display(self, image):
         if (image == None):
             return
@@ -334,16 +248,10 @@ class EPD:
         self.TurnOnDisplay()
 
     def Sleep(self):
-        self.send_command(0x50)
-        self.send_data(0xf7)
-        self.send_command(0x02)
-        self.ReadBusy()
-        self.send_command(0x07)
-        self.send_data(0xA5)
-        epdconfig.delay_ms(200)
-
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 
+    sleep = Sleep
+
 ### END OF FILE ###
 
@@ -29,6 +29,9 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 200
@@ -36,17 +39,8 @@ EPD_HEIGHT      = 200
 
 logger = logging.getLogger(__name__)
 
-class EPD:
-    def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
-        
-    # waveform full refresh
-    WF_Full_1IN54 = [
+# waveform full refresh
+WF_Full_1IN54 = [
     0x80,	0x48,	0x40,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,
     0x40,	0x48,	0x80,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,
     0x80,	0x48,	0x40,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,
@@ -66,10 +60,10 @@ class EPD:
     0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,					
     0x22,	0x22,	0x22,	0x22,	0x22,	0x22,	0x0,	0x0,	0x0,			
     0x22,	0x17,	0x41,	0x0,	0x32,	0x20
-    ]
+]
 
-    # waveform partial refresh(fast)
-    WF_PARTIAL_1IN54_0 = [
+# waveform partial refresh(fast)
+WF_PARTIAL_1IN54_0 = [
     0x0,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
     0x80,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
     0x40,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
@@ -89,42 +83,59 @@ class EPD:
     0x0,0x0,0x0,0x0,0x0,0x0,0x0,
     0x22,0x22,0x22,0x22,0x22,0x22,0x0,0x0,0x0,
     0x02,0x17,0x41,0xB0,0x32,0x28,
+]
+
+def _lut_steps(lut):
+    """The waveform, gate/source voltages and VCOM of a 159-byte LUT."""
+    return [
+        cmd(0x32, *lut),                    # WRITE_LUT_REGISTER
+        cmd(0x3f, lut[153]),
+        cmd(0x03, lut[154]),
+        cmd(0x04, lut[155], lut[156], lut[157]),
+        cmd(0x2c, lut[158]),
     ]
-        
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(5)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200)   
 
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-    
-    # send a lot of data   
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+INIT = epdsequence.Sequence("epd1in54_V2.init", [
+    BUSY,
+    cmd(0x12), BUSY,                        # SWRESET (software reset)
+    cmd(0x01, 0xC7, 0x00, 0x01),            # DRIVER_OUTPUT_CONTROL: (EPD_HEIGHT - 1), GD = 0 SM = 0 TB = 0
+    cmd(0x11, 0x01),                        # data entry mode
+    cmd(0x44, 0x00, (EPD_WIDTH - 1) >> 3),  # Set Windows: x 0 .. width-1
+    cmd(0x45, (EPD_HEIGHT - 1) & 0xFF, (EPD_HEIGHT - 1) >> 8, 0x00, 0x00),   # y height-1 .. 0
+    cmd(0x3C, 0x01),                        # BorderWavefrom
+    cmd(0x18, 0x80),
+    cmd(0x22, 0XB1),                        # Load Temperature and waveform setting.
+    cmd(0x20),
+    cmd(0x4E, 0x00),                        # Set Cursor: x 0
+    cmd(0x4F, (EPD_HEIGHT - 1) & 0xFF, (EPD_HEIGHT - 1) >> 8),  # y height-1
+    BUSY,
+] + _lut_steps(WF_Full_1IN54))
+
+INIT_PART = epdsequence.Sequence("epd1in54_V2.init_part", [
+    BUSY,
+] + _lut_steps(WF_PARTIAL_1IN54_0) + [
+    cmd(0x37, 0x00, 0x00, 0x00, 0x00, 0x00, 0x40, 0x00, 0x00, 0x00, 0x00),
+    cmd(0x3c, 0x80),                        # BorderWavefrom
+    cmd(0x22, 0xc0),
+    cmd(0x20), BUSY,
+])
+
+SLEEP = epdsequence.Sequence("epd1in54_V2.sleep", [
+    cmd(0x10, 0x01),                        # DEEP_SLEEP_MODE
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL,))
+    RESET_MS = (200, 5, 200)
+    BUSY_POLL_MS = 20
+    SEQUENCES = {"full": INIT, "part": INIT_PART}
+
+    WF_Full_1IN54 = WF_Full_1IN54
+    WF_PARTIAL_1IN54_0 = WF_PARTIAL_1IN54_0
         
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):
-            epdconfig.delay_ms(20)
-        logger.debug("e-Paper busy release")
-
     def TurnOnDisplay(self):
         self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
         self.send_data(0xc7)
@@ -179,70 +190,11 @@ class EPD:
         self.send_data((Ystart >> 8) & 0xFF);
 
     def init(self, isPartial):
-        if (epdconfig.module_init() != 0):
-            return -1
-            
         if(isPartial):
             logger.debug("partial refresh")
-            self.reset()
-            self.ReadBusy()
-            
-            self.set_lut(self.WF_PARTIAL_1IN54_0)
-            
-            self.send_command(0x37)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x40)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            
-            self.send_command(0x3c)  # BorderWavefrom
-            self.send_data(0x80)
-            
-            self.send_command(0x22)
-            self.send_data(0xc0)
-            self.send_command(0x20)
-            self.ReadBusy()
-        
-        else:
-            logger.debug("full refresh")
-            # EPD hardware init start
-            self.reset()
-            
-            self.ReadBusy()
-            self.send_command(0x12) # SWRESET (software reset)
-            self.ReadBusy()
-            
-            self.send_command(0x01) # DRIVER_OUTPUT_CONTROL
-            self.send_data(0xC7) # (EPD_HEIGHT - 1) & 0xFF
-            self.send_data(0x00) # ((EPD_HEIGHT - 1) >> 8) & 0xFF
-            self.send_data(0x01) # GD = 0 SM = 0 TB = 0
-            
-            self.send_command(0x11) # data entry mode
-            self.send_data(0x01)
-                      
-            self.SetWindows(0, self.height-1, self.width-1, 0) # Set Windows
-    
-            self.send_command(0x3C) # BorderWavefrom
-            self.send_data(0x01)
-
-            self.send_command(0x18)
-            self.send_data(0x80)
-
-            self.send_command(0x22) # #Load Temperature and waveform setting.
-            self.send_data(0XB1)
-            self.send_command(0x20)
-
-            self.SetCursor(0, self.height-1) # Set Cursor
-            
-            self.ReadBusy()
-            
-            self.set_lut(self.WF_Full_1IN54) # Set lut
+            return self.init_sequence("part")
+        logger.debug("full refresh")
+        return self.init_sequence("full")
         
     def Clear(self, color=0xFF):
         if self.width%8 == 0:
@@ -255,28 +207,6 @@ class EPD:
                 
         self.TurnOnDisplay()
         
-    def getbuffer(self, image):
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
-
     def display(self, image):
         if (image == None):
             return
@@ -307,10 +237,7 @@ class EPD:
         self.TurnOnDisplayPart()
         
     def sleep(self):
-        self.send_command(0x10) # DEEP_SLEEP_MODE
-        self.send_data(0x01)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 
 ### END OF FILE ###
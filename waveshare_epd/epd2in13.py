@@ -30,6 +30,9 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdsequence
+from .epdsequence import cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 122
@@ -37,54 +40,53 @@ EPD_HEIGHT      = 250
 
 logger = logging.getLogger(__name__)
 
-class EPD:
-    def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
-        
-    lut_full_update = [
-        0x22, 0x55, 0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x11,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E,
-        0x01, 0x00, 0x00, 0x00, 0x00, 0x00
+LUT_FULL_UPDATE = [
+    0x22, 0x55, 0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x11,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E,
+    0x01, 0x00, 0x00, 0x00, 0x00, 0x00
+]
+
+LUT_PARTIAL_UPDATE  = [
+    0x18, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x0F, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00
+]
+
+def _init_steps(lut):
+    return [
+        cmd(0x01, (EPD_HEIGHT - 1) & 0xFF, ((EPD_HEIGHT - 1) >> 8) & 0xFF,
+            0x00),                  # DRIVER_OUTPUT_CONTROL: GD = 0 SM = 0 TB = 0
+        cmd(0x0C, 0xD7, 0xD6, 0x9D),    # BOOSTER_SOFT_START_CONTROL
+        cmd(0x2C, 0xA8),            # WRITE_VCOM_REGISTER: VCOM 7C
+        cmd(0x3A, 0x1A),            # SET_DUMMY_LINE_PERIOD: 4 dummy lines per gate
+        cmd(0x3B, 0x08),            # SET_GATE_TIME: 2us per line
+        cmd(0x3C, 0x03),            # BORDER_WAVEFORM_CONTROL
+        cmd(0x11, 0x03),            # DATA_ENTRY_MODE_SETTING: X increment; Y increment
+        cmd(0x32, *lut[:30]),       # WRITE_LUT_REGISTER
     ]
 
-    lut_partial_update  = [
-        0x18, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x0F, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00
-    ]
-        
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(5)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-        
-    def ReadBusy(self):        
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(100)            
+INIT = epdsequence.Sequence("epd2in13.init", _init_steps(LUT_FULL_UPDATE))
+INIT_PART = epdsequence.Sequence("epd2in13.init_part", _init_steps(LUT_PARTIAL_UPDATE))
+
+SLEEP = epdsequence.Sequence("epd2in13.sleep", [
+    cmd(0x10, 0x01),                # enter deep sleep
+    delay(100),
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL,))
+    RESET_MS = (200, 5, 200)
+    BUSY_POLL_MS = 100
+    SEQUENCES = {"full": INIT, "part": INIT_PART}
 
+    lut_full_update = LUT_FULL_UPDATE
+    lut_partial_update = LUT_PARTIAL_UPDATE
+        
     def TurnOnDisplay(self):
         self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
         self.send_data(0xC4)
@@ -96,41 +98,11 @@ class EPD:
         logger.debug("e-Paper busy release")
 
     def init(self, lut):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        self.send_command(0x01) # DRIVER_OUTPUT_CONTROL
-        self.send_data((EPD_HEIGHT - 1) & 0xFF)
-        self.send_data(((EPD_HEIGHT - 1) >> 8) & 0xFF)
-        self.send_data(0x00) # GD = 0 SM = 0 TB = 0
-        
-        self.send_command(0x0C) # BOOSTER_SOFT_START_CONTROL
-        self.send_data(0xD7)
-        self.send_data(0xD6)
-        self.send_data(0x9D)
-        
-        self.send_command(0x2C) # WRITE_VCOM_REGISTER
-        self.send_data(0xA8) # VCOM 7C
-        
-        self.send_command(0x3A) # SET_DUMMY_LINE_PERIOD
-        self.send_data(0x1A) # 4 dummy lines per gate
-        
-        self.send_command(0x3B) # SET_GATE_TIME
-        self.send_data(0x08) # 2us per line
-        
-        self.send_command(0X3C) # BORDER_WAVEFORM_CONTROL
-        self.send_data(0x03)      
-        
-        self.send_command(0X11) # DATA_ENTRY_MODE_SETTING
-        self.send_data(0x03) # X increment; Y increment
-        
-        # WRITE_LUT_REGISTER
-        self.send_command(0x32)
-        for count in range(30):
-            self.send_data(lut[count])
-
-        return 0
+        if lut == LUT_FULL_UPDATE:
+            return self.init_sequence("full")
+        if lut == LUT_PARTIAL_UPDATE:
+            return self.init_sequence("part")
+        return self.init_sequence(epdsequence.Sequence("epd2in13.init", _init_steps(lut)))
         
 ##
  #  @brief: specify the memory area for data R/W
@@ -157,36 +129,6 @@ class EPD:
         self.send_data((y >> 8) & 0xFF)
         self.ReadBusy()
         
-    def getbuffer(self, image):
-        if self.width%8 == 0:
-            linewidth = int(self.width/8)
-        else:
-            linewidth = int(self.width/8) + 1
-         
-        buf = [0xFF] * (linewidth * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):                    
-                    if pixels[x, y] == 0:
-                        # x = imwidth - x
-                        buf[int(x / 8) + y * linewidth] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        # newy = imwidth - newy - 1
-                        buf[int(newx / 8) + newy*linewidth] &= ~(0x80 >> (y % 8))
-        return buf   
-
-        
     def display(self, image):
         if self.width%8 == 0:
             linewidth = int(self.width/8)
@@ -216,11 +158,7 @@ class EPD:
         self.TurnOnDisplay()
 
     def sleep(self):
-        self.send_command(0x10) #enter deep sleep
-        self.send_data(0x01)
-        epdconfig.delay_ms(100)
-         
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
         
 ### END OF FILE ###
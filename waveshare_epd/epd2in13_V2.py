@@ -30,6 +30,11 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
+from PIL import Image, ImageOps
 
 # Display resolution
 EPD_WIDTH       = 122
@@ -37,85 +42,89 @@ EPD_HEIGHT      = 250
 
 logger = logging.getLogger(__name__)
 
-class EPD:
-    def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
-        
+LUT_FULL_UPDATE = [
+    0x80,0x60,0x40,0x00,0x00,0x00,0x00,             #LUT0: BB:     VS 0 ~7
+    0x10,0x60,0x20,0x00,0x00,0x00,0x00,             #LUT1: BW:     VS 0 ~7
+    0x80,0x60,0x40,0x00,0x00,0x00,0x00,             #LUT2: WB:     VS 0 ~7
+    0x10,0x60,0x20,0x00,0x00,0x00,0x00,             #LUT3: WW:     VS 0 ~7
+    0x00,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT4: VCOM:   VS 0 ~7
+
+    0x03,0x03,0x00,0x00,0x02,                       # TP0 A~D RP0
+    0x09,0x09,0x00,0x00,0x02,                       # TP1 A~D RP1
+    0x03,0x03,0x00,0x00,0x02,                       # TP2 A~D RP2
+    0x00,0x00,0x00,0x00,0x00,                       # TP3 A~D RP3
+    0x00,0x00,0x00,0x00,0x00,                       # TP4 A~D RP4
+    0x00,0x00,0x00,0x00,0x00,                       # TP5 A~D RP5
+    0x00,0x00,0x00,0x00,0x00,                       # TP6 A~D RP6
+
+    0x15,0x41,0xA8,0x32,0x30,0x0A,
+]
+
+LUT_PARTIAL_UPDATE = [ #20 bytes
+    0x00,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT0: BB:     VS 0 ~7
+    0x80,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT1: BW:     VS 0 ~7
+    0x40,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT2: WB:     VS 0 ~7
+    0x00,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT3: WW:     VS 0 ~7
+    0x00,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT4: VCOM:   VS 0 ~7
+
+    0x0A,0x00,0x00,0x00,0x00,                       # TP0 A~D RP0
+    0x00,0x00,0x00,0x00,0x00,                       # TP1 A~D RP1
+    0x00,0x00,0x00,0x00,0x00,                       # TP2 A~D RP2
+    0x00,0x00,0x00,0x00,0x00,                       # TP3 A~D RP3
+    0x00,0x00,0x00,0x00,0x00,                       # TP4 A~D RP4
+    0x00,0x00,0x00,0x00,0x00,                       # TP5 A~D RP5
+    0x00,0x00,0x00,0x00,0x00,                       # TP6 A~D RP6
+
+    0x15,0x41,0xA8,0x32,0x30,0x0A,
+]
+
+INIT = epdsequence.Sequence("epd2in13_V2.init", [
+    BUSY,
+    cmd(0x12), BUSY,                # soft reset
+    cmd(0x74, 0x54),                # set analog block control
+    cmd(0x7E, 0x3B),                # set digital block control
+    cmd(0x01, 0xF9, 0x00, 0x00),    # Driver output control
+    cmd(0x11, 0x01),                # data entry mode
+    cmd(0x44, 0x00, 0x0F),          # set Ram-X address start/end position: 0x0C-->(15+1)*8=128
+    cmd(0x45, 0xF9, 0x00, 0x00, 0x00),  # set Ram-Y address start/end position: 0xF9-->(249+1)=250
+    cmd(0x3C, 0x03),                # BorderWavefrom
+    cmd(0x2C, 0x55),                # VCOM Voltage
+    cmd(0x03, LUT_FULL_UPDATE[70]),
+    cmd(0x04, *LUT_FULL_UPDATE[71:74]),
+    cmd(0x3A, LUT_FULL_UPDATE[74]), # Dummy Line
+    cmd(0x3B, LUT_FULL_UPDATE[75]), # Gate time
+    cmd(0x32, *LUT_FULL_UPDATE[:70]),
+    cmd(0x4E, 0x00),                # set RAM x address count to 0
+    cmd(0x4F, 0xF9, 0x00), BUSY,    # set RAM y address count to 0X127
+])
+
+INIT_PART = epdsequence.Sequence("epd2in13_V2.init_part", [
+    cmd(0x2C, 0x26), BUSY,          # VCOM Voltage
+    cmd(0x32, *LUT_PARTIAL_UPDATE[:70]),
+    cmd(0x37, 0x00, 0x00, 0x00, 0x00, 0x40, 0x00, 0x00),
+    cmd(0x22, 0xC0),
+    cmd(0x20), BUSY,
+    cmd(0x3C, 0x01),                # BorderWavefrom
+])
+
+SLEEP = epdsequence.Sequence("epd2in13_V2.sleep", [
+    cmd(0x10, 0x03),                # enter deep sleep
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL,))
+    RESET_MS = (200, 5, 200)
+    BUSY_POLL_MS = 100
+    SEQUENCES = {"full": INIT, "part": INIT_PART}
+
     FULL_UPDATE = 0
     PART_UPDATE = 1
-    lut_full_update= [
-        0x80,0x60,0x40,0x00,0x00,0x00,0x00,             #LUT0: BB:     VS 0 ~7
-        0x10,0x60,0x20,0x00,0x00,0x00,0x00,             #LUT1: BW:     VS 0 ~7
-        0x80,0x60,0x40,0x00,0x00,0x00,0x00,             #LUT2: WB:     VS 0 ~7
-        0x10,0x60,0x20,0x00,0x00,0x00,0x00,             #LUT3: WW:     VS 0 ~7
-        0x00,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT4: VCOM:   VS 0 ~7
-
-        0x03,0x03,0x00,0x00,0x02,                       # TP0 A~D RP0
-        0x09,0x09,0x00,0x00,0x02,                       # TP1 A~D RP1
-        0x03,0x03,0x00,0x00,0x02,                       # TP2 A~D RP2
-        0x00,0x00,0x00,0x00,0x00,                       # TP3 A~D RP3
-        0x00,0x00,0x00,0x00,0x00,                       # TP4 A~D RP4
-        0x00,0x00,0x00,0x00,0x00,                       # TP5 A~D RP5
-        0x00,0x00,0x00,0x00,0x00,                       # TP6 A~D RP6
-
-        0x15,0x41,0xA8,0x32,0x30,0x0A,
-    ]
-
-    lut_partial_update = [ #20 bytes
-        0x00,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT0: BB:     VS 0 ~7
-        0x80,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT1: BW:     VS 0 ~7
-        0x40,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT2: WB:     VS 0 ~7
-        0x00,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT3: WW:     VS 0 ~7
-        0x00,0x00,0x00,0x00,0x00,0x00,0x00,             #LUT4: VCOM:   VS 0 ~7
-
-        0x0A,0x00,0x00,0x00,0x00,                       # TP0 A~D RP0
-        0x00,0x00,0x00,0x00,0x00,                       # TP1 A~D RP1
-        0x00,0x00,0x00,0x00,0x00,                       # TP2 A~D RP2
-        0x00,0x00,0x00,0x00,0x00,                       # TP3 A~D RP3
-        0x00,0x00,0x00,0x00,0x00,                       # TP4 A~D RP4
-        0x00,0x00,0x00,0x00,0x00,                       # TP5 A~D RP5
-        0x00,0x00,0x00,0x00,0x00,                       # TP6 A~D RP6
-
-        0x15,0x41,0xA8,0x32,0x30,0x0A,
-    ]
+    lut_full_update = LUT_FULL_UPDATE
+    lut_partial_update = LUT_PARTIAL_UPDATE
         
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(5)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    # send a lot of data   
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-        
-    def ReadBusy(self):
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(100)    
-
     def TurnOnDisplay(self):
         self.send_command(0x22)
         self.send_data(0xC7)
@@ -129,125 +138,24 @@ class EPD:
         self.ReadBusy()
         
     def init(self, update):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        if(update == self.FULL_UPDATE):
-            self.ReadBusy()
-            self.send_command(0x12) # soft reset
-            self.ReadBusy()
-
-            self.send_command(0x74) #set analog block control
-            self.send_data(0x54)
-            self.send_command(0x7E) #set digital block control
-            self.send_data(0x3B)
-
-            self.send_command(0x01) #Driver output control
-            self.send_data(0xF9)
-            self.send_data(0x00)
-            self.send_data(0x00)
-
-            self.send_command(0x11) #data entry mode
-            self.send_data(0x01)
-
-            self.send_command(0x44) #set Ram-X address start/end position
-            self.send_data(0x00)
-            self.send_data(0x0F)    #0x0C-->(15+1)*8=128
-
-            self.send_command(0x45) #set Ram-Y address start/end position
-            self.send_data(0xF9)   #0xF9-->(249+1)=250
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            
-            self.send_command(0x3C) #BorderWavefrom
-            self.send_data(0x03)
-
-            self.send_command(0x2C)     #VCOM Voltage
-            self.send_data(0x55)    #
-
-            self.send_command(0x03)
-            self.send_data(self.lut_full_update[70])
-
-            self.send_command(0x04) #
-            self.send_data(self.lut_full_update[71])
-            self.send_data(self.lut_full_update[72])
-            self.send_data(self.lut_full_update[73])
-
-            self.send_command(0x3A)     #Dummy Line
-            self.send_data(self.lut_full_update[74])
-            self.send_command(0x3B)     #Gate time
-            self.send_data(self.lut_full_update[75])
-
-            self.send_command(0x32)
-            for count in range(70):
-                self.send_data(self.lut_full_update[count])
-
-            self.send_command(0x4E)   # set RAM x address count to 0
-            self.send_data(0x00)
-            self.send_command(0x4F)   # set RAM y address count to 0X127
-            self.send_data(0xF9)
-            self.send_data(0x00)
-            self.ReadBusy()
-        else:
-            self.send_command(0x2C)     #VCOM Voltage
-            self.send_data(0x26)
-
-            self.ReadBusy()
-
-            self.send_command(0x32)
-            for count in range(70):
-                self.send_data(self.lut_partial_update[count])
-
-            self.send_command(0x37)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x40)
-            self.send_data(0x00)
-            self.send_data(0x00)
-
-            self.send_command(0x22)
-            self.send_data(0xC0)
-            self.send_command(0x20)
-            self.ReadBusy()
-
-            self.send_command(0x3C) #BorderWavefrom
-            self.send_data(0x01)
-        return 0
+        return self.init_sequence("full" if update == self.FULL_UPDATE else "part")
 
     def getbuffer(self, image):
         if self.width%8 == 0:
             linewidth = int(self.width/8)
         else:
             linewidth = int(self.width/8) + 1
-         
-        buf = [0xFF] * (linewidth * self.height)
         image_monocolor = image.convert('1')
         imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        
         if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):                    
-                    if pixels[x, y] == 0:
-                        x = imwidth - x
-                        buf[int(x / 8) + y * linewidth] &= ~(0x80 >> (x % 8))
+            # The panel RAM is mirrored and shifted one pixel to the right.
+            canvas = Image.new('1', (linewidth * 8, self.height), 255)
+            canvas.paste(ImageOps.mirror(image_monocolor), (1, 0))
+            return bytearray(canvas.tobytes('raw'))
         elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        newy = imwidth - newy - 1
-                        buf[int(newx / 8) + newy*linewidth] &= ~(0x80 >> (y % 8))
-        return buf   
-        
-        
+            return epdbuffer.pack_1bpp(image_monocolor.transpose(Image.TRANSPOSE), self.width, self.height, inverted=False)
+        return bytearray([0xFF] * (linewidth * self.height))
+
     def display(self, image):
         self.send_command(0x24)
         self.send_data2(image)   
@@ -307,9 +215,7 @@ class EPD:
         # self.send_data(0xC3)
         # self.send_command(0x20)
 
-        self.send_command(0x10) #enter deep sleep
-        self.send_data(0x03)
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 
 ### END OF FILE ###
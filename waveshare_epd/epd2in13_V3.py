@@ -30,6 +30,9 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 122
@@ -37,110 +40,104 @@ EPD_HEIGHT      = 250
 
 logger = logging.getLogger(__name__)
 
-class EPD:
-    def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
-        
-    lut_partial_update= [
-        0x0,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x80,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x40,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x14,0x0,0x0,0x0,0x0,0x0,0x0,  
-        0x1,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x1,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x22,0x22,0x22,0x22,0x22,0x22,0x0,0x0,0x0,
-        0x22,0x17,0x41,0x00,0x32,0x36,
-    ]
+LUT_PARTIAL_UPDATE = [
+    0x0,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x80,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x40,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x14,0x0,0x0,0x0,0x0,0x0,0x0,  
+    0x1,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x1,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x22,0x22,0x22,0x22,0x22,0x22,0x0,0x0,0x0,
+    0x22,0x17,0x41,0x00,0x32,0x36,
+]
+
+LUT_FULL_UPDATE = [
+    0x80,0x4A,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x40,0x4A,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x80,0x4A,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x40,0x4A,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0xF,0x0,0x0,0x0,0x0,0x0,0x0,
+    0xF,0x0,0x0,0xF,0x0,0x0,0x2,
+    0xF,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x1,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x22,0x22,0x22,0x22,0x22,0x22,0x0,0x0,0x0,
+    0x22,0x17,0x41,0x0,0x32,0x36,
+]
 
-    lut_full_update = [ 
-        0x80,0x4A,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x40,0x4A,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x80,0x4A,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x40,0x4A,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0xF,0x0,0x0,0x0,0x0,0x0,0x0,
-        0xF,0x0,0x0,0xF,0x0,0x0,0x2,
-        0xF,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x1,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x22,0x22,0x22,0x22,0x22,0x22,0x0,0x0,0x0,
-        0x22,0x17,0x41,0x0,0x32,0x36,
+# SetLut: waveform, then the gate, source and VCOM voltages stored after it
+def _lut_steps(lut):
+    return [
+        cmd(0x32, *lut[:153]), BUSY,
+        cmd(0x3f, lut[153]),
+        cmd(0x03, lut[154]),        # gate voltage
+        cmd(0x04, *lut[155:158]),   # source voltage: VSH, VSH2, VSL
+        cmd(0x2c, lut[158]),        # VCOM
     ]
-        
-    '''
-    function :Hardware reset
-    parameter:
-    '''
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20)   
 
-    '''
-    function :send command
-    parameter:
-     command : Command register
-    '''
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
+INIT = epdsequence.Sequence("epd2in13_V3.init", [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x01, 0xf9, 0x00, 0x00),    # Driver output control
+    cmd(0x11, 0x03),                # data entry mode
+    cmd(0x44, 0x00, (EPD_WIDTH - 1) >> 3),  # SetWindow(0, 0, width - 1, height - 1)
+    cmd(0x45, 0x00, 0x00, (EPD_HEIGHT - 1) & 0xFF, (EPD_HEIGHT - 1) >> 8),
+    cmd(0x4E, 0x00),                # SetCursor(0, 0)
+    cmd(0x4F, 0x00, 0x00),
+    cmd(0x3c, 0x05),
+    cmd(0x21, 0x00, 0x80),          # Display update control
+    cmd(0x18, 0x80), BUSY,
+    *_lut_steps(LUT_FULL_UPDATE),
+])
 
-    '''
-    function :send data
-    parameter:
-     data : Write data
-    '''
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
+# Sent by displayPartial after its short reset pulse
+PARTIAL = epdsequence.Sequence("epd2in13_V3.partial", [
+    *_lut_steps(LUT_PARTIAL_UPDATE),
+    cmd(0x37, 0x00, 0x00, 0x00, 0x00, 0x00, 0x40, 0x00, 0x00, 0x00, 0x00),
+    cmd(0x3C, 0x80),                # BorderWavefrom
+    cmd(0x22, 0xC0),
+    cmd(0x20), BUSY,
+    cmd(0x44, 0x00, (EPD_WIDTH - 1) >> 3),
+    cmd(0x45, 0x00, 0x00, (EPD_HEIGHT - 1) & 0xFF, (EPD_HEIGHT - 1) >> 8),
+    cmd(0x4E, 0x00),
+    cmd(0x4F, 0x00, 0x00),
+])
 
-    # send a lot of data   
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-    
-    '''
-    function :Wait until the busy_pin goes LOW
-    parameter:
-    '''
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(10)  
-        logger.debug("e-Paper busy release")
+SLEEP = epdsequence.Sequence("epd2in13_V3.sleep", [
+    cmd(0x10, 0x01),                # enter deep sleep
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL,))
+    RESET_MS = (20, 2, 20)
 
+    SEQUENCES = {"full": INIT}
+
+    lut_partial_update = LUT_PARTIAL_UPDATE
+    lut_full_update = LUT_FULL_UPDATE
+        
     '''
     function : Turn On Display
     parameter:
@@ -230,40 +227,7 @@ class EPD:
     parameter:
     '''
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        
-        self.ReadBusy()
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy() 
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0xf9)
-        self.send_data(0x00)
-        self.send_data(0x00)
-    
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.SetWindow(0, 0, self.width-1, self.height-1)
-        self.SetCursor(0, 0)
-        
-        self.send_command(0x3c)
-        self.send_data(0x05)
-
-        self.send_command(0x21) #  Display update control
-        self.send_data(0x00)
-        self.send_data(0x80)
-    
-        self.send_command(0x18)
-        self.send_data(0x80)
-        
-        self.ReadBusy()
-        
-        self.SetLut(self.lut_full_update)
-        return 0
+        return self.init_sequence("full")
 
     '''
     function : Display images
@@ -313,29 +277,7 @@ class EPD:
         epdconfig.delay_ms(1)
         epdconfig.digital_write(self.reset_pin, 1)  
         
-        self.SetLut(self.lut_partial_update)
-        self.send_command(0x37)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x40)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0x00)
-
-        self.send_command(0x3C) #BorderWavefrom
-        self.send_data(0x80)
-
-        self.send_command(0x22) 
-        self.send_data(0xC0)
-        self.send_command(0x20)
-        self.ReadBusy()
-
-        self.SetWindow(0, 0, self.width - 1, self.height - 1)
-        self.SetCursor(0, 0)
+        PARTIAL.run(self)
         
         self.send_command(0x24) # WRITE_RAM
         # for j in range(0, self.height):
@@ -377,10 +319,7 @@ class EPD:
     parameter:
     '''
     def sleep(self):
-        self.send_command(0x10) #enter deep sleep
-        self.send_data(0x01)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 
 ### END OF FILE ###
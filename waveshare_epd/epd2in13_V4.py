@@ -30,6 +30,9 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 122
@@ -37,65 +40,56 @@ EPD_HEIGHT      = 250
 
 logger = logging.getLogger(__name__)
 
-class EPD:
-    def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
-        
-    '''
-    function :Hardware reset
-    parameter:
-    '''
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20)   
+# SetWindow(0, 0, width - 1, height - 1) and SetCursor(0, 0)
+_FULL_WINDOW = [
+    cmd(0x44, 0x00, (EPD_WIDTH - 1) >> 3),
+    cmd(0x45, 0x00, 0x00, (EPD_HEIGHT - 1) & 0xFF, (EPD_HEIGHT - 1) >> 8),
+    cmd(0x4E, 0x00),
+    cmd(0x4F, 0x00, 0x00),
+]
 
-    '''
-    function :send command
-    parameter:
-     command : Command register
-    '''
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
+INIT = epdsequence.Sequence("epd2in13_V4.init", [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x01, 0xf9, 0x00, 0x00),    # Driver output control
+    cmd(0x11, 0x03),                # data entry mode
+    *_FULL_WINDOW,
+    cmd(0x3c, 0x05),
+    cmd(0x21, 0x00, 0x80),          # Display update control
+    cmd(0x18, 0x80), BUSY,
+])
 
-    '''
-    function :send data
-    parameter:
-     data : Write data
-    '''
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
+INIT_FAST = epdsequence.Sequence("epd2in13_V4.init_fast", [
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x18), cmd(0x80),           # Read built-in temperature sensor
+    cmd(0x11, 0x03),                # data entry mode
+    *_FULL_WINDOW,
+    cmd(0x22, 0xB1),                # Load temperature value
+    cmd(0x20), BUSY,
+    cmd(0x1A, 0x64, 0x00),          # Write to temperature register
+    cmd(0x22, 0x91),                # Load temperature value
+    cmd(0x20), BUSY,
+])
 
-    # send a lot of data   
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-    
-    '''
-    function :Wait until the busy_pin goes LOW
-    parameter:
-    '''
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(10)  
-        logger.debug("e-Paper busy release")
+# Sent by displayPartial after its short reset pulse
+PARTIAL = epdsequence.Sequence("epd2in13_V4.partial", [
+    cmd(0x3C, 0x80),                # BorderWavefrom
+    cmd(0x01, 0xF9, 0x00, 0x00),    # Driver output control
+    cmd(0x11, 0x03),                # data entry mode
+    *_FULL_WINDOW,
+])
+
+SLEEP = epdsequence.Sequence("epd2in13_V4.sleep", [
+    cmd(0x10, 0x01),                # enter deep sleep
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST))
+    RESET_MS = (20, 2, 20)
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST}
 
     '''
     function : Turn On Display
@@ -168,77 +162,15 @@ class EPD:
     parameter:
     '''
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        
-        self.ReadBusy()
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy() 
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0xf9)
-        self.send_data(0x00)
-        self.send_data(0x00)
-    
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.SetWindow(0, 0, self.width-1, self.height-1)
-        self.SetCursor(0, 0)
-        
-        self.send_command(0x3c)
-        self.send_data(0x05)
-
-        self.send_command(0x21) #  Display update control
-        self.send_data(0x00)
-        self.send_data(0x80)
-    
-        self.send_command(0x18)
-        self.send_data(0x80)
-        
-        self.ReadBusy()
-        
-        return 0
+        return self.init_sequence("full")
 
     '''
     function : Initialize the e-Paper fast register
     parameter:
     '''
     def init_fast(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy() 
-
-        self.send_command(0x18) # Read built-in temperature sensor
-        self.send_command(0x80)
+        return self.init_sequence("fast")
 
-        self.send_command(0x11) # data entry mode       
-        self.send_data(0x03)    
-
-        self.SetWindow(0, 0, self.width-1, self.height-1)
-        self.SetCursor(0, 0)
-        
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0xB1)	
-        self.send_command(0x20)
-        self.ReadBusy()
-
-        self.send_command(0x1A) # Write to temperature register
-        self.send_data(0x64)
-        self.send_data(0x00)
-                        
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0x91)	
-        self.send_command(0x20)
-        self.ReadBusy()
-        
-        return 0
     '''
     function : Display images
     parameter:
@@ -289,19 +221,7 @@ class EPD:
         epdconfig.delay_ms(1)
         epdconfig.digital_write(self.reset_pin, 1)  
 
-        self.send_command(0x3C) # BorderWavefrom
-        self.send_data(0x80)
-
-        self.send_command(0x01) # Driver output control      
-        self.send_data(0xF9) 
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x11) # data entry mode       
-        self.send_data(0x03)
-
-        self.SetWindow(0, 0, self.width - 1, self.height - 1)
-        self.SetCursor(0, 0)
+        PARTIAL.run(self)
         
         self.send_command(0x24) # WRITE_RAM
         self.send_data2(image)  
@@ -340,10 +260,7 @@ class EPD:
     parameter:
     '''
     def sleep(self):
-        self.send_command(0x10) #enter deep sleep
-        self.send_data(0x01)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 
 ### END OF FILE ###
@@ -29,6 +29,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 176
@@ -41,67 +45,89 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
-class EPD:
+LUT_DATA_4GRAY = [
+    0x40,0x48,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x8,0x48,0x10,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x2,0x48,0x4,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x20,0x48,0x1,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
+    0xA,0x19,0x0,0x3,0x8,0x0,0x0,					
+    0x14,0x1,0x0,0x14,0x1,0x0,0x3,					
+    0xA,0x3,0x0,0x8,0x19,0x0,0x0,					
+    0x1,0x0,0x0,0x0,0x0,0x0,0x1,					
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
+    0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
+    0x22,0x22,0x22,0x22,0x22,0x22,0x0,0x0,0x0,			
+    0x22,0x17,0x41,0x0,0x32,0x1C,
+]
+
+INIT = epdsequence.Sequence("epd2in7_V2.init", [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x45, 0x00, 0x00, 0x07, 0x01),  # set Ram-Y address start/end position: 0x0107-->(263+1)=264
+    cmd(0x4F, 0x00, 0x00),          # set RAM y address count to 0
+    cmd(0x11, 0x03),                # data entry mode
+])
+
+INIT_FAST = epdsequence.Sequence("epd2in7_V2.init_Fast", [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x18, 0x80),                # Read built-in temperature sensor
+    cmd(0x22, 0xB1),                # Load temperature value
+    cmd(0x20), BUSY,
+    cmd(0x1A, 0x64, 0x00),          # Write to temperature register
+    cmd(0x45, 0x00, 0x00, 0x07, 0x01),  # set Ram-Y address start/end position: 0x0107-->(263+1)=264
+    cmd(0x4F, 0x00, 0x00),          # set RAM y address count to 0
+    cmd(0x11, 0x03),                # data entry mode
+    cmd(0x22, 0x91),                # Load temperature value
+    cmd(0x20), BUSY,
+])
+
+INIT_4GRAY = epdsequence.Sequence("epd2in7_V2.Init_4Gray", [
+    cmd(0x12), BUSY,                # soft reset
+    cmd(0x74, 0x54),                # set analog block control
+    cmd(0x7E, 0x3B),                # set digital block control
+    cmd(0x01, 0x07, 0x01, 0x00),    # Driver output control
+    cmd(0x11, 0x03),                # data entry mode
+    cmd(0x44, 0x00, 0x15),          # set Ram-X address start/end position: 0x15-->(21+1)*8=176
+    cmd(0x45, 0x00, 0x00, 0x07, 0x01),  # set Ram-Y address start/end position: 0x0107-->(263+1)=264
+    cmd(0x3C, 0x00),                # BorderWavefrom
+    cmd(0x2C, LUT_DATA_4GRAY[158]), # VCOM Voltage
+    cmd(0x3F, LUT_DATA_4GRAY[153]), # EOPQ
+    cmd(0x03, LUT_DATA_4GRAY[154]), # VGH
+    cmd(0x04, *LUT_DATA_4GRAY[155:158]),    # VSH1, VSH2, VSL
+    cmd(0x32, *LUT_DATA_4GRAY[:159]),   # LUT
+    cmd(0x4E, 0x00),                # set RAM x address count to 0
+    cmd(0x4F, 0x00, 0x00), BUSY,    # set RAM y address count to 0X199
+])
+
+SLEEP = epdsequence.Sequence("epd2in7_V2.sleep", [
+    cmd(0X10, 0x01),
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST, epdbase.GRAY4))
+    BUSY_POLL_MS = 20
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST, "4gray": INIT_4GRAY}
+
     def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
+        super().__init__()
         self.GRAY1  = GRAY1 #white
         self.GRAY2  = GRAY2
         self.GRAY3  = GRAY3 #gray
         self.GRAY4  = GRAY4 #Blackest
 
-    LUT_DATA_4Gray = [
-        0x40,0x48,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x8,0x48,0x10,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x2,0x48,0x4,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x20,0x48,0x1,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
-        0xA,0x19,0x0,0x3,0x8,0x0,0x0,					
-        0x14,0x1,0x0,0x14,0x1,0x0,0x3,					
-        0xA,0x3,0x0,0x8,0x19,0x0,0x0,					
-        0x1,0x0,0x0,0x0,0x0,0x0,0x1,					
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
-        0x0,0x0,0x0,0x0,0x0,0x0,0x0,					
-        0x22,0x22,0x22,0x22,0x22,0x22,0x0,0x0,0x0,			
-        0x22,0x17,0x41,0x0,0x32,0x1C,
-        ]
-    
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-        
-    def ReadBusy(self):        
-        logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  1: idle, 0: busy
-            epdconfig.delay_ms(20)                
-        logger.debug("e-Paper busy release")
+    LUT_DATA_4Gray = LUT_DATA_4GRAY
     
     def TurnOnDisplay(self):
         self.send_command(0x22) #Display Update Control
@@ -133,197 +159,17 @@ class EPD:
             self.send_data(self.LUT_DATA_4Gray[i])
     
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-            
-        # EPD hardware init start
-        self.reset()
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x07) #0x0107-->(263+1)=264
-        self.send_data(0x01)
-
-        self.send_command(0x4F)   # set RAM y address count to 0;    
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x11)  # data entry mode
-        self.send_data(0x03)
-        return 0
+        return self.init_sequence("full")
         
     def init_Fast(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-            
-        # EPD hardware init start
-        self.reset()
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x18) #Read built-in temperature sensor
-        self.send_data(0x80)	
-
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0xB1)	
-        self.send_command(0x20)	
-        self.ReadBusy()
-
-        self.send_command(0x1A) # Write to temperature register
-        self.send_data(0x64)	
-        self.send_data(0x00)	
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0x00)   
-        self.send_data(0x00)
-        self.send_data(0x07) #0x0107-->(263+1)=264
-        self.send_data(0x01)
-
-        self.send_command(0x4F)   # set RAM y address count to 0;    
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x11)   # data entry mode      
-        self.send_data(0x03)
-
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0x91)	
-        self.send_command(0x20)	
-        self.ReadBusy()
-        return 0
+        return self.init_sequence("fast")
 
     def Init_4Gray(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        self.reset()
-        
-        self.send_command(0x12) # soft reset
-        self.ReadBusy();
-
-        self.send_command(0x74) #set analog block control       
-        self.send_data(0x54)
-        self.send_command(0x7E) #set digital block control          
-        self.send_data(0x3B)
-        
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0x07)
-        self.send_data(0x01)
-        self.send_data(0x00) 
-        
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.send_command(0x44) #set Ram-X address start/end position   
-        self.send_data(0x00)
-        self.send_data(0x15)   #0x15-->(21+1)*8=176
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x07) #0x0107-->(263+1)=264
-        self.send_data(0x01)
-
-
-        self.send_command(0x3C) #BorderWavefrom
-        self.send_data(0x00)	
-
-
-        self.send_command(0x2C)     #VCOM Voltage
-        self.send_data(self.LUT_DATA_4Gray[158])    #0x1C
-
-
-        self.send_command(0x3F) #EOPQ    
-        self.send_data(self.LUT_DATA_4Gray[153])
-
-        self.send_command(0x03) #VGH      
-        self.send_data(self.LUT_DATA_4Gray[154])
+        return self.init_sequence("4gray")
 
-        self.send_command(0x04) #      
-        self.send_data(self.LUT_DATA_4Gray[155]) #VSH1   
-        self.send_data(self.LUT_DATA_4Gray[156]) #VSH2   
-        self.send_data(self.LUT_DATA_4Gray[157]) #VSL   
-
-        self.Lut() #LUT
-
-
-        self.send_command(0x4E)   # set RAM x address count to 0;
-        self.send_data(0x00)
-        self.send_command(0x4F)  # set RAM y address count to 0X199;    
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.ReadBusy()
-        return 0
-
-    def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
-    
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
-        return buf
-    
+        return epdbuffer.pack_4gray(image, self.width, self.height)
+
     def Clear(self):
         if(self.width % 8 == 0):
             Width = self.width // 8
@@ -444,76 +290,15 @@ class EPD:
   
     def display_4Gray(self, image):
         self.send_command(0x24)
-        for i in range(0, 5808):                     #5808*4  46464
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01  
-                    elif(temp2 == 0x80): 
-                        temp3 |= 0x01 
-                    else: #0x40
-                        temp3 |= 0x00 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x01
-                    else :   #0x40
-                        temp3 |= 0x00	
-                    if(j!=1 or k!=1):				
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-            
-        self.send_command(0x26)	       
-        for i in range(0, 5808):                #5808*4  46464
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00
-                    else: #0x40
-                        temp3 |= 0x01 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00 
-                    else:    #0x40
-                            temp3 |= 0x01	
-                    if(j!=1 or k!=1):					
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-        
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_LOW))
+
+        self.send_command(0x26)
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_HIGH))
+
         self.TurnOnDisplay_4GRAY()
 
     def sleep(self):
-        self.send_command(0X10)
-        self.send_data(0x01)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 ### END OF FILE ###
 
@@ -29,6 +29,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 128
@@ -40,20 +44,7 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
-class EPD:
-    def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
-        self.GRAY1  = GRAY1 #white
-        self.GRAY2  = GRAY2
-        self.GRAY3  = GRAY3 #gray
-        self.GRAY4  = GRAY4 #Blackest
-        
-    WF_PARTIAL_2IN9 = [
+WF_PARTIAL_2IN9 = [
     0x0,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
     0x80,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
     0x40,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
@@ -73,9 +64,9 @@ class EPD:
     0x0,0x0,0x0,0x0,0x0,0x0,0x0,
     0x22,0x22,0x22,0x22,0x22,0x22,0x0,0x0,0x0,
     0x22,0x17,0x41,0xB0,0x32,0x36,
-    ]
+]
 
-    WS_20_30 = [									
+WS_20_30 = [									
     0x80,	0x66,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x40,	0x0,	0x0,	0x0,
     0x10,	0x66,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x20,	0x0,	0x0,	0x0,
     0x80,	0x66,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x40,	0x0,	0x0,	0x0,
@@ -95,9 +86,9 @@ class EPD:
     0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	0x0,					
     0x44,	0x44,	0x44,	0x44,	0x44,	0x44,	0x0,	0x0,	0x0,			
     0x22,	0x17,	0x41,	0x0,	0x32,	0x36
-    ]
+]
 
-    Gray4 = [										
+Gray4 = [										
     0x00,	0x60,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,			
     0x20,	0x60,	0x10,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,					
     0x28,	0x60,	0x14,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,					
@@ -117,9 +108,9 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,									
     0x24,	0x22,	0x22,	0x22,	0x23,	0x32,	0x00,	0x00,	0x00,							
     0x22,	0x17,	0x41,	0xAE,	0x32,	0x28,							
-    ]	
+]	
 
-    WF_FULL =	[			
+WF_FULL =	[			
     0x90,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,		
     0x60,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
     0x90,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,		
@@ -140,39 +131,95 @@ class EPD:
     0x24,	0x42,	0x22,	0x22,	0x23,	0x32,	0x00,	0x00,	0x00,		
     0x22,	0x17,	0x41,	0xAE,	0x32,	0x38]
 
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(50) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(50)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    # send a lot of data   
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+# SetLut: waveform, then the gate, source and VCOM voltages stored after it
+def _lut_steps(lut):
+    return [
+        cmd(0x32, *lut[:153]), BUSY,
+        cmd(0x3f, lut[153]),
+        cmd(0x03, lut[154]),        # gate voltage
+        cmd(0x04, *lut[155:158]),   # source voltage: VSH, VSH2, VSL
+        cmd(0x2c, lut[158]),        # VCOM
+    ]
+
+# SetWindow(0, 0, width - 1, height - 1)
+_FULL_WINDOW = [
+    cmd(0x44, 0x00, (EPD_WIDTH - 1) >> 3),
+    cmd(0x45, 0x00, 0x00, (EPD_HEIGHT - 1) & 0xFF, (EPD_HEIGHT - 1) >> 8),
+]
+
+# SetCursor(0, 0)
+_CURSOR = [cmd(0x4E, 0x00), cmd(0x4F, 0x00, 0x00)]
+
+INIT = epdsequence.Sequence("epd2in9_V2.init", [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x01, 0x27, 0x01, 0x00),    # Driver output control
+    cmd(0x11, 0x03),                # data entry mode
+    *_FULL_WINDOW,
+    cmd(0x21, 0x00, 0x80),          # Display update control
+    *_CURSOR, BUSY,
+    *_lut_steps(WS_20_30),
+])
+
+INIT_FAST = epdsequence.Sequence("epd2in9_V2.init_Fast", [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x01, 0x27, 0x01, 0x00),    # Driver output control
+    cmd(0x11, 0x03),                # data entry mode
+    *_FULL_WINDOW,
+    cmd(0x3C, 0x05),
+    cmd(0x21, 0x00, 0x80),          # Display update control
+    *_CURSOR, BUSY,
+    *_lut_steps(WF_FULL),
+])
+
+INIT_4GRAY = epdsequence.Sequence("epd2in9_V2.Init_4Gray", [
+    delay(100), BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x01, 0x27, 0x01, 0x00),    # Driver output control
+    cmd(0x11, 0x03),                # data entry mode
+    cmd(0x44, 8 >> 3, EPD_WIDTH >> 3),  # SetWindow(8, 0, width, height - 1)
+    cmd(0x45, 0x00, 0x00, (EPD_HEIGHT - 1) & 0xFF, (EPD_HEIGHT - 1) >> 8),
+    cmd(0x3C, 0x04),
+    cmd(0x4E, 0x01),                # SetCursor(1, 0)
+    cmd(0x4F, 0x00, 0x00), BUSY,
+    *_lut_steps(Gray4),
+])
+
+# Sent by display_Partial after its short reset pulse
+PARTIAL = epdsequence.Sequence("epd2in9_V2.partial", [
+    *_lut_steps(WF_PARTIAL_2IN9),
+    cmd(0x37, 0x00, 0x00, 0x00, 0x00, 0x00, 0x40, 0x00, 0x00, 0x00, 0x00),
+    cmd(0x3C, 0x80),                # BorderWavefrom
+    cmd(0x22, 0xC0),
+    cmd(0x20), BUSY,
+    *_FULL_WINDOW,
+    *_CURSOR,
+])
+
+SLEEP = epdsequence.Sequence("epd2in9_V2.sleep", [
+    cmd(0x10, 0x01),                # DEEP_SLEEP_MODE
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST, epdbase.GRAY4))
+    RESET_MS = (50, 2, 50)
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST, "4gray": INIT_4GRAY}
+
+    def __init__(self):
+        super().__init__()
+        self.GRAY1  = GRAY1 #white
+        self.GRAY2  = GRAY2
+        self.GRAY3  = GRAY3 #gray
+        self.GRAY4  = GRAY4 #Blackest
         
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(10) 
-        logger.debug("e-Paper busy release")  
+    WF_PARTIAL_2IN9 = WF_PARTIAL_2IN9
+    WS_20_30 = WS_20_30
+    Gray4 = Gray4
+    WF_FULL = WF_FULL
 
     def TurnOnDisplay(self):
         self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
@@ -226,159 +273,16 @@ class EPD:
         self.send_data((y >> 8) & 0xFF)
         
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start     
-        self.reset()
-
-        self.ReadBusy()
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy() 
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0x27)
-        self.send_data(0x01)
-        self.send_data(0x00)
-    
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.SetWindow(0, 0, self.width-1, self.height-1)
-
-        self.send_command(0x21) #  Display update control
-        self.send_data(0x00)
-        self.send_data(0x80)
-    
-        self.SetCursor(0, 0)
-        self.ReadBusy()
-
-        self.SetLut(self.WS_20_30)
-        # EPD hardware init end
-        return 0
+        return self.init_sequence("full")
     
     def init_Fast(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start     
-        self.reset()
-
-        self.ReadBusy()
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy() 
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0x27)
-        self.send_data(0x01)
-        self.send_data(0x00)
-    
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.SetWindow(0, 0, self.width-1, self.height-1)
-
-        self.send_command(0x3C)   
-        self.send_data(0x05)
-
-        self.send_command(0x21) #  Display update control
-        self.send_data(0x00)
-        self.send_data(0x80)
-    
-        self.SetCursor(0, 0)
-        self.ReadBusy()
-
-        self.SetLut(self.WF_FULL)
-        # EPD hardware init end
-        return 0
+        return self.init_sequence("fast")
     
     def Init_4Gray(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        self.reset()
-        epdconfig.delay_ms(100)
+        return self.init_sequence("4gray")
 
-        self.ReadBusy()
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy() 
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0x27)
-        self.send_data(0x01)
-        self.send_data(0x00)
-    
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.SetWindow(8, 0, self.width, self.height-1)
-
-        self.send_command(0x3C)
-        self.send_data(0x04)
-    
-        self.SetCursor(1, 0)
-        self.ReadBusy()
-
-        self.SetLut(self.Gray4)
-        # EPD hardware init end
-        return 0
-
-    def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
-    
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
-        return buf
+        return epdbuffer.pack_4gray(image, self.width, self.height)
 
     def display(self, image):
         if (image == None):
@@ -401,71 +305,13 @@ class EPD:
 
     def display_4Gray(self, image):
         self.send_command(0x24)
-        for i in range(0, 4736):
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01  
-                    elif(temp2 == 0x80): 
-                        temp3 |= 0x01 
-                    else: #0x40
-                        temp3 |= 0x00 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x01
-                    else :   #0x40
-                        temp3 |= 0x00	
-                    if(j!=1 or k!=1):				
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-            
-        self.send_command(0x26)	       
-        for i in range(0, 4736):
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00
-                    else: #0x40
-                        temp3 |= 0x01 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00 
-                    else:    #0x40
-                        temp3 |= 0x01	
-                    if(j!=1 or k!=1):					
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_LOW))
+
+        self.send_command(0x26)
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_HIGH))
 
         self.TurnOnDisplay()
-        
+
     def display_Partial(self, image):
         if (image == None):
             return
@@ -475,29 +321,7 @@ class EPD:
         epdconfig.digital_write(self.reset_pin, 1)
         epdconfig.delay_ms(2)   
         
-        self.SetLut(self.WF_PARTIAL_2IN9)
-        self.send_command(0x37)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x40)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0x00)
-
-        self.send_command(0x3C) #BorderWavefrom
-        self.send_data(0x80)
-
-        self.send_command(0x22) 
-        self.send_data(0xC0)
-        self.send_command(0x20)
-        self.ReadBusy()
-
-        self.SetWindow(0, 0, self.width - 1, self.height - 1)
-        self.SetCursor(0, 0)
+        PARTIAL.run(self)
         
         self.send_command(0x24) # WRITE_RAM
         self.send_data2(image)   
@@ -518,10 +342,7 @@ class EPD:
         self.TurnOnDisplay()
 
     def sleep(self):
-        self.send_command(0x10) # DEEP_SLEEP_MODE
-        self.send_data(0x01)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 ### END OF FILE ###
 
@@ -30,6 +30,11 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbusy
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 128
@@ -37,48 +42,60 @@ EPD_HEIGHT      = 296
 
 logger = logging.getLogger(__name__)
 
-class EPD:
-    def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
-        
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
+_DRIVER_OUTPUT = cmd(0x01, (EPD_HEIGHT - 1) % 256, (EPD_HEIGHT - 1) // 256, 0x00)    # Driver output control
+
+# set Ram-X and Ram-Y address start/end position
+_FULL_WINDOW = [
+    cmd(0x44, 0x00, EPD_WIDTH // 8 - 1),
+    cmd(0x45, 0x00, 0x00, (EPD_HEIGHT - 1) % 256, (EPD_HEIGHT - 1) // 256),
+]
+
+# set RAM x address count to 0, RAM y address count to 0X199
+_CURSOR = [cmd(0x4E, 0x00), cmd(0x4F, 0x00, 0x00)]
+
+INIT = epdsequence.Sequence("epd2in9b_V4.init", [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    _DRIVER_OUTPUT,
+    cmd(0x11, 0x03),                # data entry mode
+    *_FULL_WINDOW,
+    cmd(0x3C, 0x05),                # BorderWavefrom
+    cmd(0x21, 0x00, 0x80),          # Display update control
+    cmd(0x18, 0x80),                # Read built-in temperature sensor
+    *_CURSOR, BUSY,
+])
+
+INIT_FAST = epdsequence.Sequence("epd2in9b_V4.init_Fast", [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x18, 0x80),                # Read built-in temperature sensor
+    cmd(0x22, 0xB1),                # Load temperature value
+    cmd(0x20), BUSY,
+    cmd(0x1A, 0x5a, 0x00),          # Write to temperature register: 90
+    cmd(0x22, 0x91),                # Load temperature value
+    cmd(0x20), BUSY,
+    _DRIVER_OUTPUT,
+    cmd(0x11, 0x03),                # data entry mode
+    *_FULL_WINDOW,
+    *_CURSOR, BUSY,
+])
+
+SLEEP = epdsequence.Sequence("epd2in9b_V4.sleep", [
+    cmd(0x10, 0x01),                # deep sleep
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    FORMAT = epdbase.FORMAT_DUAL_PLANE
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST))
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST}
 
-    # send a lot of data   
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-        
     def ReadBusy(self):
         logger.debug("e-Paper busy")
         self.send_command(0X71)
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(200)                
+        epdbusy.wait_idle(self, 0, 200)
         logger.debug("e-Paper busy release")
         
 
@@ -108,131 +125,10 @@ class EPD:
 
 
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        
-        # EPD hardware init start
-        self.reset()
-
-        self.ReadBusy()   
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy()   
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data((self.height-1)%256)    
-        self.send_data((self.height-1)//256)
-        self.send_data(0x00)
-
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.send_command(0x44) #set Ram-X address start/end position   
-        self.send_data(0x00)
-        self.send_data(self.width//8-1)   
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0x00)
-        self.send_data(0x00) 
-        self.send_data((self.height-1)%256)    
-        self.send_data((self.height-1)//256)
-
-        self.send_command(0x3C) #BorderWavefrom
-        self.send_data(0x05)	
-
-        self.send_command(0x21) #  Display update control
-        self.send_data(0x00)		
-        self.send_data(0x80)	
-
-        self.send_command(0x18) #Read built-in temperature sensor
-        self.send_data(0x80)	
-
-        self.send_command(0x4E)   # set RAM x address count to 0
-        self.send_data(0x00)
-        self.send_command(0x4F)   # set RAM y address count to 0X199    
-        self.send_data(0x00)    
-        self.send_data(0x00)
-        self.ReadBusy()
-        
-        return 0
+        return self.init_sequence("full")
     
     def init_Fast(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        
-        # EPD hardware init start
-        self.reset()
-
-        self.ReadBusy()   
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy()   	
-
-        self.send_command(0x18) #Read built-in temperature sensor
-        self.send_data(0x80)
-
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0xB1)		
-        self.send_command(0x20)	
-        self.ReadBusy()   
-
-        self.send_command(0x1A) # Write to temperature register
-        self.send_data(0x5a)		# 90		
-        self.send_data(0x00)	
-                    
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0x91)		
-        self.send_command(0x20)	
-        self.ReadBusy()  
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data((self.height-1)%256)    
-        self.send_data((self.height-1)//256)
-        self.send_data(0x00)
-
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.send_command(0x44) #set Ram-X address start/end position   
-        self.send_data(0x00)
-        self.send_data(self.width//8-1)   
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0x00)
-        self.send_data(0x00) 
-        self.send_data((self.height-1)%256)    
-        self.send_data((self.height-1)//256)	
-
-        self.send_command(0x4E)   # set RAM x address count to 0
-        self.send_data(0x00)
-        self.send_command(0x4F)   # set RAM y address count to 0X199    
-        self.send_data(0x00)    
-        self.send_data(0x00)
-        self.ReadBusy()	
-        
-        return 0
-
-    def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
+        return self.init_sequence("fast")
 
     def display(self, blackimage, ryimage): # ryimage: red or yellow image
         if(self.width % 8 == 0):
@@ -244,9 +140,7 @@ class EPD:
             self.send_command(0x24)
             self.send_data2(blackimage)        
         if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
+            ryimage = epdbuffer.invert(ryimage)
             self.send_command(0x26)
             self.send_data2(ryimage)
 
@@ -262,9 +156,7 @@ class EPD:
             self.send_command(0x24)
             self.send_data2(blackimage)        
         if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
+            ryimage = epdbuffer.invert(ryimage)
             self.send_command(0x26)
             self.send_data2(ryimage)
 
@@ -296,9 +188,7 @@ class EPD:
             self.send_command(0x24)
             self.send_data2(blackimage)        
         if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
+            ryimage = epdbuffer.invert(ryimage)
             self.send_command(0x26)
             self.send_data2(ryimage)
 
@@ -383,10 +273,7 @@ class EPD:
         self.TurnOnDisplay_Partial()
         
     def sleep(self):
-        self.send_command(0x10) # deep sleep
-        self.send_data(0x01)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 ### END OF FILE ###
 
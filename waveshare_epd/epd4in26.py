@@ -30,6 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 800
@@ -42,75 +46,99 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
-class EPD:
+LUT_DATA_4GRAY =  [#  #112bytes										
+    0x80,	0x48,	0x4A,	0x22,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x0A,	0x48,	0x68,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x88,	0x48,	0x60,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0xA8,	0x48,	0x45,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+    0x07,	0x1E,	0x1C,	0x02,	0x00,						
+    0x05,	0x01,	0x05,	0x01,	0x02,						
+    0x08,	0x01,	0x01,	0x04,	0x04,						
+    0x00,	0x02,	0x00,	0x02,	0x01,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x00,						
+    0x00,	0x00,	0x00,	0x00,	0x01,						
+    0x22,	0x22,	0x22,	0x22,	0x22,						
+    0x17,	0x41,	0xA8,	0x32,	0x30,						
+    0x00,	0x00	]
+
+# SetWindow(0, height - 1, width - 1, 0): X-mode x+ y-
+_FULL_WINDOW = [
+    cmd(0x44, 0x00, 0x00, (EPD_WIDTH - 1) & 0xFF, ((EPD_WIDTH - 1) >> 8) & 0x03),
+    cmd(0x45, (EPD_HEIGHT - 1) & 0xFF, ((EPD_HEIGHT - 1) >> 8) & 0xFF, 0x00, 0x00),
+]
+
+# SetCursor(0, 0)
+_CURSOR = [cmd(0x4E, 0x00, 0x00), cmd(0x4F, 0x00, 0x00)]
+
+_INIT_STEPS = [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x18, 0x80),                # use the internal temperature sensor
+    cmd(0x0C, 0xAE, 0xC7, 0xC3, 0xC0, 0x80),    # set soft start
+    cmd(0x01, (EPD_HEIGHT - 1) % 256, (EPD_HEIGHT - 1) // 256, 0x02),  # drive output control
+    cmd(0x3C, 0x01),                # Border setting
+    cmd(0x11, 0x01),                # data entry mode: X-mode x+ y-
+    *_FULL_WINDOW,
+    *_CURSOR, BUSY,
+]
+
+INIT = epdsequence.Sequence("epd4in26.init", _INIT_STEPS)
+
+INIT_FAST = epdsequence.Sequence("epd4in26.init_Fast", _INIT_STEPS + [
+    cmd(0x1A, 0x5A),                # TEMP (1.5s)
+    cmd(0x22, 0x91),
+    cmd(0x20), BUSY,
+])
+
+_LUT_STEPS = [
+    cmd(0x32, *LUT_DATA_4GRAY[:105]),
+    cmd(0x03, LUT_DATA_4GRAY[105]), # VGH
+    cmd(0x04, *LUT_DATA_4GRAY[106:109]),    # VSH1, VSH2, VSL
+    cmd(0x2C, LUT_DATA_4GRAY[109]), # VCOM Voltage
+]
+
+SET_LUT = epdsequence.Sequence("epd4in26.Lut", _LUT_STEPS)
+
+INIT_4GRAY = epdsequence.Sequence("epd4in26.init_4GRAY", _INIT_STEPS + _LUT_STEPS)
+
+# Sent by display_Partial after its reset
+PARTIAL = epdsequence.Sequence("epd4in26.partial", [
+    cmd(0x18, 0x80),
+    cmd(0x3C, 0x80),                # BorderWavefrom
+    cmd(0x01, (EPD_HEIGHT - 1) % 256, (EPD_HEIGHT - 1) // 256),  # drive output control
+    cmd(0x11, 0x01),                # data entry mode: X-mode x+ y-
+    *_FULL_WINDOW,
+    *_CURSOR,
+])
+
+SLEEP = epdsequence.Sequence("epd4in26.sleep", [
+    cmd(0x10, 0x01),                # DEEP_SLEEP
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST, epdbase.GRAY4))
+    RESET_MS = (20, 2, 20)
+    BUSY_POLL_MS = 20
+    BUSY_SETTLE_MS = 20
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST, "4gray": INIT_4GRAY}
+
     def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
+        super().__init__()
         self.GRAY1  = GRAY1 #white
         self.GRAY2  = GRAY2
         self.GRAY3  = GRAY3 #gray
         self.GRAY4  = GRAY4 #Blackest
 
-    LUT_DATA_4Gray =  [#  #112bytes										
-        0x80,	0x48,	0x4A,	0x22,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-        0x0A,	0x48,	0x68,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-        0x88,	0x48,	0x60,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-        0xA8,	0x48,	0x45,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-        0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-        0x07,	0x1E,	0x1C,	0x02,	0x00,						
-        0x05,	0x01,	0x05,	0x01,	0x02,						
-        0x08,	0x01,	0x01,	0x04,	0x04,						
-        0x00,	0x02,	0x00,	0x02,	0x01,						
-        0x00,	0x00,	0x00,	0x00,	0x00,						
-        0x00,	0x00,	0x00,	0x00,	0x00,						
-        0x00,	0x00,	0x00,	0x00,	0x00,						
-        0x00,	0x00,	0x00,	0x00,	0x00,						
-        0x00,	0x00,	0x00,	0x00,	0x00,						
-        0x00,	0x00,	0x00,	0x00,	0x01,						
-        0x22,	0x22,	0x22,	0x22,	0x22,						
-        0x17,	0x41,	0xA8,	0x32,	0x30,						
-        0x00,	0x00	]
+    LUT_DATA_4Gray = LUT_DATA_4GRAY
     
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 1):
-            busy = epdconfig.digital_read(self.busy_pin)
-            epdconfig.delay_ms(20)
-        epdconfig.delay_ms(20)
-        logger.debug("e-Paper busy release")
-
     def TurnOnDisplay(self):
         self.send_command(0x22) #Display Update Control
         self.send_data(0xF7)
@@ -173,209 +201,20 @@ class EPD:
         self.send_data((y >> 8) & 0xFF)
         
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x18) # use the internal temperature sensor
-        self.send_data(0x80)
-
-        self.send_command(0x0C) #set soft start     
-        self.send_data(0xAE)
-        self.send_data(0xC7)
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01)   #      drive output control    
-        self.send_data((self.height-1)%256) #  Y  
-        self.send_data((self.height-1)//256) #  Y 
-        self.send_data(0x02)
-
-        self.send_command(0x3C)        # Border       Border setting 
-        self.send_data(0x01)
-
-        self.send_command(0x11)        #    data  entry  mode
-        self.send_data(0x01)           #       X-mode  x+ y-    
-
-        self.SetWindow(0, self.height-1, self.width-1, 0)
-
-        self.SetCursor(0, 0)
-        self.ReadBusy()
-
-        # EPD hardware init end
-        return 0
+        return self.init_sequence("full")
     
     def init_Fast(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-        
-        self.send_command(0x18) # use the internal temperature sensor
-        self.send_data(0x80)
-
-        self.send_command(0x0C) #set soft start     
-        self.send_data(0xAE)
-        self.send_data(0xC7)
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01)   #      drive output control    
-        self.send_data((self.height-1)%256) #  Y  
-        self.send_data((self.height-1)//256) #  Y 
-        self.send_data(0x02)
-
-        self.send_command(0x3C)        # Border       Border setting 
-        self.send_data(0x01)
-
-        self.send_command(0x11)        #    data  entry  mode
-        self.send_data(0x01)           #       X-mode  x+ y-    
-
-        self.SetWindow(0, self.height-1, self.width-1, 0)
-
-        self.SetCursor(0, 0)
-        self.ReadBusy()
-
-        #TEMP (1.5s)
-        self.send_command(0x1A)  
-        self.send_data(0x5A) 
-
-        self.send_command(0x22)  
-        self.send_data(0x91) 
-        self.send_command(0x20) 
-        
-        self.ReadBusy()
-
-        # EPD hardware init end
-        return 0
+        return self.init_sequence("fast")
 
     def Lut(self):
-        self.send_command(0x32)
-        for count in range(0, 105):
-            self.send_data(self.LUT_DATA_4Gray[count])
-
-        self.send_command(0x03) #VGH      
-        self.send_data(self.LUT_DATA_4Gray[105])
-
-        self.send_command(0x04) #      
-        self.send_data(self.LUT_DATA_4Gray[106]) #VSH1   
-        self.send_data(self.LUT_DATA_4Gray[107]) #VSH2   
-        self.send_data(self.LUT_DATA_4Gray[108]) #VSL   
-
-        self.send_command(0x2C)     #VCOM Voltage
-        self.send_data(self.LUT_DATA_4Gray[109])    #0x1C
+        SET_LUT.run(self)
 
     def init_4GRAY(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-        
-        self.send_command(0x18) # use the internal temperature sensor
-        self.send_data(0x80)
-
-        self.send_command(0x0C) #set soft start     
-        self.send_data(0xAE)
-        self.send_data(0xC7)
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01)   #      drive output control    
-        self.send_data((self.height-1)%256) #  Y  
-        self.send_data((self.height-1)//256) #  Y 
-        self.send_data(0x02)
+        return self.init_sequence("4gray")
 
-        self.send_command(0x3C)        # Border       Border setting 
-        self.send_data(0x01)
 
-        self.send_command(0x11)        #    data  entry  mode
-        self.send_data(0x01)           #       X-mode  x+ y-    
-
-        self.SetWindow(0, self.height-1, self.width-1, 0)
-
-        self.SetCursor(0, 0)
-        self.ReadBusy()
-
-        self.Lut()
-        # EPD hardware init end
-        return 0
-
-
-    def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
-    
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
-        return buf
+        return epdbuffer.pack_4gray(image, self.width, self.height)
 
     def display(self, image):
         self.send_command(0x24)
@@ -403,22 +242,7 @@ class EPD:
         # Reset
         self.reset()
 
-        self.send_command(0x18) #BorderWavefrom
-        self.send_data(0x80)
-
-        self.send_command(0x3C) #BorderWavefrom
-        self.send_data(0x80)
-
-        self.send_command(0x01)   #      drive output control    
-        self.send_data((self.height-1)%256) #  Y  
-        self.send_data((self.height-1)//256) #  Y 
-
-        self.send_command(0x11)        #    data  entry  mode
-        self.send_data(0x01)           #       X-mode  x+ y-    
-
-        self.SetWindow(0, self.height-1, self.width-1, 0)
-
-        self.SetCursor(0, 0)
+        PARTIAL.run(self)
 
         self.send_command(0x24)   #Write Black and White image to RAM
         self.send_data2(Image)
@@ -427,69 +251,11 @@ class EPD:
 
     def display_4Gray(self, image):
         self.send_command(0x24)
-        for i in range(0, 48000):                     #5808*4  46464
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01  
-                    elif(temp2 == 0x80): 
-                        temp3 |= 0x01 
-                    else: #0x40
-                        temp3 |= 0x00 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x01
-                    else :   #0x40
-                        temp3 |= 0x00	
-                    if(j!=1 or k!=1):				
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-            
-        self.send_command(0x26)	       
-        for i in range(0, 48000):                #5808*4  46464
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00
-                    else: #0x40
-                        temp3 |= 0x01 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00 
-                    else:    #0x40
-                            temp3 |= 0x01	
-                    if(j!=1 or k!=1):					
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-        
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_LOW))
+
+        self.send_command(0x26)
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_HIGH))
+
         self.TurnOnDisplay_4GRAY()
 
     def Clear(self):
@@ -502,9 +268,6 @@ class EPD:
         self.TurnOnDisplay()
 
     def sleep(self):
-        self.send_command(0x10) # DEEP_SLEEP
-        self.send_data(0x01)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 ### END OF FILE ###
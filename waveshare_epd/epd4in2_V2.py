@@ -30,8 +30,11 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 from PIL import Image
-import RPi.GPIO as GPIO
 
 # Display resolution
 EPD_WIDTH  = 400
@@ -44,15 +47,116 @@ GRAY4 = 0x00  # Blackest
 
 logger = logging.getLogger(__name__)
 
+LUT_ALL=[   0x01,	0x0A,	0x1B,	0x0F,	0x03,	0x01,	0x01,	
+            0x05,	0x0A,	0x01,	0x0A,	0x01,	0x01,	0x01,	
+            0x05,	0x08,	0x03,	0x02,	0x04,	0x01,	0x01,	
+            0x01,	0x04,	0x04,	0x02,	0x00,	0x01,	0x01,	
+            0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
+            0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
+            0x01,	0x0A,	0x1B,	0x0F,	0x03,	0x01,	0x01,	
+            0x05,	0x4A,	0x01,	0x8A,	0x01,	0x01,	0x01,	
+            0x05,	0x48,	0x03,	0x82,	0x84,	0x01,	0x01,	
+            0x01,	0x84,	0x84,	0x82,	0x00,	0x01,	0x01,	
+            0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
+            0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
+            0x01,	0x0A,	0x1B,	0x8F,	0x03,	0x01,	0x01,	
+            0x05,	0x4A,	0x01,	0x8A,	0x01,	0x01,	0x01,	
+            0x05,	0x48,	0x83,	0x82,	0x04,	0x01,	0x01,	
+            0x01,	0x04,	0x04,	0x02,	0x00,	0x01,	0x01,	
+            0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
+            0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
+            0x01,	0x8A,	0x1B,	0x8F,	0x03,	0x01,	0x01,	
+            0x05,	0x4A,	0x01,	0x8A,	0x01,	0x01,	0x01,	
+            0x05,	0x48,	0x83,	0x02,	0x04,	0x01,	0x01,	
+            0x01,	0x04,	0x04,	0x02,	0x00,	0x01,	0x01,	
+            0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
+            0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
+            0x01,	0x8A,	0x9B,	0x8F,	0x03,	0x01,	0x01,	
+            0x05,	0x4A,	0x01,	0x8A,	0x01,	0x01,	0x01,	
+            0x05,	0x48,	0x03,	0x42,	0x04,	0x01,	0x01,	
+            0x01,	0x04,	0x04,	0x42,	0x00,	0x01,	0x01,	
+            0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
+            0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
+            0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+            0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
+            0x02,	0x00,	0x00,	0x07,	0x17,	0x41,	0xA8,	
+            0x32,	0x30 ]
+
+_WINDOW = [
+    cmd(0x11, 0x03),                # data  entry  mode: X-mode
+    cmd(0x44, 0x00, 0x31),
+    cmd(0x45, 0x00, 0x00, 0x2B, 0x01),
+    cmd(0x4E, 0x00),
+    cmd(0x4F, 0x00, 0x00),
+]
+
+INIT = epdsequence.Sequence("epd4in2_V2.init", [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x21, 0x40, 0x00),          # Display update control
+    cmd(0x3C, 0x05),                # BorderWavefrom
+    *_WINDOW, BUSY,
+])
+
+def _init_fast_steps(temperature):
+    return [
+        BUSY,
+        cmd(0x12), BUSY,            # SWRESET
+        cmd(0x21, 0x40, 0x00),      # Display update control
+        cmd(0x3C, 0x05),            # BorderWavefrom
+        cmd(0x1A, temperature),
+        cmd(0x22, 0x91),            # Load temperature value
+        cmd(0x20), BUSY,
+        *_WINDOW, BUSY,
+    ]
+
+INIT_FAST = epdsequence.Sequence("epd4in2_V2.init_fast", _init_fast_steps(0x6E))       # 1.5s
+INIT_FAST_1S = epdsequence.Sequence("epd4in2_V2.init_fast_1s", _init_fast_steps(0x5A))
+
+_LUT_STEPS = [
+    cmd(0x32, *LUT_ALL[:227]),
+    cmd(0x3F, LUT_ALL[227]),
+    cmd(0x03, LUT_ALL[228]),
+    cmd(0x04, *LUT_ALL[229:232]),
+    cmd(0x2c, LUT_ALL[232]),
+]
+
+SET_LUT = epdsequence.Sequence("epd4in2_V2.Lut", _LUT_STEPS)
+
+INIT_4GRAY = epdsequence.Sequence("epd4in2_V2.Init_4Gray", [
+    BUSY,
+    cmd(0x12), BUSY,                # SWRESET
+    cmd(0x21, 0x00, 0x00),          # Display update control
+    cmd(0x3C, 0x03),                # BorderWavefrom
+    cmd(0x0C, 0x8B, 0x9C, 0xA4, 0x0F),  # BTST: 8B, 9C, 96 A4, 0F
+    *_LUT_STEPS,
+    *_WINDOW, BUSY,
+])
+
+# Sent by display_Partial before the image
+PARTIAL = epdsequence.Sequence("epd4in2_V2.partial", [
+    cmd(0x3C, 0x80),                # BorderWavefrom
+    cmd(0x21, 0x00, 0x00),          # Display update control
+    cmd(0x3C, 0x80),                # BorderWavefrom
+    *_WINDOW[1:],
+])
+
+SLEEP = epdsequence.Sequence("epd4in2_V2.sleep", [
+    cmd(0x10, 0x01),                # DEEP_SLEEP
+    delay(2000),
+])
+
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST, epdbase.GRAY4))
+    RESET_MS = (100, 2, 100)
+    BUSY_POLL_MS = 20
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST, "4gray": INIT_4GRAY}
 
-class EPD:
     def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
+        super().__init__()
         self.Seconds_1_5S = 0
         self.Seconds_1S = 1
         self.GRAY1 = GRAY1  # white
@@ -61,74 +165,8 @@ class EPD:
         self.GRAY4 = GRAY4  # Blackest
         
 
-    LUT_ALL=[   0x01,	0x0A,	0x1B,	0x0F,	0x03,	0x01,	0x01,	
-                0x05,	0x0A,	0x01,	0x0A,	0x01,	0x01,	0x01,	
-                0x05,	0x08,	0x03,	0x02,	0x04,	0x01,	0x01,	
-                0x01,	0x04,	0x04,	0x02,	0x00,	0x01,	0x01,	
-                0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
-                0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
-                0x01,	0x0A,	0x1B,	0x0F,	0x03,	0x01,	0x01,	
-                0x05,	0x4A,	0x01,	0x8A,	0x01,	0x01,	0x01,	
-                0x05,	0x48,	0x03,	0x82,	0x84,	0x01,	0x01,	
-                0x01,	0x84,	0x84,	0x82,	0x00,	0x01,	0x01,	
-                0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
-                0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
-                0x01,	0x0A,	0x1B,	0x8F,	0x03,	0x01,	0x01,	
-                0x05,	0x4A,	0x01,	0x8A,	0x01,	0x01,	0x01,	
-                0x05,	0x48,	0x83,	0x82,	0x04,	0x01,	0x01,	
-                0x01,	0x04,	0x04,	0x02,	0x00,	0x01,	0x01,	
-                0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
-                0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
-                0x01,	0x8A,	0x1B,	0x8F,	0x03,	0x01,	0x01,	
-                0x05,	0x4A,	0x01,	0x8A,	0x01,	0x01,	0x01,	
-                0x05,	0x48,	0x83,	0x02,	0x04,	0x01,	0x01,	
-                0x01,	0x04,	0x04,	0x02,	0x00,	0x01,	0x01,	
-                0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
-                0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
-                0x01,	0x8A,	0x9B,	0x8F,	0x03,	0x01,	0x01,	
-                0x05,	0x4A,	0x01,	0x8A,	0x01,	0x01,	0x01,	
-                0x05,	0x48,	0x03,	0x42,	0x04,	0x01,	0x01,	
-                0x01,	0x04,	0x04,	0x42,	0x00,	0x01,	0x01,	
-                0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
-                0x01,	0x00,	0x00,	0x00,	0x00,	0x01,	0x01,	
-                0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-                0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	0x00,	
-                0x02,	0x00,	0x00,	0x07,	0x17,	0x41,	0xA8,	
-                0x32,	0x30 ]
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(100)
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(100)
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    # send a lot of data   
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def ReadBusy(self):        
-        logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(20)                
-        logger.debug("e-Paper busy release")
-    
+    LUT_ALL = LUT_ALL
+
     def TurnOnDisplay(self):
         self.send_command(0x22) #Display Update Control
         self.send_data(0xF7)
@@ -154,231 +192,22 @@ class EPD:
         self.ReadBusy()
 
     def init(self):
-        if epdconfig.module_init() != 0:
-            return -1
-        # EPD hardware init start
-        self.reset()
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x21)  # Display update control
-        self.send_data(0x40)
-        self.send_data(0x00)
-
-        self.send_command(0x3C)  # BorderWavefrom
-        self.send_data(0x05)
-
-        self.send_command(0x11)  # data  entry  mode
-        self.send_data(0x03)  # X-mode
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x31)  
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0x2B)
-        self.send_data(0x01)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.ReadBusy()
-
-        return 0
+        return self.init_sequence("full")
     
-    def init_fast(self, mode):
-        if epdconfig.module_init() != 0:
-            return -1
-        # EPD hardware init start
-        self.reset()
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x21)  # Display update control
-        self.send_data(0x40)
-        self.send_data(0x00)
-
-        self.send_command(0x3C)  # BorderWavefrom
-        self.send_data(0x05)
-
-        if mode == self.Seconds_1_5S:
-            self.send_command(0x1A)
-            self.send_data(0x6E)  
-        else :
-            self.send_command(0x1A)
-            self.send_data(0x5A)  
-
-        self.send_command(0x22)  # Load temperature value
-        self.send_data(0x91)  
-        self.send_command(0x20)  
-        self.ReadBusy()
-
-        self.send_command(0x11)  # data  entry  mode
-        self.send_data(0x03)  # X-mode
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x31)  
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0x2B)
-        self.send_data(0x01)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.ReadBusy()
-
-        return 0
+    # mode: Seconds_1_5S (the "fast" sequence) or Seconds_1S
+    def init_fast(self, mode=0):
+        return self.init_sequence("fast" if mode == self.Seconds_1_5S else INIT_FAST_1S)
 
     def Lut(self):
-        self.send_command(0x32)
-        for i in range(227):
-            self.send_data(self.LUT_ALL[i])
-
-        self.send_command(0x3F)
-        self.send_data(self.LUT_ALL[227])
-
-        self.send_command(0x03)
-        self.send_data(self.LUT_ALL[228])
-
-        self.send_command(0x04)
-        self.send_data(self.LUT_ALL[229])
-        self.send_data(self.LUT_ALL[230])
-        self.send_data(self.LUT_ALL[231])
-
-        self.send_command(0x2c)
-        self.send_data(self.LUT_ALL[232])
-
-    
+        SET_LUT.run(self)
 
     def Init_4Gray(self):
-        if epdconfig.module_init() != 0:
-            return -1
-        # EPD hardware init start
-        self.reset()
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x21)  # Display update control
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x3C)  # BorderWavefrom
-        self.send_data(0x03)
-
-        self.send_command(0x0C)  # BTST
-        self.send_data(0x8B) # 8B
-        self.send_data(0x9C) # 9C 
-        self.send_data(0xA4) # 96 A4
-        self.send_data(0x0F) # 0F
-
-        self.Lut()
-
-        self.send_command(0x11)  # data  entry  mode
-        self.send_data(0x03)  # X-mode
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x31)  
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0x2B)
-        self.send_data(0x01)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.ReadBusy()
-
-        return 0
-
-    def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
+        return self.init_sequence("4gray")
 
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i = 0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0xC0:
-                        pixels[x, y] = 0x80
-                    elif pixels[x, y] == 0x80:
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if i % 4 == 0:
-                        buf[int((x + (y * self.width)) / 4)] = (
-                                    (pixels[x - 3, y] & 0xc0) | (pixels[x - 2, y] & 0xc0) >> 2 | (
-                                        pixels[x - 1, y] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
-
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = x
-                    if pixels[x, y] == 0xC0:
-                        pixels[x, y] = 0x80
-                    elif pixels[x, y] == 0x80:
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if i % 4 == 0:
-                        buf[int((newx + (newy * self.width)) / 4)] = (
-                                    (pixels[x, y - 3] & 0xc0) | (pixels[x, y - 2] & 0xc0) >> 2 | (
-                                        pixels[x, y - 1] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
-
-        return buf
-    
+        # Portrait images are transposed, not rotated, on this panel.
+        return epdbuffer.pack_4gray(image, self.width, self.height, transpose=True)
+
     def Clear(self):
         if self.width % 8 == 0:
             linewidth = int(self.width / 8)
@@ -412,119 +241,23 @@ class EPD:
         self.TurnOnDisplay_Fast()
 
     def display_Partial(self, Image):
-        self.send_command(0x3C)  # BorderWavefrom
-        self.send_data(0x80)
-
-        self.send_command(0x21)  # Display update control
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x3C)  # BorderWavefrom
-        self.send_data(0x80)
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x31)  
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0x2B)
-        self.send_data(0x01)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00) 
+        PARTIAL.run(self)
 
         self.send_command(0x24) # WRITE_RAM
         self.send_data2(Image)  
         self.TurnOnDisplay_Partial()
 
     def display_4Gray(self, image):
-        if self.width % 8 == 0:
-            linewidth = int(self.width / 8)
-        else:
-            linewidth = int(self.width / 8) + 1
-
-        buf = [0x00] * self.height * linewidth
-
         self.send_command(0x24)
-        for i in range(0, int(EPD_WIDTH * EPD_HEIGHT / 8)):  # EPD_WIDTH * EPD_HEIGHT / 4
-            temp3 = 0
-            for j in range(0, 2):
-                temp1 = image[i * 2 + j]
-                for k in range(0, 2):
-                    temp2 = temp1 & 0xC0
-                    if temp2 == 0xC0:
-                        temp3 |= 0x01  # white
-                    elif temp2 == 0x00:
-                        temp3 |= 0x00  # black
-                    elif temp2 == 0x80:
-                        temp3 |= 0x00  # gray1
-                    else:  # 0x40
-                        temp3 |= 0x01  # gray2
-                    temp3 <<= 1
-
-                    temp1 <<= 2
-                    temp2 = temp1 & 0xC0
-                    if temp2 == 0xC0:  # white
-                        temp3 |= 0x01
-                    elif temp2 == 0x00:  # black
-                        temp3 |= 0x00
-                    elif temp2 == 0x80:
-                        temp3 |= 0x00  # gray1
-                    else:  # 0x40
-                        temp3 |= 0x01  # gray2
-                    if j != 1 or k != 1:
-                        temp3 <<= 1
-                    temp1 <<= 2
-            buf[i] = temp3
-        self.send_data2(buf)
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_LOW))
 
         self.send_command(0x26)
-        for i in range(0, int(EPD_WIDTH * EPD_HEIGHT / 8)):
-            temp3 = 0
-            for j in range(0, 2):
-                temp1 = image[i * 2 + j]
-                for k in range(0, 2):
-                    temp2 = temp1 & 0xC0
-                    if temp2 == 0xC0:
-                        temp3 |= 0x01  # white
-                    elif temp2 == 0x00:
-                        temp3 |= 0x00  # black
-                    elif temp2 == 0x80:
-                        temp3 |= 0x01  # gray1
-                    else:  # 0x40
-                        temp3 |= 0x00  # gray2
-                    temp3 <<= 1
-
-                    temp1 <<= 2
-                    temp2 = temp1 & 0xC0
-                    if temp2 == 0xC0:  # white
-                        temp3 |= 0x01
-                    elif temp2 == 0x00:  # black
-                        temp3 |= 0x00
-                    elif temp2 == 0x80:
-                        temp3 |= 0x01  # gray1
-                    else:  # 0x40
-                        temp3 |= 0x00  # gray2
-                    if j != 1 or k != 1:
-                        temp3 <<= 1
-                    temp1 <<= 2
-            buf[i] = temp3
-        self.send_data2(buf)
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_HIGH))
 
         self.TurnOnDisplay_4GRAY()
-        # pass
 
     def sleep(self):
-        self.send_command(0x10)  # DEEP_SLEEP
-        self.send_data(0x01)
-
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 
 ### END OF FILE ###
@@ -30,6 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 792
@@ -42,94 +46,126 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
-class EPD:
+LUT_DATA_4GRAY = [
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    
+    0x01, 0x4A, 0x00, 0x00, 0x00, 0x01, 0x00,
+    0x01, 0x82, 0x42, 0x00, 0x00, 0x10, 0x00,
+    0x01, 0x8A, 0x00, 0x00, 0x00, 0x01, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    
+    0x01, 0x41, 0x00, 0x00, 0x00, 0x01, 0x00,
+    0x01, 0x82, 0x42, 0x00, 0x00, 0x10, 0x00,
+    0x01, 0x81, 0x00, 0x00, 0x00, 0x01, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 
+    
+    0x01, 0x81, 0x00, 0x00, 0x00, 0x01, 0x00,
+    0x01, 0x82, 0x42, 0x00, 0x00, 0x10, 0x00,
+    0x01, 0x41, 0x00, 0x00, 0x00, 0x01, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+
+    0x01, 0x8A, 0x00, 0x00, 0x00, 0x01, 0x00,
+    0x01, 0x82, 0x42, 0x00, 0x00, 0x10, 0x00,
+    0x01, 0x4A, 0x00, 0x00, 0x00, 0x01, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 
+
+    0x02, 0x00, 0x00,
+    0x22, 0x17, 0x41, 0xA8, 0x32, 0x40, ]
+
+# Both halves of the panel, each with its own controller RAM window
+_WINDOWS = [
+    cmd(0x11, 0x01),
+    cmd(0x44, 0x00, 0x31),          # Set Ram X- address Start / End position
+    cmd(0x45, 0x0f, 0x01, 0x00, 0x00),  # Set Ram Y- address  Start / End position
+    cmd(0x4e, 0x00),
+    cmd(0x4f, 0x0f, 0x01), BUSY,
+    cmd(0x91, 0x00),
+    cmd(0xC4, 0x31, 0x00),          # Set Ram X- address Start / End position
+    cmd(0xC5, 0x0f, 0x01, 0x00, 0x00),  # Set Ram Y- address  Start / End position
+    cmd(0xCE, 0x31),
+    cmd(0xCF, 0x0f, 0x01),
+]
+
+INIT = epdsequence.Sequence("epd5in79.init", [
+    BUSY,                           # waiting for the electronic paper IC to release the idle signal
+    cmd(0x12), BUSY,                # POWER ON
+    *_WINDOWS, BUSY,
+])
+
+INIT_FAST = epdsequence.Sequence("epd5in79.init_Fast", [
+    BUSY,
+    cmd(0x12), BUSY,
+    cmd(0x18, 0x80),
+    cmd(0x22, 0xB1),
+    cmd(0x20), BUSY,
+    cmd(0x1A, 0x64, 0x00),
+    cmd(0x22, 0x91),
+    cmd(0x20), BUSY,
+    *_WINDOWS, BUSY,
+])
+
+INIT_PART = epdsequence.Sequence("epd5in79.init_Partial", [
+    BUSY,
+    cmd(0x12), BUSY,
+    cmd(0x3C, 0x80),
+])
+
+_LUT_STEPS = [
+    cmd(0x32, *LUT_DATA_4GRAY[:227]),
+    cmd(0x3f, LUT_DATA_4GRAY[227]),
+    cmd(0x03, LUT_DATA_4GRAY[228]),
+    cmd(0x04, *LUT_DATA_4GRAY[229:232]),
+    cmd(0x2C, LUT_DATA_4GRAY[232]),
+]
+
+SET_LUT = epdsequence.Sequence("epd5in79.EPD_5in79_Lut", _LUT_STEPS)
+
+INIT_4GRAY = epdsequence.Sequence("epd5in79.init_4Gray", [
+    BUSY,
+    cmd(0x12), BUSY,
+    cmd(0x0C, 0x8B, 0x9C, 0xA6, 0x0F),
+    cmd(0x3C, 0x81), BUSY,
+    *_WINDOWS,
+    *_LUT_STEPS,
+])
+
+SLEEP = epdsequence.Sequence("epd5in79.sleep", [
+    cmd(0X10, 0x03),                # deep sleep
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST, epdbase.GRAY4))
+    RESET_MS = (200, 1, 200)
+    BUSY_POLL_MS = 200
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST, "part": INIT_PART, "4gray": INIT_4GRAY}
+
     def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
+        super().__init__()
         self.GRAY1  = GRAY1 #white
         self.GRAY2  = GRAY2
         self.GRAY3  = GRAY3 #gray
         self.GRAY4  = GRAY4 #Blackest
 
-        self.LUT_DATA_4Gray = [
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            
-            0x01, 0x4A, 0x00, 0x00, 0x00, 0x01, 0x00,
-            0x01, 0x82, 0x42, 0x00, 0x00, 0x10, 0x00,
-            0x01, 0x8A, 0x00, 0x00, 0x00, 0x01, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            
-            0x01, 0x41, 0x00, 0x00, 0x00, 0x01, 0x00,
-            0x01, 0x82, 0x42, 0x00, 0x00, 0x10, 0x00,
-            0x01, 0x81, 0x00, 0x00, 0x00, 0x01, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 
-            
-            0x01, 0x81, 0x00, 0x00, 0x00, 0x01, 0x00,
-            0x01, 0x82, 0x42, 0x00, 0x00, 0x10, 0x00,
-            0x01, 0x41, 0x00, 0x00, 0x00, 0x01, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-
-            0x01, 0x8A, 0x00, 0x00, 0x00, 0x01, 0x00,
-            0x01, 0x82, 0x42, 0x00, 0x00, 0x10, 0x00,
-            0x01, 0x4A, 0x00, 0x00, 0x00, 0x01, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 
-
-            0x02, 0x00, 0x00,
-            0x22, 0x17, 0x41, 0xA8, 0x32, 0x40, ]
-
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(1)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    # send a lot of data   
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-        
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(200)
-        logger.debug("e-Paper busy release")
+        self.LUT_DATA_4Gray = LUT_DATA_4GRAY
 
     def TurnOnDisplay(self):
         self.send_command(0x22)
@@ -160,275 +196,22 @@ class EPD:
         self.ReadBusy()                 # waiting for the electronic paper IC to release the idle signal
 
     def EPD_5in79_Lut(self):
-        self.send_command(0x32)
-        self.send_data2(self.LUT_DATA_4Gray[:227])
-        self.send_command(0x3f) 
-        self.send_data(self.LUT_DATA_4Gray[227])
-
-        self.send_command(0x03)     
-        self.send_data(self.LUT_DATA_4Gray[228])
-
-        self.send_command(0x04)   
-        self.send_data(self.LUT_DATA_4Gray[229]) 
-        self.send_data(self.LUT_DATA_4Gray[230]) 
-        self.send_data(self.LUT_DATA_4Gray[231])   
-
-        self.send_command(0x2C) 
-        self.send_data(self.LUT_DATA_4Gray[232]) 
+        SET_LUT.run(self)
 
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-            
-        self.reset()
-        self.ReadBusy()             # waiting for the electronic paper IC to release the idle signal
-        self.send_command(0x12)     # POWER ON
-        self.ReadBusy()             # waiting for the electronic paper IC to release the idle signal
-
-        self.send_command(0x11)
-        self.send_data(0x01)
-
-        self.send_command(0x44)	    #  Set Ram X- address Start / End position
-        self.send_data(0x00)        #  XStart, POR = 00h
-        self.send_data(0x31)        # 400/8-1
-        self.send_command(0x45)     #  Set Ram Y- address  Start / End position 
-        self.send_data(0x0f)  
-        self.send_data(0x01)        # 300-1	
-        self.send_data(0x00)        #  YEnd L
-        self.send_data(0x00)        #  YEnd H 
-
-        self.send_command(0x4e)	 						 
-        self.send_data(0x00)	
-        self.send_command(0x4f)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01) 	
-
-        self.ReadBusy()   
-
-        self.send_command(0x91)
-        self.send_data(0x00)
-
-        self.send_command(0xC4)     #  Set Ram X- address Start / End position
-        self.send_data(0x31)        #  XStart, POR = 00h
-        self.send_data(0x00)        # 400/8-1
-        self.send_command(0xC5)     #  Set Ram Y- address  Start / End position 
-        self.send_data(0x0f)  
-        self.send_data(0x01)        # 300-1	
-        self.send_data(0x00)        # YEnd L
-        self.send_data(0x00)        # YEnd H 
-
-        self.send_command(0xCE)	 						 
-        self.send_data(0x31)	
-        self.send_command(0xCF)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-
-        self.ReadBusy()   
-
-        return 0
+        return self.init_sequence("full")
 
     def init_Fast(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-            
-        self.reset()
-        self.ReadBusy()
-        self.send_command(0x12)
-        self.ReadBusy()
-
-        self.send_command(0x18)
-        self.send_data(0x80)	
-
-        self.send_command(0x22)
-        self.send_data(0xB1)		
-        self.send_command(0x20)	
-        self.ReadBusy()   
-
-        self.send_command(0x1A)
-        self.send_data(0x64)		
-        self.send_data(0x00)	
-                
-        self.send_command(0x22)
-        self.send_data(0x91)		
-        self.send_command(0x20)	
-        self.ReadBusy()   
-
-        self.send_command(0x11)
-        self.send_data(0x01)
-
-        self.send_command(0x44)
-        self.send_data(0x00)
-        self.send_data(0x31)
-        self.send_command(0x45)
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x4e)	 						 
-        self.send_data(0x00)	
-        self.send_command(0x4f)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01) 	
-
-        self.ReadBusy()   
-
-        self.send_command(0x91)
-        self.send_data(0x00)
-
-        self.send_command(0xC4)
-        self.send_data(0x31)
-        self.send_data(0x00)
-        self.send_command(0xC5)
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0xCe)	 						 
-        self.send_data(0x31)	
-        self.send_command(0xCf)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-
-        self.ReadBusy()   
-
-        return 0
+        return self.init_sequence("fast")
     
     def init_Partial(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-            
-        self.reset()
-        self.ReadBusy()
-        self.send_command(0x12)
-        self.ReadBusy() 
-
-        self.send_command(0x3C)
-        self.send_data(0x80)
-
-        return 0
+        return self.init_sequence("part")
     
     def init_4Gray(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-            
-        self.reset()
-        self.ReadBusy()   
-        self.send_command(0x12) 
-        self.ReadBusy() 
-
-        self.send_command(0x0C)     
-        self.send_data(0x8B)    
-        self.send_data(0x9C)    
-        self.send_data(0xA6)    
-        self.send_data(0x0F)
-
-        self.send_command(0x3C)
-        self.send_data(0x81)
-
-        self.ReadBusy()	
-
-        self.send_command(0x11)
-        self.send_data(0x01)
+        return self.init_sequence("4gray")
 
-        self.send_command(0x44)
-        self.send_data(0x00)
-        self.send_data(0x31)
-        self.send_command(0x45)
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x4e)	 						 
-        self.send_data(0x00)	
-        self.send_command(0x4f)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01) 	
-
-        self.ReadBusy()   
-
-        self.send_command(0x91)
-        self.send_data(0x00)
-
-        self.send_command(0xC4)
-        self.send_data(0x31)
-        self.send_data(0x00)
-        self.send_command(0xC5)
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0xCe)	 						 
-        self.send_data(0x31)	
-        self.send_command(0xCf)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-
-        self.EPD_5in79_Lut()
-        return 0
-
-    def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
-    
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
-        return buf
+        return epdbuffer.pack_4gray(image, self.width, self.height)
 
     def display(self, imageblack):
         Width =int(self.width / 16)+1
@@ -575,90 +358,13 @@ class EPD:
         Width =int(self.width / 16)+1
         Width1 =int(self.width / 8)
 
-        self.send_command(0x24)
-        for j in range(self.height):   
-            for i in range(Width):
-                temp3=0
-                for o in range(0, 2):
-                    temp1 = image[(j * Width1 + i)*2+o]
-                    for k in range(0, 4):
-                        temp2 = temp1&0xC0 
-                        if(temp2 == 0xC0):
-                            temp3 |= 0x01
-                        elif(temp2 == 0x00):
-                            temp3 |= 0x00  
-                        elif(temp2 == 0x80): 
-                            temp3 |= 0x00 
-                        else: #0x40
-                            temp3 |= 0x01 
-                        if(o!=1 or k!=3):
-                            temp3 <<= 1
-                        temp1 <<= 2
-                self.send_data(temp3)
-            
-        self.send_command(0x26)	       
-        for j in range(self.height):   
-            for i in range(Width):
-                temp3=0
-                for o in range(0, 2):
-                    temp1 = image[(j * Width1 + i)*2+o]
-                    for k in range(0, 4):
-                        temp2 = temp1&0xC0 
-                        if(temp2 == 0xC0):
-                            temp3 |= 0x01
-                        elif(temp2 == 0x00):
-                            temp3 |= 0x00  
-                        elif(temp2 == 0x80): 
-                            temp3 |= 0x01 
-                        else: #0x40
-                            temp3 |= 0x00 
-                        if(o!=1 or k!=3):
-                            temp3 <<= 1
-                        temp1 <<= 2
-                self.send_data(temp3)
+        # The master (0x24/0x26) and slave (0xA4/0xA6) halves share one column byte.
+        low = epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_LOW)
+        high = epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_HIGH)
+        for command, plane, start in ((0x24, low, 0), (0x26, high, 0), (0xA4, low, Width - 1), (0xA6, high, Width - 1)):
+            self.send_command(command)
+            self.send_data2(b''.join(plane[j * Width1 + start : j * Width1 + start + Width] for j in range(self.height)))
 
-        self.send_command(0xA4)
-        for j in range(self.height):   
-            for i in range(Width):
-                temp3=0
-                for o in range(0, 2):
-                    temp1 = image[(j * Width1 + i + Width - 1)*2+o]
-                    for k in range(0, 4):
-                        temp2 = temp1&0xC0 
-                        if(temp2 == 0xC0):
-                            temp3 |= 0x01
-                        elif(temp2 == 0x00):
-                            temp3 |= 0x00  
-                        elif(temp2 == 0x80): 
-                            temp3 |= 0x00 
-                        else: #0x40
-                            temp3 |= 0x01 
-                        if(o!=1 or k!=3):
-                            temp3 <<= 1
-                        temp1 <<= 2
-                self.send_data(temp3)
-            
-        self.send_command(0xA6)	       
-        for j in range(self.height):   
-            for i in range(Width):
-                temp3=0
-                for o in range(0, 2):
-                    temp1 = image[(j * Width1 + i + Width - 1)*2+o]
-                    for k in range(0, 4):
-                        temp2 = temp1&0xC0 
-                        if(temp2 == 0xC0):
-                            temp3 |= 0x01
-                        elif(temp2 == 0x00):
-                            temp3 |= 0x00  
-                        elif(temp2 == 0x80): 
-                            temp3 |= 0x01 
-                        else: #0x40
-                            temp3 |= 0x00 
-                        if(o!=1 or k!=3):
-                            temp3 <<= 1
-                        temp1 <<= 2
-                self.send_data(temp3)
-        
         self.TurnOnDisplay_4GRAY()
 
     def Clear(self):
@@ -675,10 +381,7 @@ class EPD:
         self.TurnOnDisplay()
 
     def sleep(self):
-        self.send_command(0X10) # deep sleep
-        self.send_data(0x03)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 ### END OF FILE ###
 
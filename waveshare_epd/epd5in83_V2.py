@@ -30,6 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 import PIL
 import time
@@ -47,54 +51,58 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
-class EPD:
+INIT = epdsequence.Sequence("epd5in83_V2.init", [
+    cmd(0x00, 0x1F),
+    cmd(0x04), delay(300), BUSY,
+    cmd(0x50, 0x21, 0x07),
+])
+
+INIT_FAST = epdsequence.Sequence("epd5in83_V2.init_Fast", [
+    cmd(0x00, 0x1F),
+    cmd(0x50, 0x29, 0x07),
+    cmd(0xE0, 0x02),
+    cmd(0xE5, 0x5A),
+    cmd(0x04), delay(100), BUSY,
+])
+
+INIT_PART = epdsequence.Sequence("epd5in83_V2.init_Part", [
+    cmd(0x00, 0x1F),
+    cmd(0xE0, 0x02),
+    cmd(0xE5, 0x6E),
+    cmd(0x04), delay(100), BUSY,
+])
+
+INIT_4GRAY = epdsequence.Sequence("epd5in83_V2.init_4GRAY", [
+    cmd(0x00, 0x1F),
+    cmd(0x06, 0x27, 0x27, 0x18, 0x17),
+    cmd(0x50, 0x21, 0x07),
+    cmd(0xE0, 0x02),
+    cmd(0xE5, 0x5F),
+    cmd(0x04), delay(100), BUSY,
+])
+
+SLEEP = epdsequence.Sequence("epd5in83_V2.sleep", [
+    cmd(0x50, 0XF7),
+    cmd(0x02), BUSY,
+    cmd(0x07, 0XA5),                # DEEP_SLEEP
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST, epdbase.GRAY4))
+    BUSY_IDLE = 1
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST, "part": INIT_PART, "4gray": INIT_4GRAY}
+
     def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
+        super().__init__()
         self.GRAY1  = GRAY1 #white
         self.GRAY2  = GRAY2
         self.GRAY3  = GRAY3 #gray
         self.GRAY4  = GRAY4 #Blackest
         
 
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200) 
-        epdconfig.digital_write(self.reset_pin, 0)         # module reset
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-        
-    # send a lot of data   
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-        
-    def ReadBusy(self):
-        logger.debug("e-Paper busy H")
-        while(epdconfig.digital_read(self.busy_pin) == 0):
-            epdconfig.delay_ms(10)
-        logger.debug("e-Paper busy H release")
-
     def TurnOnDisplay(self):
         self.send_command(0x12)  
         epdconfig.delay_ms(100)
@@ -117,149 +125,19 @@ class EPD:
        
         
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0x00)
-        self.send_data(0x1F)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(300)
-        self.ReadBusy()
-
-        self.send_command(0x50)   
-        self.send_data(0x21)
-        self.send_data(0x07)
+        return self.init_sequence("full")
 
     def init_Fast(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0x00)
-        self.send_data(0x1F)
-
-        self.send_command(0x50)   
-        self.send_data(0x29)
-        self.send_data(0x07)
-
-        self.send_command(0xE0)   
-        self.send_data(0x02)
-        self.send_command(0xE5)   
-        self.send_data(0x5A)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
+        return self.init_sequence("fast")
 
     def init_Part(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0x00)
-        self.send_data(0x1F)
-
-        self.send_command(0xE0)   
-        self.send_data(0x02)
-        self.send_command(0xE5)   
-        self.send_data(0x6E)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
+        return self.init_sequence("part")
 
     def init_4GRAY(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0x00)  
-        self.send_data(0x1F)
-
-        self.send_command(0x06)
-        self.send_data(0x27)
-        self.send_data(0x27)
-        self.send_data(0x18)
-        self.send_data(0x17)
-        
-        self.send_command(0x50)  
-        self.send_data(0x21)
-        self.send_data(0x07)
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x5F)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
+        return self.init_sequence("4gray")
         
-    def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf  
-
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
-        return buf
+        return epdbuffer.pack_4gray(image, self.width, self.height)
 
     def display(self, image):
         self.send_command(0x10)
@@ -292,74 +170,12 @@ class EPD:
         self.send_command(0x92)
 
     def display_4Gray(self, image):
-        width = self.width // 8
-        height = self.height
-        IMAGE_COUNTER = width * height
-
         self.send_command(0x10)
-        for i in range(0, IMAGE_COUNTER):                     #5808*4  46464
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x01
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x00  
-                    elif(temp2 == 0x80): 
-                        temp3 |= 0x00 
-                    else: #0x40
-                        temp3 |= 0x01
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00
-                    else :   #0x40
-                        temp3 |= 0x01	
-                    if(j!=1 or k!=1):				
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-            
-        self.send_command(0x13)	       
-        for i in range(0, IMAGE_COUNTER):                #5808*4  46464
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x01
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x01
-                    else: #0x40
-                        temp3 |= 0x00 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x01 
-                    else:    #0x40
-                        temp3 |= 0x00	
-                    if(j!=1 or k!=1):					
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-        
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_LOW))
+
+        self.send_command(0x13)
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_HIGH))
+
         self.TurnOnDisplay()
 
     def Clear(self):
@@ -371,14 +187,7 @@ class EPD:
         self.TurnOnDisplay()
 
     def sleep(self):
-        self.send_command(0x50) # DEEP_SLEEP
-        self.send_data(0XF7)
-        self.send_command(0x02) # DEEP_SLEEP
-        self.ReadBusy()
-        self.send_command(0x07) # DEEP_SLEEP
-        self.send_data(0XA5)
-
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 
 ### END OF FILE ###
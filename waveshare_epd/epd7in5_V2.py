@@ -30,6 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 800
@@ -42,266 +46,103 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
-class EPD:
+# If the screen appears gray, replace cmd(0x50, 0x10, 0x07) in the sequences
+# with the annotated initialization commands:
+#   cmd(0x50, 0x10, 0x17), cmd(0x52, 0x03)
+INIT = epdsequence.Sequence("epd7in5_V2.init", [
+    cmd(0x06, 0x17, 0x17, 0x28, 0x17),  # btst; if an exception is displayed, try using 0x38 for the third byte
+    cmd(0x01, 0x07, 0x07, 0x28, 0x17),  # POWER SETTING: VGH=20V,VGL=-20V, VDH=15V, VDL=-15V
+    cmd(0x04), delay(100), BUSY,        # POWER ON
+    cmd(0x00, 0x1F),                    # PANNEL SETTING: KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
+    cmd(0x61, 0x03, 0x20, 0x01, 0xE0),  # tres: source 800, gate 480
+    cmd(0x15, 0x00),
+    cmd(0x50, 0x10, 0x07),
+    cmd(0x60, 0x22),                    # TCON SETTING
+])
+
+INIT_FAST = epdsequence.Sequence("epd7in5_V2.init_fast", [
+    cmd(0x00, 0x1F),                    # PANNEL SETTING
+    cmd(0x50, 0x10, 0x07),
+    cmd(0x04), delay(100), BUSY,        # POWER ON, wait for the electronic paper IC to release the idle signal
+    cmd(0x06, 0x27, 0x27, 0x18, 0x17),  # Booster Soft Start (enhanced display drive)
+    cmd(0xE0, 0x02),
+    cmd(0xE5, 0x5A),
+])
+
+INIT_PART = epdsequence.Sequence("epd7in5_V2.init_part", [
+    cmd(0x00, 0x1F),                    # PANNEL SETTING
+    cmd(0x04), delay(100), BUSY,        # POWER ON
+    cmd(0xE0, 0x02),
+    cmd(0xE5, 0x6E),
+])
+
+INIT_4GRAY = epdsequence.Sequence("epd7in5_V2.init_4Gray", [
+    cmd(0x00, 0x1F),                    # PANNEL SETTING
+    cmd(0x50, 0x10, 0x07),
+    cmd(0x04), delay(100), BUSY,        # POWER ON
+    cmd(0x06, 0x27, 0x27, 0x18, 0x17),  # Booster Soft Start (enhanced display drive)
+    cmd(0xE0, 0x02),
+    cmd(0xE5, 0x5F),
+])
+
+# Between refreshes of a session: charge pump off, registers and RAM kept
+POWER_OFF = epdsequence.Sequence("epd7in5_V2.power_off", [
+    cmd(0x02), BUSY,                    # POWER_OFF
+])
+
+POWER_ON = epdsequence.Sequence("epd7in5_V2.power_on", [
+    cmd(0x04), delay(100), BUSY,        # POWER ON
+])
+
+SLEEP = epdsequence.Sequence("epd7in5_V2.sleep", [
+    cmd(0x50, 0xF7),
+    cmd(0x02), BUSY,                    # POWER_OFF
+    cmd(0x07, 0xA5),                    # DEEP_SLEEP
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST, epdbase.GRAY4, epdbase.WINDOW))
+    RESET_MS = (20, 2, 20)
+    BUSY_IDLE = 1
+    BUSY_COMMAND = 0x71
+    BUSY_SETTLE_MS = 20
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST, "part": INIT_PART, "4gray": INIT_4GRAY}
+
     def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
+        super().__init__()
         self.GRAY1  = GRAY1 #white
         self.GRAY2  = GRAY2
         self.GRAY3  = GRAY3 #gray
         self.GRAY4  = GRAY4 #Blackest
     
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        self.send_command(0x71)
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 0):
-            self.send_command(0x71)
-            busy = epdconfig.digital_read(self.busy_pin)
-        epdconfig.delay_ms(20)
-        logger.debug("e-Paper busy release")
-        
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        
-        self.send_command(0x06)     # btst
-        self.send_data(0x17)
-        self.send_data(0x17)
-        self.send_data(0x28)        # If an exception is displayed, try using 0x38
-        self.send_data(0x17)
-        
-        self.send_command(0x01)			#POWER SETTING
-        self.send_data(0x07)
-        self.send_data(0x07)    #VGH=20V,VGL=-20V
-        self.send_data(0x28)		#VDH=15V
-        self.send_data(0x17)		#VDL=-15V
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0X00)			#PANNEL SETTING
-        self.send_data(0x1F)   #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
-
-        self.send_command(0x61)        	#tres
-        self.send_data(0x03)		#source 800
-        self.send_data(0x20)
-        self.send_data(0x01)		#gate 480
-        self.send_data(0xE0)
-
-        self.send_command(0X15)
-        self.send_data(0x00)
-
-        # If the screen appears gray, use the annotated initialization command
-        self.send_command(0X50)
-        self.send_data(0x10)
-        self.send_data(0x07)
-        # self.send_command(0X50)
-        # self.send_data(0x10)
-        # self.send_data(0x17)
-        # self.send_command(0X52)		
-        # self.send_data(0x03)
-
-        self.send_command(0X60)			#TCON SETTING
-        self.send_data(0x22)
-
-        # EPD hardware init end
-        return 0
+        return self.init_sequence("full")
     
     def init_fast(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        
-        self.send_command(0X00)			#PANNEL SETTING
-        self.send_data(0x1F)   #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
-
-        # If the screen appears gray, use the annotated initialization command
-        self.send_command(0X50)
-        self.send_data(0x10)
-        self.send_data(0x07)
-        # self.send_command(0X50)
-        # self.send_data(0x10)
-        # self.send_data(0x17)
-        # self.send_command(0X52)		
-        # self.send_data(0x03)
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100) 
-        self.ReadBusy()        #waiting for the electronic paper IC to release the idle signal
-
-        #Enhanced display drive(Add 0x06 command)
-        self.send_command(0x06)			#Booster Soft Start 
-        self.send_data (0x27)
-        self.send_data (0x27)   
-        self.send_data (0x18)		
-        self.send_data (0x17)		
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x5A)
-
-        # EPD hardware init end
-        return 0
+        return self.init_sequence("fast")
     
     def init_part(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0X00)			#PANNEL SETTING
-        self.send_data(0x1F)   #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100) 
-        self.ReadBusy()        #waiting for the electronic paper IC to release the idle signal
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x6E)
-
-        # EPD hardware init end
-        return 0
+        return self.init_sequence("part")
     
     # The feature will only be available on screens sold after 24/10/23
     def init_4Gray(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0X00)			#PANNEL SETTING
-        self.send_data(0x1F)   #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
-        
-        self.send_command(0X50)
-        self.send_data(0x10)
-        self.send_data(0x07)
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100) 
-        self.ReadBusy()        #waiting for the electronic paper IC to release the idle signal
-
-        #Enhanced display drive(Add 0x06 command)
-        self.send_command(0x06)			#Booster Soft Start 
-        self.send_data (0x27)
-        self.send_data (0x27)   
-        self.send_data (0x18)		
-        self.send_data (0x17)	
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x5F)
-
-        # EPD hardware init end
-        return 0
+        return self.init_sequence("4gray")
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
-            # return a blank buffer
-            return [0x00] * (int(self.width/8) * self.height)
-
-        buf = bytearray(img.tobytes('raw'))
         # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
         # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        return epdbuffer.pack_1bpp(image, self.width, self.height)
     
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
-        return buf
+        return epdbuffer.pack_4gray(image, self.width, self.height)
 
+    # image: getbuffer output, any bytes-like object (or list of byte values)
     def display(self, image):
-        if(self.width % 8 == 0):
-            Width = self.width // 8
-        else:
-            Width = self.width // 8 +1
-        Height = self.height
-        image1 = [0xFF] * int(self.width * self.height / 8)
-        for j in range(Height):
-                for i in range(Width):
-                    image1[i + j * Width] = ~image[i + j * Width]
         self.send_command(0x10)
-        self.send_data2(image1)
+        self.send_data2(epdbuffer.invert(image))
 
         self.send_command(0x13)
         self.send_data2(image)
@@ -312,54 +153,69 @@ class EPD:
 
     def Clear(self):
         self.send_command(0x10)
-        self.send_data2([0xFF] * int(self.width * self.height / 8))
+        self.send_data2(b'\xff' * int(self.width * self.height / 8))
         self.send_command(0x13)
-        self.send_data2([0x00] * int(self.width * self.height / 8))
+        self.send_data2(bytes(int(self.width * self.height / 8)))
 
         self.send_command(0x12)
         epdconfig.delay_ms(100)
         self.ReadBusy()
 
+    # The controller addresses x in whole bytes: round the window out to 8 pixels
+    # and clip it to the panel.
+    def align_window(self, Xstart, Ystart, Xend, Yend):
+        Xstart = max(0, Xstart) // 8 * 8
+        Xend = min(self.width, (Xend + 7) // 8 * 8)
+        Ystart = max(0, Ystart)
+        Yend = min(self.height, Yend)
+        return Xstart, Ystart, Xend, Yend
+
+    def set_partial_window(self, Xstart, Ystart, Xend, Yend):
+        epdsequence.run(self, "epd7in5_V2.partial_window", [
+            cmd(0x50, 0xA9, 0x07),
+            cmd(0x91),              # This command makes the display enter partial mode
+            cmd(0x90,               # resolution setting
+                Xstart // 256, Xstart % 256, (Xend - 1) // 256, (Xend - 1) % 256,
+                Ystart // 256, Ystart % 256, (Yend - 1) // 256, (Yend - 1) % 256,
+                0x01),
+        ])
+
+    # Image holds only the window: Width * Height bytes for the aligned window
     def display_Partial(self, Image, Xstart, Ystart, Xend, Yend):
-        if((Xstart % 8 + Xend % 8 == 8 & Xstart % 8 > Xend % 8) | Xstart % 8 + Xend % 8 == 0 | (Xend - Xstart)%8 == 0):
-            Xstart = Xstart // 8 * 8
-            Xend = Xend // 8 * 8
-        else:
-            Xstart = Xstart // 8 * 8
-            if Xend % 8 == 0:
-                Xend = Xend // 8 * 8
-            else:
-                Xend = Xend // 8 * 8 + 1
-                
+        Xstart, Ystart, Xend, Yend = self.align_window(Xstart, Ystart, Xend, Yend)
         Width = (Xend - Xstart) // 8
         Height = Yend - Ystart
-	
-        self.send_command(0x50)
-        self.send_data(0xA9)
-        self.send_data(0x07)
 
-        self.send_command(0x91)		#This command makes the display enter partial mode
-        self.send_command(0x90)		#resolution setting
-        self.send_data (Xstart//256)
-        self.send_data (Xstart%256)   #x-start    
+        self.set_partial_window(Xstart, Ystart, Xend, Yend)
 
-        self.send_data ((Xend-1)//256)		
-        self.send_data ((Xend-1)%256)  #x-end	
+        self.send_command(0x13)   #Write Black and White image to RAM
+        self.send_data2(epdbuffer.invert(Image[:Width * Height]))
 
-        self.send_data (Ystart//256)  #
-        self.send_data (Ystart%256)   #y-start    
+        self.send_command(0x12)
+        epdconfig.delay_ms(100)
+        self.ReadBusy()
 
-        self.send_data ((Yend-1)//256)		
-        self.send_data ((Yend-1)%256)  #y-end
-        self.send_data (0x01)
+    # Partial refresh of a rectangle of a full frame (getbuffer output).
+    # Only the rows and bytes inside the aligned window are sent.
+    def display_Partial_Window(self, image, Xstart, Ystart, Xend, Yend):
+        Xstart, Ystart, Xend, Yend = self.align_window(Xstart, Ystart, Xend, Yend)
+        if Xstart >= Xend or Ystart >= Yend:
+            return
+
+        linewidth = (self.width + 7) // 8
+        left, right = Xstart // 8, Xend // 8
+        if isinstance(image, list):
+            image = bytes(image)
+        frame = memoryview(image)
+        if left == 0 and right == linewidth:
+            window = frame[Ystart * linewidth : Yend * linewidth]
+        else:
+            window = b''.join(frame[y * linewidth + left : y * linewidth + right] for y in range(Ystart, Yend))
 
-        image1 = [0xFF] * int(self.width * self.height / 8)
-        for j in range(Height):
-                for i in range(Width):
-                    image1[i + j * Width] = ~Image[i + j * Width]
+        self.set_partial_window(Xstart, Ystart, Xend, Yend)
 
         self.send_command(0x13)   #Write Black and White image to RAM
-        self.send_data2(image1)
+        self.send_data2(epdbuffer.invert(window))
 
         self.send_command(0x12)
         epdconfig.delay_ms(100)
@@ -367,83 +223,22 @@ class EPD:
 
     def display_4Gray(self, image):
         self.send_command(0x10)
-        for i in range(0, 48000):     
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01  
-                    elif(temp2 == 0x80): 
-                        temp3 |= 0x01 
-                    else: #0x40
-                        temp3 |= 0x00 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x01
-                    else :   #0x40
-                        temp3 |= 0x00	
-                    if(j!=1 or k!=1):				
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-            
-        self.send_command(0x13)	       
-        for i in range(0, 48000):       
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0):
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00
-                    else: #0x40
-                        temp3 |= 0x01 
-                    temp3 <<= 1	
-                    
-                    temp1 <<= 2
-                    temp2 = temp1&0xC0 
-                    if(temp2 == 0xC0): 
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00): 
-                        temp3 |= 0x01
-                    elif(temp2 == 0x80):
-                        temp3 |= 0x00 
-                    else:    #0x40
-                            temp3 |= 0x01	
-                    if(j!=1 or k!=1):					
-                        temp3 <<= 1
-                    temp1 <<= 2
-            self.send_data(temp3)
-        
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_LOW))
+
+        self.send_command(0x13)
+        self.send_data2(epdbuffer.gray_plane(image, epdbuffer.GRAY_PLANE_NOT_HIGH))
+
         self.send_command(0x12)
         epdconfig.delay_ms(100)
         self.ReadBusy()
 
+    def power_on(self):
+        POWER_ON.run(self)
+
+    def power_off(self):
+        POWER_OFF.run(self)
+
     def sleep(self):
-        self.send_command(0x50)
-        self.send_data(0XF7)
-        
-        self.send_command(0x02) # POWER_OFF
-        self.ReadBusy()
-        
-        self.send_command(0x07) # DEEP_SLEEP
-        self.send_data(0XA5)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 ### END OF FILE ###
@@ -30,6 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 800
@@ -37,71 +41,62 @@ EPD_HEIGHT      = 480
 
 logger = logging.getLogger(__name__)
 
-class EPD:
-    def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
-    
-    Voltage_Frame_7IN5_V2 = [
+Voltage_Frame_7IN5_V2 = [
 	0x6, 0x3F, 0x3F, 0x11, 0x24, 0x7, 0x17,
-    ]
-
-    LUT_VCOM_7IN5_V2 = [	
-        0x0,	0xF,	0xF,	0x0,	0x0,	0x1,	
-        0x0,	0xF,	0x1,	0xF,	0x1,	0x2,	
-        0x0,	0xF,	0xF,	0x0,	0x0,	0x1,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-    ]	
-
-    LUT_WW_7IN5_V2 = [
-        0x10,	0xF,	0xF,	0x0,	0x0,	0x1,	
-        0x84,	0xF,	0x1,	0xF,	0x1,	0x2,	
-        0x20,	0xF,	0xF,	0x0,	0x0,	0x1,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-    ]
-
-    LUT_BW_7IN5_V2 = [	
-        0x10,	0xF,	0xF,	0x0,	0x0,	0x1,	
-        0x84,	0xF,	0x1,	0xF,	0x1,	0x2,	
-        0x20,	0xF,	0xF,	0x0,	0x0,	0x1,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-    ]
-
-    LUT_WB_7IN5_V2 = [
-        0x80,	0xF,	0xF,	0x0,	0x0,	0x1,	
-        0x84,	0xF,	0x1,	0xF,	0x1,	0x2,	
-        0x40,	0xF,	0xF,	0x0,	0x0,	0x1,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-    ]
-
-    LUT_BB_7IN5_V2 = [
-        0x80,	0xF,	0xF,	0x0,	0x0,	0x1,	
-        0x84,	0xF,	0x1,	0xF,	0x1,	0x2,	
-        0x40,	0xF,	0xF,	0x0,	0x0,	0x1,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-        0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
-    ]
-
-    Lut_all_fresh=[0x67,	0xBF,	0x3F,	0x0D,	0x00,	0x1C,
-    #VCOM					
+]
+
+LUT_VCOM_7IN5_V2 = [	
+    0x0,	0xF,	0xF,	0x0,	0x0,	0x1,	
+    0x0,	0xF,	0x1,	0xF,	0x1,	0x2,	
+    0x0,	0xF,	0xF,	0x0,	0x0,	0x1,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+]
+
+LUT_WW_7IN5_V2 = [
+    0x10,	0xF,	0xF,	0x0,	0x0,	0x1,	
+    0x84,	0xF,	0x1,	0xF,	0x1,	0x2,	
+    0x20,	0xF,	0xF,	0x0,	0x0,	0x1,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+]
+
+LUT_BW_7IN5_V2 = [	
+    0x10,	0xF,	0xF,	0x0,	0x0,	0x1,	
+    0x84,	0xF,	0x1,	0xF,	0x1,	0x2,	
+    0x20,	0xF,	0xF,	0x0,	0x0,	0x1,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+]
+
+LUT_WB_7IN5_V2 = [
+    0x80,	0xF,	0xF,	0x0,	0x0,	0x1,	
+    0x84,	0xF,	0x1,	0xF,	0x1,	0x2,	
+    0x40,	0xF,	0xF,	0x0,	0x0,	0x1,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+]
+
+LUT_BB_7IN5_V2 = [
+    0x80,	0xF,	0xF,	0x0,	0x0,	0x1,	
+    0x84,	0xF,	0x1,	0xF,	0x1,	0x2,	
+    0x40,	0xF,	0xF,	0x0,	0x0,	0x1,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+    0x0,	0x0,	0x0,	0x0,	0x0,	0x0,	
+]
+
+Lut_all_fresh=[0x67,	0xBF,	0x3F,	0x0D,	0x00,	0x1C,
+    #VCOM
     0x00,	0x32,	0x32,	0x00,	0x00,	0x01,
     0x00,	0x0A,	0x0A,	0x00,	0x00,	0x00,
     0x00,	0x28,	0x00,	0x00,	0x00,	0x00,
@@ -109,7 +104,7 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
-    #WW					
+    #WW
     0x60,	0x32,	0x32,	0x00,	0x00,	0x01,
     0x60,	0x0A,	0x0A,	0x00,	0x00,	0x00,
     0x80,	0x28,	0x00,	0x00,	0x00,	0x00,
@@ -117,7 +112,7 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
-    #BW					
+    #BW
     0x60,	0x32,	0x32,	0x00,	0x00,	0x01,
     0x60,	0x0A,	0x0A,	0x00,	0x00,	0x00,
     0x80,	0x28,	0x00,	0x00,	0x00,	0x00,
@@ -125,7 +120,7 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
-    #WB					
+    #WB
     0x90,	0x32,	0x32,	0x00,	0x00,	0x01,
     0x60,	0x0A,	0x0A,	0x00,	0x00,	0x00,
     0x40,	0x28,	0x00,	0x00,	0x00,	0x00,
@@ -133,7 +128,7 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
-    #BB					
+    #BB
     0x90,	0x32,	0x32,	0x00,	0x00,	0x01,
     0x60,	0x0A,	0x0A,	0x00,	0x00,	0x00,
     0x40,	0x28,	0x00,	0x00,	0x00,	0x00,
@@ -141,17 +136,17 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
-    #Reserved					
+    #Reserved
     0xFF,	0xFF,	0xFF,	0xFF,	0xFF,	0xFF,
     0xFF,	0xFF,	0xFF,	0xFF,	0xFF,	0xFF,
     0xFF,	0xFF,	0xFF,	0xFF,	0xFF,	0xFF,
     0xFF,	0xFF,	0xFF,	0xFF,	0xFF,	0xFF,
     0xFF,	0xFF,	0xFF,	0xFF,	0xFF,	0xFF,
     0xFF,					
-    ]				
-					
-    Lut_partial=[0x67,	0xBF,	0x3F,	0x0D,	0x00,	0x1C,
-    #VCOM					
+]
+
+Lut_partial=[0x67,	0xBF,	0x3F,	0x0D,	0x00,	0x1C,
+    #VCOM
     0x00,	0x14,	0x02,	0x00,	0x00,	0x01,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
@@ -159,7 +154,7 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
-    #WW					
+    #WW
     0x20,	0x14,	0x02,	0x00,	0x00,	0x01,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
@@ -167,7 +162,7 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
-    #BW					
+    #BW
     0x80,	0x14,	0x02,	0x00,	0x00,	0x01,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
@@ -175,7 +170,7 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
-    #WB					
+    #WB
     0x40,	0x14,	0x02,	0x00,	0x00,	0x01,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
@@ -183,7 +178,7 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
-    #BB					
+    #BB
     0x00,	0x14,	0x02,	0x00,	0x00,	0x01,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
@@ -191,258 +186,134 @@ class EPD:
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
     0x00,	0x00,	0x00,	0x00,	0x00,	0x00,
-    #Reserved					
+    #Reserved
     0xFF,	0xFF,	0xFF,	0xFF,	0xFF,	0xFF,
     0xFF,	0xFF,	0xFF,	0xFF,	0xFF,	0xFF,
     0xFF,	0xFF,	0xFF,	0xFF,	0xFF,	0xFF,
     0xFF,	0xFF,	0xFF,	0xFF,	0xFF,	0xFF,
     0xFF,	0xFF,	0xFF,	0xFF,	0xFF,	0xFF,
     0xFF,					
+]
+
+def _set_lut_steps(lut_vcom, lut_ww, lut_bw, lut_wb, lut_bb):
+    return [
+        cmd(0x20, *lut_vcom[:42]),
+        cmd(0x21, *lut_ww[:42]),
+        cmd(0x22, *lut_bw[:42]),
+        cmd(0x23, *lut_wb[:42]),
+        cmd(0x24, *lut_bb[:42]),
     ]
 
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        self.send_command(0x71)
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 0):
-            self.send_command(0x71)
-            busy = epdconfig.digital_read(self.busy_pin)
-        epdconfig.delay_ms(20)
-        logger.debug("e-Paper busy release")
-        
-    def SetLut(self, lut_vcom, lut_ww, lut_bw, lut_wb, lut_bb):
-        self.send_command(0x20)
-        for count in range(0, 42):
-            self.send_data(lut_vcom[count])
-
-        self.send_command(0x21)
-        for count in range(0, 42):
-            self.send_data(lut_ww[count])
-
-        self.send_command(0x22)
-        for count in range(0, 42):
-            self.send_data(lut_bw[count])
+# Unused power settings of the original initialization:
+#   cmd(0x06, 0x17, 0x17, 0x28, 0x17)   btst; if an exception is displayed, try using 0x38 for the third byte
+#   cmd(0x01, 0x07, 0x07, 0x3f, 0x3f)   POWER SETTING: VGH=20V,VGL=-20V, VDH=15V, VDL=-15V
+INIT = epdsequence.Sequence("epd7in5_V2_old.init", [
+    cmd(0x01, 0x17,                     # power setting: 1-0=11: internal power
+        Voltage_Frame_7IN5_V2[6],       # VGH&VGL
+        Voltage_Frame_7IN5_V2[1],       # VSH
+        Voltage_Frame_7IN5_V2[2],       # VSL
+        Voltage_Frame_7IN5_V2[3]),      # VSHR
+    cmd(0x82, Voltage_Frame_7IN5_V2[4]),    # VCOM DC Setting
+    cmd(0x06, 0x27, 0x27, 0x2F, 0x17),  # Booster Setting
+    cmd(0x30, Voltage_Frame_7IN5_V2[0]),    # OSC Setting: 3C=50Hz, 3A=100HZ
+    cmd(0x04), delay(100), BUSY,        # POWER ON
+    cmd(0x00, 0x3F),                    # PANNEL SETTING: KW-3f KWR-2F BWROTP-0f BWOTP-1f
+    cmd(0x61, 0x03, 0x20, 0x01, 0xE0),  # tres: source 800, gate 480
+    cmd(0x15, 0x00),
+    cmd(0x50, 0x10, 0x07),              # VCOM AND DATA INTERVAL SETTING
+    cmd(0x60, 0x22),                    # TCON SETTING
+    cmd(0x65, 0x00, 0x00, 0x00, 0x00),  # Resolution setting: 800*480
+    *_set_lut_steps(LUT_VCOM_7IN5_V2, LUT_WW_7IN5_V2, LUT_BW_7IN5_V2, LUT_WB_7IN5_V2, LUT_BB_7IN5_V2),
+])
+
+_INIT2_STEPS = [
+    cmd(0x00, 0x3F),                    # Panel setting
+    cmd(0x06, 0x17, 0x17, 0x28, 0x18),  # Booster Setting
+    cmd(0x50, 0x22, 0x07),              # VCOM and DATA interval setting
+    cmd(0x60, 0x22),                    # TCON setting: S-G G-S
+    cmd(0x61, 0x03, 0x20, 0x01, 0xE0),  # Resolution setting: 800*480
+    cmd(0x65, 0x00, 0x00, 0x00, 0x00),  # Resolution setting
+    cmd(0x04), delay(100), BUSY,        # POWER ON
+]
+
+INIT2 = epdsequence.Sequence("epd7in5_V2_old.init2", _INIT2_STEPS)
+
+def _lut_by_mcu_steps(wavedata):
+    VCEND = wavedata[0] & 0x08
+    BDEND = (wavedata[1] & 0xC0) >> 6
+    EVS = VCEND | BDEND
+    PLL = (wavedata[0] & 0xF0) >> 4
+    XON = wavedata[2] & 0xC0
+    return [
+        cmd(0x52, EVS),                 # EVS
+        cmd(0x30, PLL),                 # PLL setting
+        cmd(0x01, 0x17,                 # Set VGH VGL VSH VSL VSHR
+            wavedata[0] & 0x07,         # VGH/VGL Voltage Level selection
+            wavedata[1] & 0x3F,         # VSH for black
+            wavedata[2] & 0x3F,         # VSL for white
+            wavedata[3] & 0x3F),        # VSHR for red
+        cmd(0x2A, XON, wavedata[4]),    # LUTOPT
+        cmd(0x82, wavedata[5]),         # VCOM_DC setting: Vcom value
+        cmd(0x20, *wavedata[6:48]),
+        cmd(0x21, *wavedata[48:90]),
+        cmd(0x22, *wavedata[90:132]),
+        cmd(0x23, *wavedata[132:174]),
+        cmd(0x24, *wavedata[174:216]),
+    ]
 
-        self.send_command(0x23)
-        for count in range(0, 42):
-            self.send_data(lut_wb[count])
+INIT_FAST = epdsequence.Sequence("epd7in5_V2_old.init_fast", _INIT2_STEPS + _lut_by_mcu_steps(Lut_all_fresh))
+INIT_PART = epdsequence.Sequence("epd7in5_V2_old.init_part", _INIT2_STEPS + _lut_by_mcu_steps(Lut_partial))
+
+SLEEP = epdsequence.Sequence("epd7in5_V2_old.sleep", [
+    cmd(0x02), BUSY,                    # POWER_OFF
+    cmd(0x07, 0xA5),                    # DEEP_SLEEP
+    delay(2000),
+])
+
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST))
+    RESET_MS = (20, 2, 20)
+    BUSY_IDLE = 1
+    BUSY_COMMAND = 0x71
+    BUSY_SETTLE_MS = 20
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST, "part": INIT_PART}
+
+    Voltage_Frame_7IN5_V2 = Voltage_Frame_7IN5_V2
+    LUT_VCOM_7IN5_V2 = LUT_VCOM_7IN5_V2
+    LUT_WW_7IN5_V2 = LUT_WW_7IN5_V2
+    LUT_BW_7IN5_V2 = LUT_BW_7IN5_V2
+    LUT_WB_7IN5_V2 = LUT_WB_7IN5_V2
+    LUT_BB_7IN5_V2 = LUT_BB_7IN5_V2
+    Lut_all_fresh = Lut_all_fresh
+    Lut_partial = Lut_partial
 
-        self.send_command(0x24)
-        for count in range(0, 42):
-            self.send_data(lut_bb[count])
+    def SetLut(self, lut_vcom, lut_ww, lut_bw, lut_wb, lut_bb):
+        epdsequence.run(self, "epd7in5_V2_old.SetLut", _set_lut_steps(lut_vcom, lut_ww, lut_bw, lut_wb, lut_bb))
 
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-        
-        # self.send_command(0x06)     # btst
-        # self.send_data(0x17)
-        # self.send_data(0x17)
-        # self.send_data(0x28)        # If an exception is displayed, try using 0x38
-        # self.send_data(0x17)
-        
-        # self.send_command(0x01)   #POWER SETTING
-        # self.send_data(0x07)
-        # self.send_data(0x07)      #VGH=20V,VGL=-20V
-        # self.send_data(0x3f)		#VDH=15V
-        # self.send_data(0x3f)		#VDL=-15V
-
-        self.send_command(0x01)     # power setting
-        self.send_data(0x17)        # 1-0=11: internal power
-        self.send_data(self.Voltage_Frame_7IN5_V2[6])   # VGH&VGL
-        self.send_data(self.Voltage_Frame_7IN5_V2[1])   # VSH
-        self.send_data(self.Voltage_Frame_7IN5_V2[2])   # VSL
-        self.send_data(self.Voltage_Frame_7IN5_V2[3])   # VSHR
-        
-        self.send_command(0x82)     # VCOM DC Setting
-        self.send_data(self.Voltage_Frame_7IN5_V2[4])   # VCOM
-
-        self.send_command(0x06)     # Booster Setting
-        self.send_data(0x27)
-        self.send_data(0x27)
-        self.send_data(0x2F)
-        self.send_data(0x17)
-        
-        self.send_command(0x30)     # OSC Setting
-        self.send_data(self.Voltage_Frame_7IN5_V2[0])   # 3C=50Hz, 3A=100HZ
-
-        self.send_command(0x04)     # POWER ON
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0X00)     # PANNEL SETTING
-        self.send_data(0x3F)        # KW-3f KWR-2F BWROTP-0f BWOTP-1f
-
-        self.send_command(0x61)     # tres
-        self.send_data(0x03)        # source 800
-        self.send_data(0x20)
-        self.send_data(0x01)        # gate 480
-        self.send_data(0xE0)
-
-        self.send_command(0X15)
-        self.send_data(0x00)
-
-        self.send_command(0X50)     # VCOM AND DATA INTERVAL SETTING
-        self.send_data(0x10)
-        self.send_data(0x07)
-
-        self.send_command(0X60)     # TCON SETTING
-        self.send_data(0x22)
-
-        self.send_command(0x65)     # Resolution setting
-        self.send_data(0x00)
-        self.send_data(0x00)        # 800*480
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.SetLut(self.LUT_VCOM_7IN5_V2, self.LUT_WW_7IN5_V2, self.LUT_BW_7IN5_V2, self.LUT_WB_7IN5_V2, self.LUT_BB_7IN5_V2)
-        # EPD hardware init end
-        return 0
+        return self.init_sequence("full")
     
     def Epaper_LUT_By_MCU(self,wavedata):
-
-        VCEND=wavedata[0]&0x08
-        BDEND=(wavedata[1]&0xC0)>>6
-        EVS=VCEND|BDEND
-        PLL=(wavedata[0]&0xF0)>>4
-        XON=wavedata[2]&0xC0
-
-        self.send_command(0x52)	      #EVS
-        self.send_data(EVS)
-
-        self.send_command(0x30)			  #PLL setting 
-        self.send_data(PLL)
-
-        self.send_command(0x01)       #Set VGH VGL VSH VSL VSHR
-        self.send_data (0x17)
-        self.send_data (wavedata[0]&0x07)  	#VGH/VGL Voltage Level selection
-        self.send_data (wavedata[1]&0x3F)		#VSH for black
-        self.send_data (wavedata[2]&0x3F)  	#VSL for white
-        self.send_data (wavedata[3]&0x3F)  	#VSHR for red
-
-        self.send_command(0x2A)	      #LUTOPT
-        self.send_data(XON)
-        self.send_data(wavedata[4])
-
-        self.send_command(0x82)       #VCOM_DC setting
-        self.send_data (wavedata[5])  #Vcom value
-
-
-        self.send_command(0x20)
-        self.send_data2(wavedata[6:48])
-
-        self.send_command(0x21)	
-        self.send_data2(wavedata[48:90])
-
-        self.send_command(0x22)	
-        self.send_data2(wavedata[90:132])
-
-        self.send_command(0x23)	
-        self.send_data2(wavedata[132:174])
-
-        self.send_command(0x24)	
-        self.send_data2(wavedata[174:216])
+        epdsequence.run(self, "epd7in5_V2_old.Epaper_LUT_By_MCU", _lut_by_mcu_steps(wavedata))
 
     def init2(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0x00)  # Panel setting   
-        self.send_data(0x3F)
-
-        self.send_command(0x06)  # Booster Setting
-        self.send_data(0x17)  
-        self.send_data(0x17)
-        self.send_data(0x28)
-        self.send_data(0x18)
-
-        self.send_command(0x50)  # VCOM and DATA interval setting    
-        self.send_data(0x22)
-        self.send_data(0x07)
-
-        self.send_command(0x60)  # TCON setting
-        self.send_data(0x22)  # S-G G-S
-
-        self.send_command(0x61)  # Resolution setting
-        self.send_data(0x03)#800*480
-        self.send_data(0x20)
-        self.send_data(0x01)
-        self.send_data(0xE0) 
-
-        self.send_command(0x65)  # Resolution setting
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100)
-        self.ReadBusy() 
-
-        return 0
+        return self.init_sequence(INIT2)
 
     def init_fast(self):
-        self.init2()
-        self.Epaper_LUT_By_MCU(self.Lut_all_fresh)
-        return 0
+        return self.init_sequence("fast")
     
 
     def init_part(self):
-        self.init2()
-        self.Epaper_LUT_By_MCU(self.Lut_partial)
-        return 0
+        return self.init_sequence("part")
     
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
-            # return a blank buffer
-            return [0x00] * (int(self.width/8) * self.height)
-
-        buf = bytearray(img.tobytes('raw'))
         # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
         # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        return epdbuffer.pack_1bpp(image, self.width, self.height)
 
     def display(self, image):
         if(self.width % 8 == 0):
@@ -519,12 +390,6 @@ class EPD:
         self.ReadBusy()
 
     def sleep(self):
-        self.send_command(0x02) # POWER_OFF
-        self.ReadBusy()
-        
-        self.send_command(0x07) # DEEP_SLEEP
-        self.send_data(0XA5)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 ### END OF FILE ###
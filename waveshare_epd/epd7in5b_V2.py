@@ -30,6 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbase
+from . import epdbuffer
+from . import epdsequence
+from .epdsequence import BUSY, cmd, delay
 
 # Display resolution
 EPD_WIDTH       = 800
@@ -37,179 +41,73 @@ EPD_HEIGHT      = 480
 
 logger = logging.getLogger(__name__)
 
-class EPD:
+INIT = epdsequence.Sequence("epd7in5b_V2.init", [
+    cmd(0x01, 0x07, 0x07, 0x3f, 0x3f),
+    cmd(0x06, 0x17, 0x17, 0x28, 0x17),
+    cmd(0x04), delay(100), BUSY,
+    cmd(0x00, 0x0F),
+    cmd(0x61, 0x03, 0x20, 0x01, 0xE0),
+    cmd(0x15, 0x00),
+    cmd(0x50, 0x11, 0x07),
+    cmd(0x60, 0x22),
+])
+
+INIT_FAST = epdsequence.Sequence("epd7in5b_V2.init_Fast", [
+    cmd(0x00, 0x0F),
+    cmd(0x04), delay(100), BUSY,
+    cmd(0x06, 0x27, 0x27, 0x18, 0x17),
+    cmd(0xE0, 0x02),
+    cmd(0xE5, 0x5A),
+    cmd(0x50, 0x11, 0x07),
+])
+
+INIT_PART = epdsequence.Sequence("epd7in5b_V2.init_part", [
+    cmd(0x00, 0x1F),
+    cmd(0x04), delay(100), BUSY,
+    cmd(0xE0, 0x02),
+    cmd(0xE5, 0x6E),
+    cmd(0x50, 0xA9, 0x07),
+])
+
+SLEEP = epdsequence.Sequence("epd7in5b_V2.sleep", [
+    cmd(0x02), BUSY,                    # POWER_OFF
+    cmd(0x07, 0xA5),                    # DEEP_SLEEP
+    delay(2000),
+])
+
+class EPD(epdbase.EPDBase):
+    WIDTH = EPD_WIDTH
+    HEIGHT = EPD_HEIGHT
+    FORMAT = epdbase.FORMAT_DUAL_PLANE
+    CAPS = frozenset((epdbase.PARTIAL, epdbase.FAST))
+    RESET_MS = (200, 4, 200)
+    BUSY_IDLE = 1
+    BUSY_COMMAND = 0x71
+    BUSY_SETTLE_MS = 200
+    SEQUENCES = {"full": INIT, "fast": INIT_FAST, "part": INIT_PART}
+
     def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
-        self.width = EPD_WIDTH
-        self.height = EPD_HEIGHT
+        super().__init__()
         self.partFlag=1
 
-    # Hardware reset
-    def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(4)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(200)   
-
-    def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
-    
-    def send_data2(self, data): #faster
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
-
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
-        self.send_command(0x71)
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 0):
-            self.send_command(0x71)
-            busy = epdconfig.digital_read(self.busy_pin)
-        epdconfig.delay_ms(200)
-        logger.debug("e-Paper busy release")
-        
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0x01)
-        self.send_data(0x07)
-        self.send_data(0x07)
-        self.send_data(0x3f)
-        self.send_data(0x3f)
-
-        self.send_command(0x06)
-        self.send_data(0x17)
-        self.send_data(0x17) 
-        self.send_data(0x28)	
-        self.send_data(0x17)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0X00)
-        self.send_data(0x0F)
-
-        self.send_command(0x61)		
-        self.send_data(0x03)
-        self.send_data(0x20)
-        self.send_data(0x01)
-        self.send_data(0xE0)
-
-        self.send_command(0X15)
-        self.send_data(0x00)
-
-        self.send_command(0X50)
-        self.send_data(0x11)
-        self.send_data(0x07)
-
-        self.send_command(0X60)
-        self.send_data(0x22)
-            
-        return 0
+        return self.init_sequence("full")
     
     def init_Fast(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0X00)
-        self.send_data(0x0F)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0x06)
-        self.send_data(0x27)
-        self.send_data(0x27) 
-        self.send_data(0x18)		
-        self.send_data(0x17)		
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x5A)
-
-        self.send_command(0X50)
-        self.send_data(0x11)
-        self.send_data(0x07)
-        
-        return 0
+        return self.init_sequence("fast")
     
     def init_part(self):
-        if (epdconfig.module_init() != 0):
-            return -1
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0X00)
-        self.send_data(0x1F)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x6E)
-
-        self.send_command(0X50)
-        self.send_data(0xA9)
-        self.send_data(0x07)
-
-        # EPD hardware init end
-        return 0
+        return self.init_sequence("part")
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
-            # return a blank buffer
-            return [0x00] * (int(self.width/8) * self.height)
-
-        buf = bytearray(img.tobytes('raw'))
         # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
         # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        return epdbuffer.pack_1bpp(image, self.width, self.height)
 
     def display(self, imageblack, imagered):
         self.send_command(0x10)
         # The black bytes need to be inverted back from what getbuffer did
-        for i in range(len(imageblack)):
-            imageblack[i] ^= 0xFF
-        self.send_data2(imageblack)
+        self.send_data2(epdbuffer.invert(imageblack))
 
         self.send_command(0x13)
         self.send_data2(imagered)
@@ -299,13 +197,7 @@ class EPD:
         self.ReadBusy()
 
     def sleep(self):
-        self.send_command(0x02) # POWER_OFF
-        self.ReadBusy()
-        
-        self.send_command(0x07) # DEEP_SLEEP
-        self.send_data(0XA5)
-        
-        epdconfig.delay_ms(2000)
+        SLEEP.run(self)
         epdconfig.module_exit()
 ### END OF FILE ###
 
@@ -0,0 +1,131 @@
+# *****************************************************************************
+# * | File        :	  epdbase.py
+# * | Function    :   Shared base class of the e-Paper drivers
+# * | Info        :
+# *----------------
+# * | Info        :   The transport (reset, send_command, send_data, send_data2,
+# *                   ReadBusy) and 1bpp buffer conversion every driver used to
+# *                   copy. Drivers declare what differs as class attributes:
+# *                   resolution, pixel format, capabilities, reset timing and
+# *                   the busy pin protocol; the drivers with partial or fast
+# *                   refresh also declare their init sequences.
+# ******************************************************************************
+import logging
+
+from . import epdconfig
+from . import epdbusy
+from . import epdbuffer
+from . import epdsession
+
+logger = logging.getLogger(__name__)
+
+# Pixel formats of getbuffer()
+FORMAT_1BPP = "1bpp"                # black/white
+FORMAT_DUAL_PLANE = "dual-plane"    # 1bpp black plane + 1bpp red/yellow plane
+FORMAT_2BPP_COLOR = "2bpp-color"    # 4 colors, 4 pixels per byte
+FORMAT_4BPP_COLOR = "4bpp-color"    # 6/7 colors, 2 pixels per byte
+
+# Capabilities, and the methods they promise. The partial display method
+# is named and called differently per driver (display_Partial, displayPartial, ...).
+PARTIAL = "partial"                 # init_part, then the driver's partial display
+FAST = "fast"                       # init_fast
+GRAY4 = "4gray"                     # init_4Gray / getbuffer_4Gray (2bpp gray) / display_4Gray
+WINDOW = "window"                   # display_Partial_Window: a rectangle of a full getbuffer frame
+
+class EPDBase(object):
+    WIDTH = None
+    HEIGHT = None
+    FORMAT = FORMAT_1BPP
+    CAPS = frozenset()
+    # init mode ("full", "fast", "part", "4gray") -> epdsequence.Sequence, for init_sequence()
+    SEQUENCES = {}
+
+    # reset: ms with RST high, low, high again
+    RESET_MS = (200, 2, 200)
+    # ReadBusy: busy_pin level when idle, poll interval, status command sent
+    # while polling (None for none), whether it is sent before the first pin
+    # read or only after a busy one, and ms to wait after BUSY clears
+    BUSY_IDLE = 0
+    BUSY_POLL_MS = 10
+    BUSY_COMMAND = None
+    BUSY_COMMAND_FIRST = True
+    BUSY_SETTLE_MS = 0
+
+    def __init__(self):
+        self.reset_pin = epdconfig.RST_PIN
+        self.dc_pin = epdconfig.DC_PIN
+        self.busy_pin = epdconfig.BUSY_PIN
+        self.cs_pin = epdconfig.CS_PIN
+        self.width = self.WIDTH
+        self.height = self.HEIGHT
+
+    @classmethod
+    def capabilities(cls):
+        return {"width": cls.WIDTH, "height": cls.HEIGHT, "format": cls.FORMAT, "caps": sorted(cls.CAPS)}
+
+    # Hardware reset
+    def reset(self):
+        high, low, settle = self.RESET_MS
+        epdconfig.digital_write(self.reset_pin, 1)
+        epdconfig.delay_ms(high)
+        epdconfig.digital_write(self.reset_pin, 0)
+        epdconfig.delay_ms(low)
+        epdconfig.digital_write(self.reset_pin, 1)
+        epdconfig.delay_ms(settle)
+
+    def send_command(self, command):
+        epdconfig.write_pins(((self.dc_pin, 0), (self.cs_pin, 0)))
+        epdconfig.spi_writebyte([command])
+        epdconfig.digital_write(self.cs_pin, 1)
+
+    def send_data(self, data):
+        epdconfig.write_pins(((self.dc_pin, 1), (self.cs_pin, 0)))
+        epdconfig.spi_writebyte([data])
+        epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.write_pins(((self.dc_pin, 1), (self.cs_pin, 0)))
+        epdconfig.spi_writebyte2(data)
+        epdconfig.digital_write(self.cs_pin, 1)
+
+    def ReadBusy(self):
+        logger.debug("e-Paper busy")
+        epdbusy.wait_idle(self, self.BUSY_IDLE, self.BUSY_POLL_MS, command=self.BUSY_COMMAND,
+                          command_first=self.BUSY_COMMAND_FIRST)
+        if self.BUSY_SETTLE_MS:
+            epdconfig.delay_ms(self.BUSY_SETTLE_MS)
+        logger.debug("e-Paper busy release")
+
+    def init_sequence(self, mode):
+        """Open the interface, reset the panel and run SEQUENCES[mode]. Returns 0, or -1 if the interface failed.
+
+        mode may also be an epdsequence.Sequence, for an init built at call
+        time (e.g. with a caller's LUT).
+        """
+        if (epdconfig.module_init() != 0):
+            return -1
+        self.reset()
+        (self.SEQUENCES[mode] if isinstance(mode, str) else mode).run(self)
+        return 0
+
+    # The init methods of the FAST, PARTIAL and GRAY4 capabilities. Drivers
+    # whose own spelling (init_Fast, Init_4Gray, ...) runs more than the
+    # sequence override these.
+    def init_fast(self):
+        return self.init_sequence("fast")
+
+    def init_part(self):
+        # Without a partial init, partial refresh follows the full one
+        return self.init_sequence("part" if "part" in self.SEQUENCES else "full")
+
+    def init_4Gray(self):
+        return self.init_sequence("4gray")
+
+    # Keep the panel initialized across refreshes instead of init/sleep per frame
+    def session(self, idle_s=epdsession.IDLE_S, lock=None):
+        return epdsession.Session(self, idle_s, lock)
+
+    def getbuffer(self, image):
+        # Dither first, then rotate portrait images into panel orientation (1 = white).
+        return epdbuffer.pack_1bpp(image.convert('1'), self.width, self.height, inverted=False)
@@ -0,0 +1,271 @@
+# *****************************************************************************
+# * | File        :	  epdbuffer.py
+# * | Function    :   Shared frame buffer conversion for the e-Paper drivers
+# * | Info        :
+# *----------------
+# * | Info        :   PIL images are packed and inverted with bulk operations
+# *                   (Image.tobytes, bytes.translate) instead of per-byte or
+# *                   per-pixel Python loops.
+# ******************************************************************************
+import logging
+
+from PIL import Image, ImageChops
+
+logger = logging.getLogger(__name__)
+
+# Byte-wise NOT: PIL packs 1=white, the panels want 1=black.
+INVERT = bytes(b ^ 0xFF for b in range(256))
+
+# 4-gray drivers: 0xC0 and 0x80 are moved down one level, then the top two
+# bits of each pixel are sent (0b11 white .. 0b00 black).
+GRAY_LUT = [({0xC0: 0x80, 0x80: 0x40}.get(v, v) >> 6) for v in range(256)]
+_SHIFT_TABLES = [bytes((v << shift) & 0xFF for v in range(256)) for shift in (6, 4, 2, 0)]
+_NIBBLE_HIGH = _SHIFT_TABLES[1]
+
+def _expand_tables(bits, mask):
+    """Tables mapping a packed 1bpp byte to each of its `bits` output bytes."""
+    per_byte = 8 // bits
+    tables = []
+    for part in range(bits):
+        table = bytearray(256)
+        for value in range(256):
+            out = 0
+            for k in range(per_byte):
+                bit = (value >> (7 - (part * per_byte + k))) & 1
+                out = (out << bits) | (((1 << bits) - 1) if bit else 0)
+            table[value] = out & mask
+        tables.append(bytes(table))
+    return tables
+
+_expand_cache = {}
+
+def _pad_rows_white(data, stride, used_bits):
+    """Set the unused low bits of every row's last byte (PIL leaves them 0 = black)."""
+    pad = (1 << (8 - used_bits)) - 1
+    data = bytearray(data)
+    data[stride - 1::stride] = bytes(data[stride - 1::stride]).translate(bytes(b | pad for b in range(256)))
+    return bytes(data)
+
+def invert(data):
+    """Return a bitwise-inverted copy of a bytes-like object or list of byte values."""
+    if not isinstance(data, (bytes, bytearray)):
+        data = bytes(data)
+    return data.translate(INVERT)
+
+def expand_bits(data, bits, mask=0xFF):
+    """Widen every bit of packed 1bpp data to `bits` identical bits (2 or 4), MSB first.
+
+    mask is applied to every output byte, e.g. 0x33 turns the 4-bit white
+    nibble 0xF into 0x3.
+    """
+    tables = _expand_cache.get((bits, mask))
+    if tables is None:
+        tables = _expand_cache[(bits, mask)] = _expand_tables(bits, mask)
+    data = bytes(data)
+    out = bytearray(len(data) * bits)
+    for part, table in enumerate(tables):
+        out[part::bits] = data.translate(table)
+    return out
+
+def orient(image, width, height, transpose=False):
+    """Return the image in panel orientation, or None if its size does not fit the panel.
+
+    Portrait images are rotated 90 degrees counter-clockwise, or transposed
+    (mirrored along the diagonal) for the drivers that map them that way.
+    """
+    imwidth, imheight = image.size
+    if imwidth == width and imheight == height:
+        return image
+    if imwidth == height and imheight == width:
+        # image has correct dimensions, but needs to be rotated
+        if transpose:
+            return image.transpose(Image.Transpose.TRANSPOSE)
+        return image.rotate(90, expand=True)
+    logger.warning("Wrong image dimensions: must be " + str(width) + "x" + str(height))
+    return None
+
+def pack_1bpp(image, width, height, inverted=True, out=None):
+    """Pack an image into MSB-first 1bpp rows for a width x height panel.
+
+    With inverted=True (the default) 1 means black, as most controllers expect;
+    inverted=False keeps PIL's 1 = white. Pass an image already converted to
+    mode '1' to dither before rotating, as the per-pixel drivers used to.
+    If out is given it must be a bytearray of the right length; it is filled in
+    place and returned, so callers can reuse one frame buffer. An image of the
+    wrong size yields an all-white frame.
+    """
+    size = (width + 7) // 8 * height
+    img = orient(image, width, height)
+    if img is None:
+        data = bytes(size) if inverted else b"\xff" * size
+    else:
+        data = img.convert('1').tobytes('raw')
+        if width % 8:
+            data = _pad_rows_white(data, (width + 7) // 8, width % 8)
+        if inverted:
+            data = data.translate(INVERT)
+    if out is None:
+        return bytearray(data)
+    out[:] = data
+    return out
+
+def pack_2bit(levels):
+    """Pack bytes holding 2-bit values (0..3) four per byte, MSB first."""
+    levels = bytes(levels)
+    count = len(levels) // 4
+    packed = 0
+    for part, table in enumerate(_SHIFT_TABLES):
+        packed |= int.from_bytes(levels[part::4].translate(table), 'big')
+    return bytearray(packed.to_bytes(count, 'big'))
+
+def pack_4gray(image, width, height, transpose=False):
+    """Pack an image for the 4-gray modes: 2 bits per pixel, 4 pixels per byte.
+
+    The image is not modified. An image of the wrong size yields an all-white
+    frame.
+    """
+    img = orient(image.convert('L'), width, height, transpose)
+    if img is None:
+        return bytearray([0xFF] * (int(width / 4) * height))
+    return pack_2bit(img.point(GRAY_LUT).tobytes('raw'))
+
+# Plane bits per 2-bit gray value, indexed (black, 0x40 gray, 0x80 gray, white).
+# The 4-gray controllers load each RAM plane with one of these.
+GRAY_PLANE_LOW = (0, 1, 0, 1)
+GRAY_PLANE_HIGH = (0, 0, 1, 1)
+GRAY_PLANE_NOT_LOW = (1, 0, 1, 0)
+GRAY_PLANE_NOT_HIGH = (1, 1, 0, 0)
+
+_plane_cache = {}
+
+def _plane_tables(levels):
+    """Tables mapping a 4-gray byte (4 pixels) to its plane nibble, high and low."""
+    tables = _plane_cache.get(levels)
+    if tables is None:
+        nibbles = bytearray(256)
+        for value in range(256):
+            for k in range(4):
+                nibbles[value] |= levels[(value >> (6 - 2 * k)) & 0x03] << (3 - k)
+        tables = (bytes(n << 4 for n in nibbles), bytes(nibbles))
+        _plane_cache[levels] = tables
+    return tables
+
+def gray_plane(data, levels):
+    """One 1bpp plane of a getbuffer_4Gray buffer, 8 pixels (2 bytes) per byte.
+
+    levels is one of the GRAY_PLANE_* tuples.
+    """
+    high, low = _plane_tables(levels)
+    data = bytes(data)
+    count = len(data) // 2
+    packed = (int.from_bytes(data[0:2 * count:2].translate(high), 'big')
+              | int.from_bytes(data[1:2 * count:2].translate(low), 'big'))
+    return bytearray(packed.to_bytes(count, 'big'))
+
+def pack_4bit(values):
+    """Pack bytes holding 4-bit values (0..15) two per byte, high nibble first."""
+    values = bytes(values)
+    count = len(values) // 2
+    packed = (int.from_bytes(values[0:2 * count:2].translate(_NIBBLE_HIGH), 'big')
+              | int.from_bytes(values[1:2 * count:2], 'big'))
+    return bytearray(packed.to_bytes(count, 'big'))
+
+# Dithering for the color panels' quantize(). ORDERED adds a fixed 8x8 Bayer
+# pattern before a plain nearest-color lookup: slightly coarser than
+# Floyd-Steinberg, but it costs the same for every frame.
+FLOYD_STEINBERG = "floyd-steinberg"
+ORDERED = "ordered"
+NO_DITHER = "none"
+
+def _bayer(n):
+    if n == 1:
+        return [[0]]
+    half = _bayer(n // 2)
+    return ([[4 * v for v in row] + [4 * v + 2 for v in row] for row in half]
+            + [[4 * v + 3 for v in row] + [4 * v + 1 for v in row] for row in half])
+
+# Thresholds 2..254, centred on 128
+_BAYER_ROWS = [bytes(4 * v + 2 for v in row) for row in _bayer(8)]
+
+# Without error diffusion a gray goes to its nearest palette color, which on
+# the 7-color panels is orange for mid grays. Pixels below this HSV saturation
+# (0..255) are mapped to the palette's grays (black and white) instead.
+NEUTRAL_SATURATION = 32
+
+_NEUTRAL_MASK = [255] * NEUTRAL_SATURATION + [0] * (256 - NEUTRAL_SATURATION)
+
+_palette_cache = {}
+_threshold_cache = {}
+_grays_cache = {}
+
+def palette_image(colors):
+    """A "P" image with the panel colors (flat RGB tuple) for Image.quantize, built once per palette."""
+    pal_image = _palette_cache.get(colors)
+    if pal_image is None:
+        pal_image = Image.new("P", (1, 1))
+        pal_image.putpalette(colors + (0, 0, 0) * (256 - len(colors) // 3))
+        _palette_cache[colors] = pal_image
+    return pal_image
+
+def _grays(colors):
+    """The gray entries of a palette as a flat RGB tuple, and a translate table back to palette indices."""
+    grays = _grays_cache.get(colors)
+    if grays is None:
+        entries = [colors[i:i + 3] for i in range(0, len(colors), 3)]
+        indices = [i for i, (r, g, b) in enumerate(entries) if r == g == b and entries.index((r, g, b)) == i]
+        # palette_image pads the palette with black
+        black = entries.index((0, 0, 0)) if (0, 0, 0) in entries else 0
+        table = bytes(indices + [black] * (256 - len(indices)))
+        grays = _grays_cache[colors] = (sum((entries[i] for i in indices), ()), table)
+    return grays
+
+def _thresholds(width, height):
+    """RGB image tiling the Bayer thresholds over width x height, built once per size."""
+    image = _threshold_cache.get((width, height))
+    if image is None:
+        rows = [(row * (width // 8 + 1))[:width] for row in _BAYER_ROWS]
+        plane = Image.frombytes('L', (width, height), (b''.join(rows) * (height // 8 + 1))[:width * height])
+        image = _threshold_cache[(width, height)] = Image.merge('RGB', (plane, plane, plane))
+    return image
+
+def quantize(image, width, height, colors, dither=FLOYD_STEINBERG):
+    """Palette indices of the image in panel orientation, one byte per pixel, or None if it does not fit.
+
+    colors is the panel palette as a flat RGB tuple in index order. With
+    ORDERED and NO_DITHER, grays (see NEUTRAL_SATURATION) only use the gray
+    entries of the palette.
+    """
+    img = orient(image, width, height)
+    if img is None:
+        return None
+    img = img.convert("RGB")
+    neutral = None
+    if dither != FLOYD_STEINBERG:
+        neutral = img.convert("HSV").getchannel("S").point(_NEUTRAL_MASK)
+    if dither == ORDERED:
+        img = ImageChops.add(img, _thresholds(width, height), 1.0, -128)
+    method = Image.Dither.FLOYDSTEINBERG if dither == FLOYD_STEINBERG else Image.Dither.NONE
+    indices = img.quantize(palette=palette_image(colors), dither=method).tobytes('raw')
+    gray_colors, table = _grays(colors)
+    if neutral is None or not gray_colors or neutral.getbbox() is None:
+        return indices
+    # The Bayer offsets are the same on all three channels, so grays stay gray
+    gray_indices = img.quantize(palette=palette_image(gray_colors), dither=Image.Dither.NONE).tobytes('raw').translate(table)
+    return Image.composite(Image.frombytes('L', img.size, gray_indices),
+                           Image.frombytes('L', img.size, indices), neutral).tobytes()
+
+def pack_color(image, width, height, colors, bits=4, dither=FLOYD_STEINBERG):
+    """Pack an image for the color panels: palette indices of 4 bits (2 pixels per byte) or 2 bits (4 per byte).
+
+    Rows that do not fill their last byte are padded with index 0. An image
+    of the wrong size yields a white frame.
+    """
+    indices = quantize(image, width, height, colors, dither)
+    if indices is None:
+        white = next(i for i in range(len(colors) // 3) if colors[3 * i:3 * i + 3] == (255, 255, 255))
+        indices = bytes([white]) * (width * height)
+    per_byte = 8 // bits
+    if width % per_byte:
+        pad = bytes(per_byte - width % per_byte)
+        indices = b''.join(indices[y * width:(y + 1) * width] + pad for y in range(height))
+    return pack_4bit(indices) if bits == 4 else pack_2bit(indices)
@@ -0,0 +1,69 @@
+# *****************************************************************************
+# * | File        :	  epdbusy.py
+# * | Function    :   Busy-pin waits for the e-Paper drivers
+# * | Info        :
+# *----------------
+# * | Info        :   Waits block on the backend's pin edge events where it has
+# *                   them (epdconfig.wait_pin) and fall back to polling, so a
+# *                   refresh no longer keeps a core spinning. Every wait is
+# *                   timed and bounded.
+# ******************************************************************************
+import logging
+import time
+
+from . import epdconfig
+
+logger = logging.getLogger(__name__)
+
+# A panel still busy after this long is treated as hung.
+TIMEOUT_MS = 120000
+
+# driver module -> [waits, total ms, longest ms, last ms]
+_stats = {}
+
+def wait_idle(epd, idle, poll_ms=10, command=None, timeout_ms=TIMEOUT_MS, command_first=True):
+    """Block until epd.busy_pin reads idle (0 or 1). Returns how long the panel was busy, in ms.
+
+    command, if given, is sent before every check: some controllers are
+    polled with their get-status command (0x71) while busy. It is re-sent
+    every poll_ms. With command_first=False it is sent after each check
+    that reads busy instead, so a panel already idle gets none.
+    Without a command an edge-capable backend sleeps until the pin
+    changes. Raises TimeoutError (an IOError) after timeout_ms.
+    """
+    wait_pin = getattr(epdconfig, 'wait_pin', None)
+    start = time.monotonic()
+    deadline = start + timeout_ms / 1000.0
+    while True:
+        if command is not None and command_first:
+            epd.send_command(command)
+        if epdconfig.digital_read(epd.busy_pin) == idle:
+            break
+        if command is not None and not command_first:
+            epd.send_command(command)
+        remaining_ms = (deadline - time.monotonic()) * 1000
+        if remaining_ms <= 0:
+            raise TimeoutError("e-Paper still busy after %d ms" % timeout_ms)
+        if wait_pin is None:
+            epdconfig.delay_ms(min(poll_ms, remaining_ms))
+        elif command is None:
+            wait_pin(epd.busy_pin, idle, remaining_ms)
+        else:
+            wait_pin(epd.busy_pin, idle, min(poll_ms, remaining_ms))
+
+    busy_ms = (time.monotonic() - start) * 1000
+    name = type(epd).__module__.rsplit('.', 1)[-1]
+    stats = _stats.setdefault(name, [0, 0.0, 0.0, 0.0])
+    stats[0] += 1
+    stats[1] += busy_ms
+    stats[2] = max(stats[2], busy_ms)
+    stats[3] = busy_ms
+    logger.debug("%s busy for %.0f ms", name, busy_ms)
+    return busy_ms
+
+def busy_stats():
+    """Per driver: number of waits and their average, longest and last duration in ms."""
+    return {
+        name: {"waits": waits, "avg_ms": round(total / waits, 1), "max_ms": round(longest, 1), "last_ms": round(last, 1)}
+        for name, (waits, total, longest, last) in _stats.items()
+    }
@@ -30,8 +30,8 @@
 import os
 import logging
 import sys
+import struct
 import time
-import subprocess
 
 from ctypes import *
 
@@ -51,13 +51,16 @@ class RaspberryPi:
     def __init__(self):
         import spidev
         import gpiozero
+        from .epdspi import Transport
         
         self.SPI = spidev.SpiDev()
+        self.transport = Transport(self.SPI)
         self.GPIO_RST_PIN    = gpiozero.LED(self.RST_PIN)
         self.GPIO_DC_PIN     = gpiozero.LED(self.DC_PIN)
         # self.GPIO_CS_PIN     = gpiozero.LED(self.CS_PIN)
         self.GPIO_PWR_PIN    = gpiozero.LED(self.PWR_PIN)
         self.GPIO_BUSY_PIN   = gpiozero.Button(self.BUSY_PIN, pull_up = False)
+        self.SPI_OPEN = False
 
         
 
@@ -83,26 +86,39 @@ class RaspberryPi:
             else:
                 self.GPIO_PWR_PIN.off()
 
+    # (pin, value) pairs, e.g. DC and CS before a transfer
+    def write_pins(self, pins):
+        for pin, value in pins:
+            self.digital_write(pin, value)
+
     def digital_read(self, pin):
         if pin == self.BUSY_PIN:
             return self.GPIO_BUSY_PIN.value
         elif pin == self.RST_PIN:
-            return self.RST_PIN.value
+            return self.GPIO_RST_PIN.value
         elif pin == self.DC_PIN:
-            return self.DC_PIN.value
+            return self.GPIO_DC_PIN.value
         # elif pin == self.CS_PIN:
-        #     return self.CS_PIN.value
+        #     return self.GPIO_CS_PIN.value
         elif pin == self.PWR_PIN:
-            return self.PWR_PIN.value
+            return self.GPIO_PWR_PIN.value
+
+    # Sleep until the busy pin reads value, woken by gpiozero's edge events.
+    # Returns False if it did not within timeout_ms.
+    def wait_pin(self, pin, value, timeout_ms=None):
+        timeout = None if timeout_ms is None else timeout_ms / 1000.0
+        if value:
+            return self.GPIO_BUSY_PIN.wait_for_active(timeout)
+        return self.GPIO_BUSY_PIN.wait_for_inactive(timeout)
 
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
     def spi_writebyte(self, data):
-        self.SPI.writebytes(data)
+        self.transport.write(data)
 
     def spi_writebyte2(self, data):
-        self.SPI.writebytes2(data)
+        self.transport.write(data)
 
     def DEV_SPI_write(self, data):
         self.DEV_SPI.DEV_SPI_SendData(data)
@@ -123,9 +139,10 @@ class RaspberryPi:
                 '/usr/lib',
             ]
             self.DEV_SPI = None
+            # Bitness of this process, which is what the library must match
+            val = struct.calcsize("P") * 8
+            logging.debug("System is %d bit"%val)
             for find_dir in find_dirs:
-                val = int(os.popen('getconf LONG_BIT').read())
-                logging.debug("System is %d bit"%val)
                 if val == 64:
                     so_filename = os.path.join(find_dir, 'DEV_Config_64.so')
                 else:
@@ -138,16 +155,17 @@ class RaspberryPi:
 
             self.DEV_SPI.DEV_Module_Init()
 
-        else:
+        elif not self.SPI_OPEN:
             # SPI device, bus = 0, device = 0
-            self.SPI.open(0, 0)
-            self.SPI.max_speed_hz = 4000000
-            self.SPI.mode = 0b00
+            # (init may run again before module_exit, e.g. on an epdsession mode change)
+            self.transport.open(0, 0)
+            self.SPI_OPEN = True
         return 0
 
     def module_exit(self, cleanup=False):
         logger.debug("spi end")
-        self.SPI.close()
+        self.transport.close()
+        self.SPI_OPEN = False
 
         self.GPIO_RST_PIN.off()
         self.GPIO_DC_PIN.off()
@@ -195,6 +213,9 @@ class JetsonNano:
     def digital_write(self, pin, value):
         self.GPIO.output(pin, value)
 
+    def write_pins(self, pins):
+        self.GPIO.output([pin for pin, _ in pins], [value for _, value in pins])
+
     def digital_read(self, pin):
         return self.GPIO.input(self.BUSY_PIN)
 
@@ -246,13 +267,18 @@ class SunriseX3:
     def __init__(self):
         import spidev
         import Hobot.GPIO
+        from .epdspi import Transport
 
         self.GPIO = Hobot.GPIO
         self.SPI = spidev.SpiDev()
+        self.transport = Transport(self.SPI, xfer3=True)
 
     def digital_write(self, pin, value):
         self.GPIO.output(pin, value)
 
+    def write_pins(self, pins):
+        self.GPIO.output([pin for pin, _ in pins], [value for _, value in pins])
+
     def digital_read(self, pin):
         return self.GPIO.input(pin)
 
@@ -260,12 +286,11 @@ class SunriseX3:
         time.sleep(delaytime / 1000.0)
 
     def spi_writebyte(self, data):
-        self.SPI.writebytes(data)
+        # Commands keep writebytes, as before the Transport; frames use xfer3
+        self.transport.write(data, self.SPI.writebytes)
 
     def spi_writebyte2(self, data):
-        # for i in range(len(data)):
-        #     self.SPI.writebytes([data[i]])
-        self.SPI.xfer3(data)
+        self.transport.write(data)
 
     def module_init(self):
         if self.Flag == 0:
@@ -281,16 +306,14 @@ class SunriseX3:
             self.GPIO.output(self.PWR_PIN, 1)
         
             # SPI device, bus = 0, device = 0
-            self.SPI.open(2, 0)
-            self.SPI.max_speed_hz = 4000000
-            self.SPI.mode = 0b00
+            self.transport.open(2, 0)
             return 0
         else:
             return 0
 
     def module_exit(self):
         logger.debug("spi end")
-        self.SPI.close()
+        self.transport.close()
 
         logger.debug("close 5V, Module enters 0 power consumption ...")
         self.Flag = 0
@@ -301,22 +324,74 @@ class SunriseX3:
         self.GPIO.cleanup([self.RST_PIN, self.DC_PIN, self.CS_PIN, self.BUSY_PIN], self.PWR_PIN)
 
 
-if sys.version_info[0] == 2:
-    process = subprocess.Popen("cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE)
-else:
-    process = subprocess.Popen("cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE, text=True)
-output, _ = process.communicate()
-if sys.version_info[0] == 2:
-    output = output.decode(sys.stdout.encoding)
-
-if "Raspberry" in output:
-    implementation = RaspberryPi()
-elif os.path.exists('/sys/bus/platform/drivers/gpio-x3'):
-    implementation = SunriseX3()
-else:
-    implementation = JetsonNano()
-
-for func in [x for x in dir(implementation) if not x.startswith('_')]:
-    setattr(sys.modules[__name__], func, getattr(implementation, func))
+def _simulator():
+    # Software panel for machines without the HAT, see epdsim.py
+    from .epdsim import Simulator
+    return Simulator()
+
+def _gpiochip():
+    # Raspberry Pi through the GPIO character device, see epdgpio.py
+    from .epdgpio import Gpiochip
+    return Gpiochip()
+
+# Backend names for the EPD_BACKEND environment variable
+BACKENDS = {
+    'raspberrypi': RaspberryPi,
+    'sunrisex3': SunriseX3,
+    'jetsonnano': JetsonNano,
+    'gpiochip': _gpiochip,
+    'sim': _simulator,
+}
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read().decode('utf-8', 'replace')
+    except OSError:
+        return ''
+
+def detect_backend():
+    """Backend name for this machine: EPD_BACKEND if set, otherwise from /proc and /sys."""
+    name = os.environ.get('EPD_BACKEND', '').strip().lower()
+    if name:
+        if name not in BACKENDS:
+            raise ValueError("EPD_BACKEND=%r, expected one of %s" % (name, ', '.join(sorted(BACKENDS))))
+        return name
+    if 'Raspberry' in _read('/proc/cpuinfo') or 'Raspberry' in _read('/proc/device-tree/model'):
+        return 'raspberrypi'
+    if os.path.exists('/sys/bus/platform/drivers/gpio-x3'):
+        return 'sunrisex3'
+    return 'jetsonnano'
+
+implementation = None
+
+def _load():
+    # The backend (and spidev/gpiozero/Jetson.GPIO with it) is only created on
+    # first use, so the drivers can be imported on machines without GPIO.
+    global implementation
+    if implementation is None:
+        name = detect_backend()
+        logger.debug("e-Paper backend: %s", name)
+        use_backend(BACKENDS[name]())
+    return implementation
+
+def use_backend(backend):
+    """Switch to backend (a BACKENDS name or an instance) before or instead of detection. Returns it."""
+    global implementation
+    if isinstance(backend, str):
+        backend = BACKENDS[backend]()
+    for func in [x for x in dir(backend) if not x.startswith('_')]:
+        setattr(sys.modules[__name__], func, getattr(backend, func))
+    implementation = backend
+    return implementation
+
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    _load()
+    try:
+        return globals()[name]
+    except KeyError:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name)) from None
 
 ### END OF FILE ###
@@ -0,0 +1,210 @@
+# *****************************************************************************
+# * | File        :	  epdgpio.py
+# * | Function    :   Raspberry Pi backend on the GPIO character device
+# * | Info        :
+# *----------------
+# * | Info        :   Select it with EPD_BACKEND=gpiochip; the gpiozero backend
+# *                   stays the default. The output lines are claimed once as
+# *                   one lgpio group, so a pin write is a single masked group
+# *                   write looked up in a pin -> bit table, and write_pins()
+# *                   sets DC, CS and the others together in one ioctl.
+# *                   MockChip stands in for the chip on machines without one.
+# ******************************************************************************
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# /dev/gpiochipN with the header pins (Raspberry Pi 5 on older kernels: 4)
+CHIP = 0
+
+class LgpioChip:
+    """The few lgpio calls the backend needs, on one gpiochip."""
+
+    def __init__(self, chip=CHIP):
+        import lgpio
+        self.lgpio = lgpio
+        self.handle = lgpio.gpiochip_open(chip)
+        self.leader = None
+        self.callbacks = []
+
+    def claim_outputs(self, lines, levels):
+        self.lgpio.group_claim_output(self.handle, lines, levels)
+        self.leader = lines[0]
+
+    def write(self, bits, mask):
+        self.lgpio.group_write(self.handle, self.leader, bits, mask)
+
+    def claim_input(self, line, on_edge):
+        self.lgpio.gpio_claim_alert(self.handle, line, self.lgpio.BOTH_EDGES, self.lgpio.SET_PULL_DOWN)
+        self.callbacks.append(self.lgpio.callback(self.handle, line, self.lgpio.BOTH_EDGES,
+                                                  lambda chip, gpio, level, tick: on_edge(level)))
+
+    def read(self, line):
+        return self.lgpio.gpio_read(self.handle, line)
+
+    def close(self):
+        for callback in self.callbacks:
+            callback.cancel()
+        self.callbacks = []
+        self.lgpio.gpiochip_close(self.handle)
+
+class MockChip:
+    """In-memory chip with the LgpioChip interface.
+
+    Output writes are recorded in writes as (bits, mask), one per ioctl the
+    real chip would make; set_input() drives an input line and fires its
+    edge callback.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.levels = {}
+        self.writes = []
+        self.edges = {}
+        self.closed = False
+
+    def claim_outputs(self, lines, levels):
+        self.lines = list(lines)
+        self.levels.update(zip(lines, levels))
+
+    def write(self, bits, mask):
+        self.writes.append((bits, mask))
+        for i, line in enumerate(self.lines):
+            if mask & (1 << i):
+                self.levels[line] = (bits >> i) & 1
+
+    def claim_input(self, line, on_edge):
+        self.levels.setdefault(line, 0)
+        self.edges[line] = on_edge
+
+    def set_input(self, line, level):
+        if self.levels.get(line) != level:
+            self.levels[line] = level
+            if line in self.edges:
+                self.edges[line](level)
+
+    def read(self, line):
+        return self.levels.get(line, 0)
+
+    def close(self):
+        self.closed = True
+
+class Gpiochip:
+    # Pin definition (BCM numbers are the line offsets on the chip)
+    RST_PIN  = 17
+    DC_PIN   = 25
+    CS_PIN   = 8
+    BUSY_PIN = 24
+    PWR_PIN  = 18
+
+    def __init__(self, chip=None, spi=None, manage_cs=None):
+        """chip: an LgpioChip (default, on EPD_GPIOCHIP or CHIP) or a MockChip.
+        spi: a spidev.SpiDev-like object, default spidev.SpiDev().
+
+        CS normally belongs to the SPI controller (CE0) and cs_pin writes are
+        ignored, as in the gpiozero backend. With manage_cs (or EPD_GPIO_CS=1)
+        the line is claimed here and spidev runs with no_cs; the kernel must
+        leave GPIO 8 free (dtoverlay=spi0-0cs).
+        """
+        from .epdspi import Transport
+
+        if chip is None:
+            chip = LgpioChip(int(os.environ.get('EPD_GPIOCHIP', CHIP)))
+        if spi is None:
+            import spidev
+            spi = spidev.SpiDev()
+        if manage_cs is None:
+            manage_cs = os.environ.get('EPD_GPIO_CS', '') == '1'
+        self.chip = chip
+        self.SPI = spi
+        self.transport = Transport(spi)
+        self.manage_cs = manage_cs
+        self.SPI_OPEN = False
+        self.claimed = False
+        self.edge = threading.Event()
+
+        outputs = [self.DC_PIN, self.RST_PIN, self.PWR_PIN] + ([self.CS_PIN] if manage_cs else [])
+        self.outputs = outputs
+        # pin -> bit in the output group; pins not in it (CS on CE0) map to 0
+        self.masks = {pin: 1 << i for i, pin in enumerate(outputs)}
+        self.levels = 0
+
+    def _claim(self):
+        if not self.claimed:
+            # RST idles high, CS (if ours) idles high
+            self.levels = self.masks[self.RST_PIN] | self.masks.get(self.CS_PIN, 0)
+            self.chip.claim_outputs(self.outputs, [(self.levels >> i) & 1 for i in range(len(self.outputs))])
+            self.chip.claim_input(self.BUSY_PIN, self._on_edge)
+            self.claimed = True
+
+    def _on_edge(self, level):
+        self.edge.set()
+
+    def digital_write(self, pin, value):
+        mask = self.masks.get(pin, 0)
+        if mask:
+            self.levels = self.levels | mask if value else self.levels & ~mask
+            self.chip.write(self.levels, mask)
+
+    def write_pins(self, pins):
+        mask = 0
+        for pin, value in pins:
+            bit = self.masks.get(pin, 0)
+            mask |= bit
+            self.levels = self.levels | bit if value else self.levels & ~bit
+        if mask:
+            self.chip.write(self.levels, mask)
+
+    def digital_read(self, pin):
+        if pin == self.BUSY_PIN:
+            return self.chip.read(pin)
+        mask = self.masks.get(pin, 0)
+        return 1 if self.levels & mask else 0
+
+    # Sleep until the busy pin reads value, woken by the chip's edge events.
+    # Returns False if it did not within timeout_ms.
+    def wait_pin(self, pin, value, timeout_ms=None):
+        deadline = None if timeout_ms is None else time.monotonic() + timeout_ms / 1000.0
+        while True:
+            self.edge.clear()
+            if self.chip.read(pin) == value:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self.edge.wait(remaining)
+
+    def delay_ms(self, delaytime):
+        time.sleep(delaytime / 1000.0)
+
+    def spi_writebyte(self, data):
+        self.transport.write(data)
+
+    def spi_writebyte2(self, data):
+        self.transport.write(data)
+
+    def module_init(self, cleanup=False):
+        self._claim()
+        self.digital_write(self.PWR_PIN, 1)
+        if not self.SPI_OPEN:
+            # SPI device, bus = 0, device = 0
+            self.transport.open(0, 0)
+            if self.manage_cs:
+                self.SPI.no_cs = True
+            self.SPI_OPEN = True
+        return 0
+
+    def module_exit(self, cleanup=False):
+        logger.debug("spi end")
+        self.transport.close()
+        self.SPI_OPEN = False
+
+        self.write_pins(((self.RST_PIN, 0), (self.DC_PIN, 0), (self.PWR_PIN, 0)))
+        logger.debug("close 5V, Module enters 0 power consumption ...")
+
+        if cleanup:
+            self.chip.close()
+            self.claimed = False
@@ -0,0 +1,46 @@
+# *****************************************************************************
+# * | File        :	  epdregistry.py
+# * | Function    :   Look up e-Paper drivers by model name
+# * | Info        :
+# *----------------
+# * | Info        :   Only the configured model's module is imported, so an
+# *                   application names its panel (EPD_MODEL) instead of
+# *                   importing one driver by hand, and the other drivers and
+# *                   their lookup tables are never loaded.
+# ******************************************************************************
+import importlib
+import os
+import pkgutil
+import re
+
+DEFAULT_MODEL = "epd7in5_V2"
+
+_MODEL = re.compile(r'epd\d+in\d+\w*$')
+
+def models():
+    """Names of the driver modules in the package, found without importing them."""
+    path = os.path.dirname(os.path.abspath(__file__))
+    return sorted(name for _, name, _ in pkgutil.iter_modules([path]) if _MODEL.match(name))
+
+def model_name(name=None):
+    """name, else EPD_MODEL, else DEFAULT_MODEL; ValueError if there is no such driver."""
+    name = name or os.environ.get('EPD_MODEL', '').strip() or DEFAULT_MODEL
+    if not _MODEL.match(name) or name not in models():
+        raise ValueError("Unknown e-Paper model %r, expected one of %s" % (name, ', '.join(models())))
+    return name
+
+def load(name=None):
+    """Import and return the driver module of model name (see model_name)."""
+    return importlib.import_module('.' + model_name(name), __package__)
+
+def capabilities(name=None):
+    """Resolution, pixel format and capabilities of model name, without creating an EPD."""
+    return load(name).EPD.capabilities()
+
+def create(name=None, require=()):
+    """An EPD of model name. ValueError if it lacks one of the capabilities in require."""
+    cls = load(name).EPD
+    missing = set(require) - set(cls.CAPS)
+    if missing:
+        raise ValueError("e-Paper model %s does not support %s" % (cls.__module__.rsplit('.', 1)[-1], ', '.join(sorted(missing))))
+    return cls()
@@ -0,0 +1,109 @@
+# *****************************************************************************
+# * | File        :	  epdsequence.py
+# * | Function    :   Command sequences for the e-Paper drivers, as data
+# * | Info        :
+# *----------------
+# * | Info        :   Init, power and window sequences are written as lists of
+# *                   steps and compiled once. Each command and its parameter
+# *                   bytes go out in one chip-select frame with one transfer
+# *                   per DC level, instead of a GPIO round trip per byte.
+# ******************************************************************************
+import logging
+import time
+
+from . import epdconfig
+
+logger = logging.getLogger(__name__)
+
+_FRAME = 0
+_DELAY = 1
+_BUSY = 2
+
+def cmd(command, *data):
+    """A command byte followed by its parameter bytes."""
+    return (_FRAME, command, bytes(data))
+
+def delay(ms):
+    return (_DELAY, ms)
+
+# Wait for the controller with the driver's own ReadBusy.
+BUSY = (_BUSY,)
+
+def _compile(steps):
+    """Merge the steps into ops: frames of (dc, bytes) transfers, delays and busy waits.
+
+    A command without parameters shares its frame and transfer with the
+    command that follows it.
+    """
+    ops = []
+    pending = b''
+    for step in steps:
+        if step[0] == _FRAME:
+            command, data = pending + bytes([step[1]]), step[2]
+            if not data:
+                pending = command
+                continue
+            ops.append((_FRAME, ((0, command), (1, data))))
+            pending = b''
+        else:
+            if pending:
+                ops.append((_FRAME, ((0, pending),)))
+                pending = b''
+            ops.append(step)
+    if pending:
+        ops.append((_FRAME, ((0, pending),)))
+    return tuple(ops)
+
+# name -> [runs, total ms, ms spent in delays and busy waits]
+_stats = {}
+
+class Sequence:
+    def __init__(self, name, steps):
+        self.name = name
+        self.ops = _compile(steps)
+
+    def run(self, epd):
+        """Send the sequence to epd (any driver with dc_pin, cs_pin and ReadBusy)."""
+        digital_write = epdconfig.digital_write
+        write_pins = epdconfig.write_pins
+        spi_writebyte2 = epdconfig.spi_writebyte2
+        start = time.perf_counter()
+        waited = 0.0
+        dc = None
+        for op in self.ops:
+            if op[0] == _FRAME:
+                # Chip select and the first DC level in one write
+                write_pins(((epd.cs_pin, 0), (epd.dc_pin, op[1][0][0])))
+                dc = op[1][0][0]
+                for level, data in op[1]:
+                    if level != dc:
+                        digital_write(epd.dc_pin, level)
+                        dc = level
+                    spi_writebyte2(data)
+                digital_write(epd.cs_pin, 1)
+                continue
+            wait_start = time.perf_counter()
+            if op[0] == _DELAY:
+                epdconfig.delay_ms(op[1])
+            else:
+                epd.ReadBusy()
+                dc = None
+            waited += time.perf_counter() - wait_start
+
+        total_ms = (time.perf_counter() - start) * 1000
+        stats = _stats.setdefault(self.name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += total_ms
+        stats[2] += waited * 1000
+        logger.debug("%s: %.1f ms (%.1f ms waiting)", self.name, total_ms, waited * 1000)
+
+def run(epd, name, steps):
+    """Compile and send a one-off sequence, e.g. one built from window coordinates."""
+    Sequence(name, steps).run(epd)
+
+def sequence_stats():
+    """Per sequence name: runs, average ms, and average ms spent outside delays and busy waits."""
+    return {
+        name: {"runs": runs, "avg_ms": round(total / runs, 2), "avg_io_ms": round((total - waited) / runs, 2)}
+        for name, (runs, total, waited) in _stats.items()
+    }
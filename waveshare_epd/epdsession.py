@@ -0,0 +1,119 @@
+# *****************************************************************************
+# * | File        :	  epdsession.py
+# * | Function    :   Keep an e-Paper panel initialized between refreshes
+# * | Info        :
+# *----------------
+# * | Info        :   Drivers are normally run as init -> display -> sleep for
+# *                   every frame. A Session runs the init sequence only when
+# *                   the panel needs it and deep-sleeps it once it has been
+# *                   idle, so frequent partial refreshes skip the reset,
+# *                   power-on and the 2 s sleep delay.
+# ******************************************************************************
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Deep-sleep the panel after this many seconds without a refresh.
+IDLE_S = 60
+
+# use() mode -> the EPD method that initializes it
+INIT_METHODS = {"full": "init", "fast": "init_fast", "part": "init_part", "4gray": "init_4Gray"}
+
+class Session:
+    """Shared access to one panel.
+
+    use(mode) initializes the panel with the method INIT_METHODS names
+    for mode (epd.init_<mode> for other modes) the first time, after a deep sleep, after an error or
+    when the mode changes. Otherwise it only powers the panel back on
+    (drivers with power_on). When the block ends the panel is powered off
+    (drivers with power_off) and deep-sleeps after idle_s without another
+    use(). Leaving the session itself, or calling sleep(), deep-sleeps at once.
+
+    lock serializes panel access; pass a threading.RLock the caller already
+    holds around rendering to share it with the idle timer.
+    """
+
+    def __init__(self, epd, idle_s=IDLE_S, lock=None):
+        self.epd = epd
+        self.idle_s = idle_s
+        self.lock = lock if lock is not None else threading.RLock()
+        self.mode = None        # init mode the panel runs, None if it needs an init
+        self.awake = False
+        self._timer = None
+        self._generation = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.sleep()
+
+    def _init(self, mode):
+        if mode != "full":
+            return getattr(self.epd, INIT_METHODS.get(mode, "init_" + mode))()
+        # Some drivers' init takes a LUT or mode argument; their full init is a sequence
+        if "full" in self.epd.SEQUENCES:
+            return self.epd.init_sequence("full")
+        return self.epd.init()
+
+    def _wake(self, mode):
+        if mode != self.mode:
+            self.awake = True
+            if self._init(mode) != 0:
+                raise IOError("e-Paper init (%s) failed" % mode)
+            self.mode = mode
+        elif hasattr(self.epd, "power_on"):
+            self.epd.power_on()
+
+    @contextmanager
+    def use(self, mode="part"):
+        with self.lock:
+            self._cancel_sleep()
+            try:
+                self._wake(mode)
+                yield self.epd
+                if hasattr(self.epd, "power_off"):
+                    self.epd.power_off()
+            except BaseException:
+                # Unknown panel state: initialize again next time
+                self.mode = None
+                raise
+            finally:
+                self._schedule_sleep()
+
+    def sleep(self):
+        """Deep-sleep the panel now if it is awake."""
+        with self.lock:
+            self._cancel_sleep()
+            if not self.awake:
+                return
+            try:
+                self.epd.sleep()
+            finally:
+                self.awake = False
+                self.mode = None
+
+    def _cancel_sleep(self):
+        self._generation += 1
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _schedule_sleep(self):
+        self._cancel_sleep()
+        self._timer = threading.Timer(self.idle_s, self._sleep_if_idle, args=(self._generation,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _sleep_if_idle(self, generation):
+        with self.lock:
+            # A use() since this timer was armed supersedes it
+            if generation != self._generation:
+                return
+            logger.debug("e-Paper idle for %s s, entering deep sleep", self.idle_s)
+            try:
+                self.sleep()
+            except IOError as e:
+                logger.info(e)
@@ -0,0 +1,241 @@
+# *****************************************************************************
+# * | File        :	  epdsim.py
+# * | Function    :   Software e-Paper backend for machines without GPIO/SPI
+# * | Info        :
+# *----------------
+# * | Info        :   Select it with EPD_BACKEND=sim or epdconfig.use_backend('sim').
+# *                   Every command and its data are recorded, BUSY follows a
+# *                   refresh-duration model on a virtual clock (delays do not
+# *                   sleep), and the controller RAM is reconstructed so the
+# *                   frame on the panel can be inspected as an image.
+# ******************************************************************************
+import logging
+from collections import namedtuple
+
+from .epdspi import Transport
+
+logger = logging.getLogger(__name__)
+
+# One command and the data bytes sent after it, at virtual time t_ms.
+Command = namedtuple("Command", "t_ms command data")
+
+# Busy time in ms per command for the UC8179 family (epd7in5_V2); the
+# refresh (0x12) time depends on whether partial mode (0x91) is on.
+UC8179_BUSY_MS = {
+    0x04: 40,       # POWER ON
+    0x02: 20,       # POWER OFF
+    'full': 3500,   # 0x12 DISPLAY REFRESH
+    'partial': 450, # 0x12 in partial mode
+}
+
+# Fastest clock the simulated controller reads correctly; above it every
+# byte arrives with a bit flipped, as calibration (epdspi) should detect.
+MAX_HZ = 20000000
+
+class _SPI:
+    """The spidev calls drivers make directly on epdconfig.SPI."""
+
+    def __init__(self, sim):
+        self._sim = sim
+        self.max_speed_hz = 0
+        self.mode = 0
+
+    def open(self, bus, device):
+        pass
+
+    def close(self):
+        pass
+
+    def writebytes(self, data):
+        self._sim._receive(data)
+
+    def writebytes2(self, data):
+        self._sim._receive(data)
+
+    def xfer3(self, data):
+        self._sim._receive(data)
+        return [0] * len(data)
+
+class Simulator:
+    # Pin definition (as on the Raspberry Pi HAT)
+    RST_PIN  = 17
+    DC_PIN   = 25
+    CS_PIN   = 8
+    BUSY_PIN = 24
+    PWR_PIN  = 18
+
+    def __init__(self, width=800, height=480, busy_ms=UC8179_BUSY_MS, busy_level=0, max_hz=MAX_HZ):
+        self.width = width
+        self.height = height
+        self.busy_ms = dict(busy_ms)
+        self.busy_level = busy_level    # what BUSY reads while busy (UC81xx: low)
+        self.max_hz = max_hz
+        self.SPI = _SPI(self)
+        self.transport = Transport(self.SPI, clock=lambda: self.now_ms / 1000.0)
+        self.trace = []
+        self.now_ms = 0.0
+        self.refreshes = 0
+        self.spi_bytes = 0
+        self.spi_transfers = 0
+        self.gpio_writes = 0
+        self.ignored = 0                # bytes sent while in deep sleep
+        self.opened = False
+        self._pins = {self.RST_PIN: 1, self.DC_PIN: 0, self.CS_PIN: 1, self.PWR_PIN: 0}
+        size = (width + 7) // 8 * height
+        self.old_ram = bytearray(size)
+        self.new_ram = bytearray(size)
+        self.shown = bytearray(size)    # displayed frame, 1 = black
+        self._reset_controller()
+
+    def _reset_controller(self):
+        self.busy_until = self.now_ms
+        self.powered = False
+        self.sleeping = False
+        self.partial = False
+        self.cdi = 0x00                 # 0x50 first byte; bit 0 inverts the new data
+        self.window = (0, 0, self.width, self.height)
+        self._ram = None
+        self._pos = 0
+
+    # --- epdconfig backend interface ---
+
+    def digital_write(self, pin, value):
+        self.gpio_writes += 1
+        if pin == self.RST_PIN and value and not self._pins[pin]:
+            self._reset_controller()
+        self._pins[pin] = value
+
+    def write_pins(self, pins):
+        for pin, value in pins:
+            self.digital_write(pin, value)
+
+    def digital_read(self, pin):
+        if pin == self.BUSY_PIN:
+            busy = self.now_ms < self.busy_until
+            return self.busy_level if busy else 1 - self.busy_level
+        return self._pins.get(pin, 0)
+
+    def wait_pin(self, pin, value, timeout_ms=None):
+        # Jump the virtual clock to the end of the busy period
+        if self.digital_read(pin) != value and self.now_ms < self.busy_until:
+            step = self.busy_until - self.now_ms
+            if timeout_ms is not None:
+                step = min(step, timeout_ms)
+            self.now_ms += step
+        return self.digital_read(pin) == value
+
+    def delay_ms(self, delaytime):
+        self.now_ms += delaytime
+
+    def spi_writebyte(self, data):
+        self.transport.write(data)
+
+    def spi_writebyte2(self, data):
+        self.transport.write(data)
+
+    def _receive(self, data):
+        data = bytes(b & 0xFF for b in data) if isinstance(data, list) else bytes(data)
+        self.spi_transfers += 1
+        self.spi_bytes += len(data)
+        self.now_ms += len(data) * 8000.0 / self.transport.speed_hz
+        if self.transport.speed_hz > self.max_hz:
+            data = bytes(b ^ 0x10 for b in data)
+        if self.sleeping:
+            self.ignored += len(data)
+            return
+        if self._pins[self.DC_PIN] == 0:
+            for command in data:
+                self.trace.append(Command(round(self.now_ms, 3), command, bytearray()))
+                self._command(command)
+        elif self.trace:
+            self.trace[-1].data.extend(data)
+            self._data(data)
+
+    def module_init(self, cleanup=False):
+        if not self.opened:
+            self.transport.open(0, 0)
+        self.opened = True
+        self._pins[self.PWR_PIN] = 1
+        return 0
+
+    def module_exit(self, cleanup=False):
+        self.transport.close()
+        self.opened = False
+        self._pins[self.PWR_PIN] = 0
+
+    # --- UC8179 model ---
+
+    def _busy(self, ms):
+        self.busy_until = max(self.busy_until, self.now_ms) + ms
+
+    def _command(self, command):
+        self._ram = None
+        if command == 0x04:
+            self.powered = True
+            self._busy(self.busy_ms.get(0x04, 0))
+        elif command == 0x02:
+            self.powered = False
+            self._busy(self.busy_ms.get(0x02, 0))
+        elif command == 0x91:
+            self.partial = True
+        elif command == 0x92:
+            self.partial = False
+            self.window = (0, 0, self.width, self.height)
+        elif command in (0x10, 0x13):
+            self._ram = self.old_ram if command == 0x10 else self.new_ram
+            self._pos = 0
+        elif command == 0x12:
+            self._refresh()
+
+    def _data(self, data):
+        command = self.trace[-1].command
+        if self._ram is not None:
+            self._write_ram(data)
+        elif command == 0x50 and len(self.trace[-1].data) == len(data):
+            self.cdi = data[0]
+        elif command == 0x07 and data[:1] == b'\xa5':
+            self.sleeping = True
+        elif command == 0x90 and len(self.trace[-1].data) >= 8:
+            d = self.trace[-1].data
+            self.window = ((d[0] << 8 | d[1]) & ~7, d[4] << 8 | d[5],
+                           ((d[2] << 8 | d[3]) | 7) + 1, (d[6] << 8 | d[7]) + 1)
+
+    def _window(self):
+        return self.window if self.partial else (0, 0, self.width, self.height)
+
+    def _write_ram(self, data):
+        x0, y0, x1, y1 = self._window()
+        stride = (self.width + 7) // 8
+        left, span = x0 // 8, (x1 - x0) // 8
+        for b in data:
+            row, col = divmod(self._pos, span)
+            if row < y1 - y0:
+                self._ram[(y0 + row) * stride + left + col] = b
+            self._pos += 1
+
+    def _refresh(self):
+        if not self.powered:
+            logger.warning("Simulated e-Paper refresh while powered off")
+        x0, y0, x1, y1 = self._window()
+        stride = (self.width + 7) // 8
+        left, right = x0 // 8, x1 // 8
+        invert = self.cdi & 0x01
+        for y in range(y0, y1):
+            row = self.new_ram[y * stride + left:y * stride + right]
+            self.shown[y * stride + left:y * stride + right] = bytes(b ^ 0xFF for b in row) if invert else row
+        self.refreshes += 1
+        self._busy(self.busy_ms.get('partial' if self.partial else 'full', 0))
+
+    # --- inspection ---
+
+    def commands(self):
+        """The command bytes sent so far, in order."""
+        return [c.command for c in self.trace]
+
+    def clear_trace(self):
+        del self.trace[:]
+
+    def image(self):
+        """The displayed frame as a PIL image (mode '1', 0 = black)."""
+        from PIL import Image
+        return Image.frombytes('1', (self.width, self.height), bytes(b ^ 0xFF for b in self.shown))
@@ -0,0 +1,188 @@
+# *****************************************************************************
+# * | File        :	  epdspi.py
+# * | Function    :   SPI transport for the spidev backends
+# * | Info        :
+# *----------------
+# * | Info        :   Clock, mode and chunk size are configurable (EPD_SPI_HZ,
+# *                   EPD_SPI_CHUNK, EPD_SPI_XFER3). Frames are split into
+# *                   chunks of spidev's bufsiz, one ioctl each, and every
+# *                   transfer is timed. calibrate() finds the fastest clock a
+# *                   panel still accepts:
+# *
+# *                       python -m waveshare_epd.epdspi epd7in5_V2
+# ******************************************************************************
+import collections
+import logging
+import os
+import sys
+import time
+
+from . import epdconfig
+
+logger = logging.getLogger(__name__)
+
+SPEED_HZ = 4000000
+MODE = 0b00
+# spidev's transfer limit when /sys/module/spidev/parameters/bufsiz is missing
+BUFSIZ = 4096
+
+# Clocks tried by calibrate(), slowest first. The first must be known to work.
+CALIBRATION_HZ = (4000000, 8000000, 10000000, 16000000, 20000000, 25000000, 32000000)
+# A faster clock has to raise the measured throughput by this much to be worth it.
+MIN_GAIN = 1.05
+
+def bufsiz():
+    try:
+        with open('/sys/module/spidev/parameters/bufsiz') as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return BUFSIZ
+
+def _env_int(name, default):
+    value = os.environ.get(name, '').strip()
+    return int(value, 0) if value else default
+
+class Transport:
+    """Chunked, timed writes on a spidev.SpiDev (or anything with writebytes2/xfer3).
+
+    clock returns seconds; the simulator passes its virtual clock.
+    """
+
+    def __init__(self, spi, speed_hz=None, chunk=None, xfer3=None, mode=MODE, clock=time.perf_counter):
+        self.spi = spi
+        self.speed_hz = speed_hz or _env_int('EPD_SPI_HZ', SPEED_HZ)
+        self.chunk = chunk or _env_int('EPD_SPI_CHUNK', 0) or bufsiz()
+        self.xfer3 = bool(_env_int('EPD_SPI_XFER3', 0)) if xfer3 is None else xfer3
+        self.mode = mode
+        self.clock = clock
+        self.opened = False
+        self.history = collections.deque(maxlen=256)    # (bytes, seconds) of recent transfers
+        self.reset_stats()
+
+    def open(self, bus, device):
+        self.spi.open(bus, device)
+        self.opened = True
+        self.spi.max_speed_hz = self.speed_hz
+        self.spi.mode = self.mode
+
+    def close(self):
+        self.spi.close()
+        self.opened = False
+
+    def set_speed(self, hz):
+        self.speed_hz = hz
+        if self.opened:
+            self.spi.max_speed_hz = hz
+
+    def write(self, data, send=None):
+        """Send data in chunks, with send (default xfer3 or writebytes2) per chunk."""
+        if send is None:
+            send = self.spi.xfer3 if self.xfer3 else self.spi.writebytes2
+        clock = self.clock
+        if len(data) <= self.chunk:
+            start = clock()
+            send(data)
+            self._record(len(data), clock() - start)
+            return
+        if not isinstance(data, list):
+            data = memoryview(data)
+        for i in range(0, len(data), self.chunk):
+            part = data[i:i + self.chunk]
+            start = clock()
+            send(part)
+            self._record(len(part), clock() - start)
+
+    def _record(self, size, seconds):
+        self.transfers += 1
+        self.bytes += size
+        self.seconds += seconds
+        self.longest = max(self.longest, seconds)
+        self.history.append((size, seconds))
+
+    def reset_stats(self):
+        self.transfers = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.longest = 0.0
+        self.history.clear()
+
+    def stats(self):
+        """Clock, chunk size, and transfer count, bytes, throughput and latency so far."""
+        return {
+            "hz": self.speed_hz,
+            "chunk": self.chunk,
+            "transfers": self.transfers,
+            "bytes": self.bytes,
+            "kb_per_s": round(self.bytes / self.seconds / 1000, 1) if self.seconds else 0.0,
+            "avg_ms": round(self.seconds * 1000 / self.transfers, 3) if self.transfers else 0.0,
+            "max_ms": round(self.longest * 1000, 3),
+        }
+
+def spi_stats():
+    """Transport stats of the current backend, {} for backends without one."""
+    transport = getattr(epdconfig, 'transport', None)
+    return transport.stats() if transport is not None else {}
+
+def calibrate(epd, speeds=CALIBRATION_HZ, rounds=2):
+    """Find the fastest SPI clock epd still works at. Returns (hz, results).
+
+    The HAT cannot read the controller back, so a clock counts as reliable
+    when every round of init and a full refresh of a test pattern completes
+    its BUSY handshake: a command corrupted on the wire leaves the refresh
+    unstarted and BUSY clears far sooner than at the first (trusted) clock.
+    Calibration stops at the first failure, and a faster clock is only kept
+    if it raises the measured throughput (the SoC rounds the clock down to
+    what its divider can make). The pattern stays on the panel for a visual
+    check. epd needs init(), display(buffer) and ReadBusy through epdbusy.
+    """
+    from .epdbusy import busy_stats
+
+    transport = epdconfig.transport
+    name = type(epd).__module__.rsplit('.', 1)[-1]
+    pattern = bytes([0xAA, 0x55]) * (epd.width * epd.height // 16)
+    reference = None
+    best, best_rate = speeds[0], 0.0
+    results = []
+    for hz in speeds:
+        transport.set_speed(hz)
+        result = {"hz": hz, "ok": True, "kb_per_s": 0.0, "busy_ms": 0.0}
+        for _ in range(rounds):
+            try:
+                if epd.init() != 0:
+                    raise IOError("init failed")
+                size, seconds = transport.bytes, transport.seconds
+                epd.display(pattern)
+            except IOError as e:
+                logger.info("%d Hz: %s", hz, e)
+                result["ok"] = False
+                break
+            busy = busy_stats()[name]["last_ms"]
+            rate = (transport.bytes - size) / (transport.seconds - seconds) / 1000
+            result["kb_per_s"] = round(rate, 1)
+            result["busy_ms"] = busy
+            if reference is None:
+                reference = busy
+            elif busy < reference / 2:
+                logger.info("%d Hz: refresh took %.0f ms, expected ~%.0f ms", hz, busy, reference)
+                result["ok"] = False
+                break
+        results.append(result)
+        logger.debug("%s", result)
+        if not result["ok"]:
+            break
+        if result["kb_per_s"] >= best_rate * MIN_GAIN:
+            best, best_rate = hz, result["kb_per_s"]
+
+    transport.set_speed(best)
+    return best, results
+
+if __name__ == '__main__':
+    import importlib
+    logging.basicConfig(level=logging.INFO)
+    module = sys.argv[1] if len(sys.argv) > 1 else 'epd7in5_V2'
+    epd = importlib.import_module('waveshare_epd.' + module).EPD()
+    hz, results = calibrate(epd)
+    for result in results:
+        print("%(hz)10d Hz  %(kb_per_s)8.1f kB/s  busy %(busy_ms)7.0f ms  %(ok)s" % result)
+    print("EPD_SPI_HZ=%d" % hz)
+    epd.sleep()